@@ -0,0 +1,182 @@
+'''Compact arrays of numbers for CatScript, made by the `Array()` and `Range()` builtins\n
+A `CatArray` holds Ints(as 64 bit integers) or Floats in one block of memory, an `array.array` or, if NumPy is installed, a NumPy array.
+Arithmetic on arrays is elementwise(`xs * 2`, `xs + ys`), and the builtins built on the functions here(`Sum`, `Map`, `Filter`, `Sort`, `Slice`)
+go over the whole array at once, instead of the script looping over it one line at a time\n
+An array is a value like a list, slicing or sorting it makes a new one. The functions raise `TypeError`s and `ValueError`s, which the builtins turn into `FuncError`s'''
+from array import array
+from itertools import repeat
+import operator
+from typing import Any, Callable, Iterable
+
+try: import numpy as np
+except ImportError: np = None
+
+
+
+INT, FLOAT = 'q', 'd' # the `array.array` type codes
+
+
+def _kind(values: list[Any]) -> str:
+    "Returns the type code that can hold all of `values`, raises if they aren't all numbers"
+    kind = INT
+    for v in values:
+        if type(v) is float: kind = FLOAT
+        elif type(v) not in (int, bool):
+            raise TypeError(f"arrays can only hold Ints and Floats, not '{type(v).__name__}'")
+    return kind
+
+
+def _data(values: Iterable[Any], kind: str | None = None) -> Any:
+    values = values if isinstance(values, list) else list(values)
+    if kind is None: kind = _kind(values)
+    if np is not None: return np.array(values, dtype=np.int64 if kind == INT else np.float64)
+    return array(kind, values)
+
+
+class CatArray:
+    "An array of Ints or Floats, `data` is the `array.array` or NumPy array it's stored in"
+    __slots__ = ('data',)
+
+    def __init__(self, values: Iterable[Any] = (), kind: str | None = None) -> None:
+        self.data: Any = _data(values, kind)
+
+    @classmethod
+    def wrap(cls, data: Any) -> 'CatArray':
+        "Makes an array from storage that isn't used by anything else"
+        out = cls.__new__(cls)
+        out.data = data
+        return out
+
+    def kind(self) -> str:
+        if np is not None: return INT if self.data.dtype.kind == 'i' else FLOAT
+        return self.data.typecode
+
+    def tolist(self) -> list[int | float]: return self.data.tolist()
+
+    def __len__(self) -> int: return len(self.data)
+
+    def __iter__(self): return iter(self.data.tolist()) if np is not None else iter(self.data)
+
+    def __getitem__(self, index: int | slice) -> 'int | float | CatArray':
+        if isinstance(index, slice): return slice_array(self, index.start, index.stop, index.step)
+        value = self.data[index]
+        return value.item() if np is not None else value
+
+    def __setitem__(self, index: int, value: int | float):
+        if self.kind() == INT and type(value) is float: raise TypeError("cannot put a Float in an array of Ints")
+        self.data[index] = value
+
+    def __eq__(self, other: object) -> bool:
+        "Arrays are equal if they hold the same numbers, `==` isn't elementwise"
+        return isinstance(other, CatArray) and len(self) == len(other) and self.tolist() == other.tolist()
+
+    __hash__ = None
+
+    def __str__(self) -> str: return str(self.tolist())
+
+    def __repr__(self) -> str: return f"Array({self.tolist()})"
+
+    def __binary(self, other: Any, op: Callable[[Any, Any], Any], swap: bool = False) -> 'CatArray':
+        if isinstance(other, CatArray):
+            if len(other) != len(self): raise ValueError(f"cannot combine arrays of lengths {len(self)} and {len(other)}")
+            other_data, other_kind = other.data, other.kind()
+        elif type(other) in (int, float, bool):
+            other_data, other_kind = other, FLOAT if type(other) is float else INT
+        else: return NotImplemented
+        if np is not None:
+            # errors like dividing by zero raise, like they do without NumPy
+            with np.errstate(all='raise'): return CatArray.wrap(op(other_data, self.data) if swap else op(self.data, other_data))
+        if isinstance(other, CatArray): values = list(map(op, self.data, other_data))
+        elif swap: values = list(map(op, repeat(other_data), self.data))
+        else: values = list(map(op, self.data, repeat(other_data)))
+        kind = INT if self.kind() == INT and other_kind == INT and op is not operator.truediv else FLOAT
+        try: return CatArray.wrap(array(kind, values))
+        except TypeError: return CatArray.wrap(array(FLOAT, values)) # like `2 ** -1`
+
+    def __add__(self, other): return self.__binary(other, operator.add)
+    def __radd__(self, other): return self.__binary(other, operator.add, True)
+    def __sub__(self, other): return self.__binary(other, operator.sub)
+    def __rsub__(self, other): return self.__binary(other, operator.sub, True)
+    def __mul__(self, other): return self.__binary(other, operator.mul)
+    def __rmul__(self, other): return self.__binary(other, operator.mul, True)
+    def __truediv__(self, other): return self.__binary(other, operator.truediv)
+    def __rtruediv__(self, other): return self.__binary(other, operator.truediv, True)
+    def __floordiv__(self, other): return self.__binary(other, operator.floordiv)
+    def __rfloordiv__(self, other): return self.__binary(other, operator.floordiv, True)
+    def __mod__(self, other): return self.__binary(other, operator.mod)
+    def __rmod__(self, other): return self.__binary(other, operator.mod, True)
+    def __pow__(self, other): return self.__binary(other, operator.pow)
+    def __rpow__(self, other): return self.__binary(other, operator.pow, True)
+
+    def __neg__(self) -> 'CatArray': return CatArray.wrap(-self.data) if np is not None else CatArray.wrap(array(self.kind(), map(operator.neg, self.data)))
+
+    def __abs__(self) -> 'CatArray': return CatArray.wrap(abs(self.data)) if np is not None else CatArray.wrap(array(self.kind(), map(abs, self.data)))
+
+
+def _check_int(value: Any, what: str):
+    if type(value) is not int: raise TypeError(f"expected Int for {what}, but got '{type(value).__name__}'")
+
+
+def _check_values(values: Any, what: str):
+    if not isinstance(values, (CatArray, list, tuple, range)): raise TypeError(f"expected an Array or List for {what}, but got '{type(values).__name__}'")
+
+
+def make_array(values: Any) -> CatArray:
+    "`Array(values)`, copies an array or list of numbers into a new array"
+    _check_values(values, 'the values of Array')
+    if isinstance(values, CatArray): return CatArray.wrap(values.data.copy() if np is not None else array(values.kind(), values.data))
+    return CatArray(values)
+
+
+def range_array(start: int, stop: int | None = None, step: int = 1) -> CatArray:
+    "`Range(stop)` or `Range(start, stop, step)`, an array of the Ints in `range()`"
+    if stop is None: start, stop = 0, start
+    for value, what in ((start, 'the start of Range'), (stop, 'the end of Range'), (step, 'the step of Range')): _check_int(value, what)
+    if step == 0: raise ValueError("the step of Range cannot be 0")
+    if np is not None: return CatArray.wrap(np.arange(start, stop, step, dtype=np.int64))
+    return CatArray.wrap(array(INT, range(start, stop, step)))
+
+
+def total(values: Any) -> int | float:
+    "`Sum(values)`"
+    _check_values(values, 'Sum')
+    if isinstance(values, CatArray): return values.data.sum().item() if np is not None else sum(values.data)
+    return sum(values)
+
+
+def map_values(values: Any, func: Callable[[Any], Any]) -> CatArray | list[Any]:
+    "`Map(values, fn)`, an array stays an array(so `fn` has to return numbers), anything else gives a list"
+    _check_values(values, 'Map')
+    out = [func(v) for v in values]
+    return CatArray(out) if isinstance(values, CatArray) else out
+
+
+def filter_values(values: Any, func: Callable[[Any], Any]) -> CatArray | list[Any]:
+    "`Filter(values, fn)`, the values `fn` returns something truthy for"
+    _check_values(values, 'Filter')
+    if isinstance(values, CatArray):
+        keep = [bool(func(v)) for v in values]
+        if np is not None: return CatArray.wrap(values.data[np.array(keep, dtype=bool)])
+        return CatArray.wrap(array(values.kind(), [v for v, k in zip(values.data, keep) if k]))
+    return [v for v in values if func(v)]
+
+
+def sort_values(values: Any, reverse: bool = False) -> CatArray | list[Any]:
+    "`Sort(values)` or `Sort(values, true)` for largest first"
+    _check_values(values, 'Sort')
+    if isinstance(values, CatArray):
+        if np is not None:
+            data = np.sort(values.data)
+            return CatArray.wrap(data[::-1].copy() if reverse else data)
+        return CatArray.wrap(array(values.kind(), sorted(values.data, reverse=reverse)))
+    return sorted(values, reverse=reverse)
+
+
+def slice_array(values: Any, start: int | None = None, stop: int | None = None, step: int | None = None) -> CatArray | list[Any]:
+    "`Slice(values, start, stop)` or `Slice(values, start, stop, step)`, like Python's `values[start:stop:step]`"
+    _check_values(values, 'Slice')
+    for value, what in ((start, 'the start of Slice'), (stop, 'the end of Slice'), (step, 'the step of Slice')):
+        if value is not None: _check_int(value, what)
+    part = slice(start, stop, step)
+    if isinstance(values, CatArray): return CatArray.wrap(values.data[part].copy() if np is not None else values.data[part])
+    return list(values[part])
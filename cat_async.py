@@ -0,0 +1,113 @@
+'''An asyncio mode for CatScript, `await run_code_async(text)` runs a script on the running event loop instead of blocking its thread\n
+`Sleep()` and `GetText()` wait without blocking, so many scripts can run at once on one loop(`asyncio.gather(run_code_async(a), run_code_async(b))`),
+and a script can run its functions concurrently with `Spawn("Name", args...)`, which returns a task, and `Await(task)`, which returns what the function returned.
+A script only gives way to the others at `Sleep()`(`Sleep(0)` just gives way), `GetText()` and `Await()`, and it isn't done until the tasks it spawned are'''
+import asyncio
+from typing import Any, Awaitable, Callable
+from cat_output import OutputSink
+from interpreter import Error, Exit, NoPrint, Scope, Program, Frame, Suspend, EXIT, NO_PRINT, FRAME_MAIN, SUSPENDED, make_builtins, parse_program, run_frames
+
+
+
+async def read_line(message: str) -> str:
+    "Reads a line from stdin on a thread, so the event loop isn't blocked"
+    return await asyncio.to_thread(input, message)
+
+
+async def _sleep(seconds: float) -> tuple[None, None]:
+    await asyncio.sleep(seconds)
+    return None, None
+
+
+async def _read(read: Callable[[str], Awaitable[str]], message: str) -> tuple[str, None]:
+    return await read(message), None
+
+
+async def _wait(task: asyncio.Future) -> tuple[Any, Exit | NoPrint | None]:
+    errcode, res = await task
+    if errcode in (0, 2): return res[2], None
+    # an error in the task was already printed
+    return None, EXIT if errcode == 1 else NO_PRINT
+
+
+def _main_frame(program: Program, vars: Scope, funcs: Scope, used_depth: int) -> Frame:
+    frame = Frame(FRAME_MAIN, program, vars, funcs, used_depth)
+    # a fast loop(see `cat_optimize`) can't stop half way to wait for a builtin
+    frame.fast_loops = False
+    return frame
+
+
+def make_async_builtins(vars: Scope, funcs: Scope, tasks: list[asyncio.Task], used_stack: list[str] = [], output: OutputSink | None = None, read: Callable[[str], Awaitable[str]] = read_line) -> dict[str, tuple[bool, Any]]:
+    '''Returns the builtins of `make_builtins` with `Sleep` and `GetText` awaiting instead of blocking, and `Spawn` and `Await`\n
+    `Spawn` looks the function up in `funcs` and runs it with `vars` as its caller's variables, the tasks it starts are added to `tasks`,
+    `GetText` reads lines with `read`'''
+    if output is None: output = OutputSink(buffer_size=0)
+    builtins = make_builtins(used_stack, output, vars, funcs)
+
+    def spawn(ln: int, name: str, *args: Any) -> tuple[asyncio.Task | None, Error | None]:
+        entry = funcs.get(name) if isinstance(name, str) else None
+        if entry is None or entry[0]: return None, Error.ValueErr('Spawn', 'the name of a fn', name, ln)
+        func = entry[1]
+        inputs, err = func.bind(list(args), ln)
+        if err: return None, err
+        code = func.code()
+        task = asyncio.ensure_future(run_frames_async([_main_frame(code, *func.scopes(inputs, vars, funcs), 0)], [], True, output))
+        tasks.append(task)
+        return task, None
+
+    builtins.update({
+        'GetText': (True, lambda ln, message: (output.flush(), (None, Suspend(_read(read, message))))[1] if isinstance(message, str) else (None, Error.ValueErr('GetText', 'string', message, ln)) ),
+
+        'Sleep': (True, lambda ln, seconds: (output.flush(), (None, Suspend(_sleep(seconds))))[1] if isinstance(seconds, (int, float)) else (None, Error.ValueErr('Sleep', 'Float or Int', seconds, ln)) ),
+
+        'Spawn': (True, spawn),
+
+        'Await': (True, lambda ln, task: (None, Suspend(_wait(task))) if isinstance(task, asyncio.Future) else (None, Error.ValueErr('Await', 'a task from Spawn', task, ln)) ),
+    })
+    return builtins
+
+
+async def run_frames_async(frames: list[Frame], used_stack: list[str], return_values: bool = False, output: OutputSink | None = None) -> tuple[int, tuple[Scope, Scope] | tuple[Scope, Scope, Any] | None]:
+    "Runs `frames` with `run_frames`, awaiting whatever the builtins wait for, returns the same as `run_code`"
+    line_res = None
+    while True:
+        errcode, res = run_frames(frames, used_stack, return_values, None, output, None, line_res)
+        if errcode != SUSPENDED: return errcode, res
+        try: line_res, err = await res.awaitable
+        except Exception as e:
+            frame = frames[-1]
+            line_res, err = None, Error('AsyncError', e, frame.nodes[frame.ln].ln)
+        if err is None: continue
+
+        if isinstance(err, Exit): return 1, (frames[0].vars, frames[0].funcs) if return_values else None
+        if isinstance(err, Error):
+            if output is not None: output.flush()
+            print(err.error())
+        return -1, None
+
+
+async def run_code_async(text: str | list[str] | Program, used_stack: list[str] = [], return_values: bool = False, injected_vars: Scope | dict[str, Any] | None = None, output: OutputSink | None = None, read: Callable[[str], Awaitable[str]] = read_line) -> tuple[int, tuple[Scope, Scope] | tuple[Scope, Scope, Any] | None]:
+    '''Runs CatScript on the running event loop, returns the same as `run_code`\n
+    `output` is the same as `run_code`'s, `read` is the coroutine function `GetText` reads lines with(from stdin by default)'''
+    program: Program = text if isinstance(text, Program) else parse_program(text)
+    vars: Scope = injected_vars if isinstance(injected_vars, Scope) else Scope(injected_vars if isinstance(injected_vars, dict) else {})
+    if output is None: output = OutputSink()
+    tasks: list[asyncio.Task] = []
+    funcs = Scope()
+    funcs.update(make_async_builtins(vars, funcs, tasks, used_stack, output, read))
+
+    output.capture()
+    try:
+        res = await run_frames_async([_main_frame(program, vars, funcs, len(used_stack))], used_stack, return_values, output)
+        # the script isn't done until everything it spawned is
+        while not all(t.done() for t in tasks): await asyncio.gather(*tasks)
+        return res
+    finally:
+        for t in tasks: t.cancel()
+        output.flush()
+        output.release()
+
+
+def run_async(text: str | list[str] | Program, return_values: bool = False) -> tuple[int, tuple[Scope, Scope] | tuple[Scope, Scope, Any] | None]:
+    "Runs CatScript with `run_code_async` on a new event loop"
+    return asyncio.run(run_code_async(text, return_values=return_values))
@@ -0,0 +1,206 @@
+'''Runs many CatScript files on a pool of worker processes, `python run.py batch dir_or_glob --workers N`\n
+The workers are started(and have imported the interpreter) before the first job is handed out, and each of them runs job after job,
+so a script doesn't pay for starting Python. They keep their parse and expression caches between jobs, but every job imports its modules again(see `cat_modules`),
+so a module's variables are never left over from another script, and they run the `pfor` loops of their scripts themselves instead of starting processes of their own\n
+Everything a job prints is captured on its own and shown under the script's name when it finishes(or written to `--out DIR`).
+A job that runs longer than `--timeout` seconds has its worker killed and replaced, and counts as errored.
+The report has the error code of every script(like `run_code`'s, `0`: finished, `1`: exited, `2`: returned, `-1`: errored) and how many scripts ran a second'''
+import argparse
+import contextlib
+import glob
+import io
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+import os
+import sys
+import time
+from typing import Any, TextIO
+from interpreter import Error, run_code
+from cat_vm import run_vm
+from cat_cache import load_program
+from cat_output import OutputSink
+import cat_modules
+import cat_pfor
+
+
+
+EXTENSION = '.cat'
+WARMUP = 'lt warm = 1\nfor i = 0, 3 {\n    warm = warm + i\n}'
+
+
+def find_scripts(target: str, extension: str = EXTENSION) -> list[str]:
+    "Returns the scripts of `target`, a script, a directory(searched recursively) or a glob pattern, sorted"
+    if os.path.isdir(target): paths = glob.glob(os.path.join(glob.escape(target), '**', '*' + extension), recursive=True)
+    elif os.path.isfile(target): paths = [target]
+    else: paths = glob.glob(target, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and os.path.splitext(p)[1].casefold() == extension)
+
+
+def run_job(path: str, use_cache: bool = True, vm: bool = False) -> tuple[int, str]:
+    "Runs the script at `path` with its output captured and a module cache of its own, returns its error code and output"
+    with contextlib.redirect_stdout(io.StringIO()) as text:
+        try:
+            program = load_program(path, use_cache)
+            cat_modules.SEARCH_PATH[:] = [os.path.dirname(os.path.abspath(path))]
+            errcode, _ = (run_vm if vm else run_code)(program, output=OutputSink(), modules=cat_modules.ModuleCache())
+        except Exception as e:
+            print(Error('BatchError', f"{type(e).__name__}: {e}").error())
+            errcode = -1
+    return errcode, text.getvalue()
+
+
+def _work(conn: Connection, use_cache: bool, vm: bool):
+    "The loop of a worker process, runs the `(index, path)` jobs it's sent until it gets `None`"
+    # the scripts are already spread over the workers, and a daemonic worker can't start the processes of a `pfor` anyway
+    cat_pfor.configure(1)
+    with contextlib.redirect_stdout(io.StringIO()): (run_vm if vm else run_code)(WARMUP)
+    conn.send(None)
+    while (job := conn.recv()) is not None:
+        index, path = job
+        start = time.perf_counter()
+        errcode, output = run_job(path, use_cache, vm)
+        conn.send((index, errcode, output, time.perf_counter() - start))
+
+
+class Worker:
+    "A worker process and the job it's running"
+    __slots__ = ('process', 'conn', 'job', 'started', 'deadline')
+
+    def __init__(self, context: Any, use_cache: bool, vm: bool) -> None:
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_work, args=(child, use_cache, vm), daemon=True)
+        self.process.start()
+        child.close()
+        self.job: int | None = None
+        self.started: float = 0.0
+        self.deadline: float | None = None
+
+    def ready(self):
+        "Waits until the worker has warmed up"
+        self.conn.recv()
+
+    def send(self, index: int, path: str, timeout: float | None):
+        self.job = index
+        self.started = time.perf_counter()
+        self.deadline = self.started + timeout if timeout is not None else None
+        self.conn.send((index, path))
+
+    def stop(self):
+        try: self.conn.send(None)
+        except OSError: pass
+        self.process.join(1)
+        if self.process.is_alive(): self.process.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class Result:
+    __slots__ = ('path', 'errcode', 'output', 'elapsed')
+
+    def __init__(self, path: str, errcode: int, output: str, elapsed: float) -> None:
+        self.path: str = path
+        self.errcode: int = errcode
+        self.output: str = output
+        self.elapsed: float = elapsed
+
+
+def run_batch(paths: list[str], workers: int | None = None, timeout: float | None = None, use_cache: bool = True, vm: bool = False, on_result: Any = None) -> list[Result]:
+    '''Runs the scripts at `paths` on `workers` processes(`os.cpu_count()` by default), returns their results in the order of `paths`\n
+    `on_result(result)` is called as each job finishes. A job that runs longer than `timeout` seconds, or whose worker dies, gets the error code `-1`'''
+    results: list[Result | None] = [None] * len(paths)
+    if not paths: return []
+    context = multiprocessing.get_context()
+    pool = [Worker(context, use_cache, vm) for _ in range(min(workers or os.cpu_count() or 1, len(paths)))]
+    for worker in pool: worker.ready()
+    pending = iter(enumerate(paths))
+
+    def finish(index: int, errcode: int, output: str, elapsed: float):
+        results[index] = result = Result(paths[index], errcode, output, elapsed)
+        if on_result is not None: on_result(result)
+
+    def next_job(worker: Worker):
+        job = next(pending, None)
+        if job is None: worker.job = worker.deadline = None
+        else: worker.send(*job, timeout)
+
+    try:
+        for worker in pool: next_job(worker)
+        while busy := [w for w in pool if w.job is not None]:
+            deadlines = [w.deadline for w in busy if w.deadline is not None]
+            wait_for = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], wait_for)
+            now = time.perf_counter()
+            for n, worker in enumerate(pool):
+                if worker.job is None: continue
+                if worker.conn in ready:
+                    try:
+                        finish(*worker.conn.recv())
+                        next_job(worker)
+                        continue
+                    except (EOFError, OSError): pass
+                elif worker.process.sentinel not in ready and (worker.deadline is None or now < worker.deadline): continue
+                # timed out, or the process died(like a crash in C code)
+                died = not worker.process.is_alive()
+                worker.kill()
+                details = f"the worker stopped with exit code {worker.process.exitcode}" if died else f"the script ran for more than {timeout} seconds"
+                finish(worker.job, -1, Error('BatchError' if died else 'TimeoutError', details).error() + '\n', now - worker.started)
+                pool[n] = worker = Worker(context, use_cache, vm)
+                worker.ready()
+                next_job(worker)
+    finally:
+        for worker in pool:
+            if worker.job is None: worker.stop()
+            else: worker.kill()
+    return results
+
+
+def write_output(result: Result, out_dir: str | None, stream: TextIO, base: str = '.'):
+    "Writes the output of a job to `out_dir`(as `<name>.out`, with the script's path relative to `base`), or to `stream` under the script's name"
+    if out_dir is not None:
+        out_path = os.path.join(out_dir, os.path.splitext(os.path.relpath(result.path, base))[0] + '.out')
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, 'w', encoding='utf-8') as f: f.write(result.output)
+    elif result.output:
+        stream.write(f"==> {result.path} <==\n{result.output}")
+        if not result.output.endswith('\n'): stream.write('\n')
+
+
+def report(results: list[Result], elapsed: float) -> str:
+    "Returns the error code of each script and the throughput of the batch"
+    out = [f"{r.errcode:>3}  {r.elapsed * 1000:9.1f} ms  {r.path}" for r in results]
+    counts = {code: sum(r.errcode == code for r in results) for code in (0, 1, 2, -1)}
+    out.append(f"{len(results)} scripts in {elapsed:.3f}s({len(results) / elapsed if elapsed else 0.0:.1f}/s): "
+               f"{counts[0]} finished, {counts[1]} exited, {counts[2]} returned, {counts[-1]} errored")
+    return '\n'.join(out)
+
+
+def main(argv: list[str] | None = None) -> int:
+    "The `batch` command, returns `1` if any script errored"
+    parser = argparse.ArgumentParser(prog='run.py batch', description="Runs many CatScript files on a pool of worker processes")
+    parser.add_argument('target', nargs='+', help="scripts, directories(searched recursively) or glob patterns")
+    parser.add_argument('--workers', type=int, default=None, help="the number of worker processes(the number of CPUs by default)")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds a script can run for before it's stopped")
+    parser.add_argument('--vm', action='store_true', help="run the scripts on the VM")
+    parser.add_argument('--no-cache', action='store_true', help="don't read or write the parse caches(in `__catcache__`)")
+    parser.add_argument('--out', default=None, metavar='DIR', help="write the output of each script to DIR/<name>.out(in the same folders as the scripts) instead of showing it")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1: parser.error("--workers must be at least 1")
+
+    paths = sorted({p for target in args.target for p in find_scripts(target)})
+    if not paths:
+        print(f"no CatScript files found in {', '.join(args.target)}")
+        return 1
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    start = time.perf_counter()
+    results = run_batch(paths, args.workers, args.timeout, not args.no_cache, args.vm, lambda r: write_output(r, args.out, sys.stdout, base))
+    print(report(results, time.perf_counter() - start))
+    return 1 if any(r.errcode == -1 for r in results) else 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
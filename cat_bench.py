@@ -0,0 +1,246 @@
+'''Benchmarks for the CatScript engines, with results that can be saved and compared against later\n
+`python cat_bench.py` runs the corpus and prints a table, `--save FILE` writes the results as a baseline,
+and `--compare FILE` fails(exit code `1`) if a benchmark got slower or used more memory than in the baseline by more than `--threshold`\n
+Every benchmark is generated CatScript that gets bigger with `--scale`, its ops are the number of lines it runs(counted once with `cat_profile`)'''
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+import interpreter
+from interpreter import run_code
+from cat_vm import run_vm
+from cat_profile import Profiler
+
+
+
+ENGINES: dict[str, Callable[..., tuple[int, Any]]] = {'tree': run_code, 'vm': run_vm}
+
+
+class Bench:
+    "A benchmark, `source(scale)` returns its CatScript, if `cold` the parse and expression caches are cleared before every run"
+    __slots__ = ('name', 'source', 'cold')
+
+    def __init__(self, name: str, source: Callable[[int], str], cold: bool = False) -> None:
+        self.name: str = name
+        self.source: Callable[[int], str] = source
+        self.cold: bool = cold
+
+
+def loop_heavy(scale: int) -> str:
+    return f'''lt total = 0
+for i = 0, {200 * scale} {{
+    for j = 0, 100 {{
+        total = total + i * j % 7
+    }}
+}}
+Println(total)'''
+
+
+def call_heavy(scale: int) -> str:
+    return f'''fn Add(a, b) {{
+    return a + b
+}}
+fn FibRec(n) {{
+    if n < 2 {{
+        return n
+    }}
+    return FibRec(n - 1) + FibRec(n - 2)
+}}
+lt total = 0
+for i = 0, {5000 * scale} {{
+    total = Add(total, i)
+}}
+Println(total, FibRec(14))'''
+
+
+def branch_heavy(scale: int) -> str:
+    return f'''lt fizzbuzz = 0
+lt buzz = 0
+lt fizz = 0
+lt other = 0
+for i = 0, {15000 * scale} {{
+    if i % 15 == 0 {{
+        fizzbuzz = fizzbuzz + 1
+    }} elseif i % 5 == 0 {{
+        buzz = buzz + 1
+    }} elseif i % 3 == 0 {{
+        fizz = fizz + 1
+    }} else {{
+        other = other + 1
+    }}
+}}
+Println(fizzbuzz, buzz, fizz, other)'''
+
+
+def many_globals(scale: int, count: int = 300) -> str:
+    lines = [f'lt g{n} = {n}' for n in range(count)]
+    lines += [
+        'fn Read() {',
+        f'    return g0 + g{count // 2} + g{count - 1}',
+        '}',
+        'lt total = 0',
+        f'for i = 0, {2500 * scale} {{',
+        f'    total = total + Read() + g{count // 3}',
+        '}',
+        'Println(total)',
+    ]
+    return '\n'.join(lines)
+
+
+def deep_nesting(scale: int, depth: int = 12) -> str:
+    lines = ['lt total = 0', f'for i = 0, {1500 * scale} {{']
+    for d in range(depth):
+        lines.append('    ' * (d + 1) + f'if i >= {d} or i < {d} {{')
+    lines.append('    ' * (depth + 1) + 'for j = 0, 3 {')
+    lines.append('    ' * (depth + 2) + 'total = total + j')
+    lines.append('    ' * (depth + 1) + '}')
+    for d in reversed(range(depth)):
+        lines.append('    ' * (d + 1) + '}')
+    lines += ['}', 'Println(total)']
+    return '\n'.join(lines)
+
+
+def long_script(scale: int) -> str:
+    lines = ['lt v0 = 0']
+    lines += [f'lt v{n} = v{n - 1} + {n % 10}' for n in range(1, 3000 * scale)]
+    lines.append(f'Println(v{3000 * scale - 1})')
+    return '\n'.join(lines)
+
+
+CORPUS: list[Bench] = [
+    Bench('loop_heavy', loop_heavy),
+    Bench('call_heavy', call_heavy),
+    Bench('branch_heavy', branch_heavy),
+    Bench('many_globals', many_globals),
+    Bench('deep_nesting', deep_nesting),
+    Bench('long_script', long_script, cold=True),
+]
+
+
+def clear_caches():
+    interpreter._parse_cache.clear()
+    interpreter.EXPR_CACHE.clear()
+
+
+def run_once(run: Callable[..., tuple[int, Any]], source: str, cold: bool) -> tuple[float, int]:
+    "Runs `source` once with its output captured, returns the wall time and the error code"
+    if cold: clear_caches()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        errcode, _ = run(source)
+        wall = time.perf_counter() - start
+    return wall, errcode
+
+
+def count_ops(source: str) -> int:
+    "Returns how many lines running `source` takes"
+    profiler = Profiler()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_code(source, profiler=profiler)
+    return sum(int(stats[0]) for stats in profiler.lines.values())
+
+
+def measure(bench: Bench, engine: str = 'tree', scale: int = 1, repeat: int = 5) -> dict[str, Any]:
+    "Runs a benchmark `repeat` times(after a warm up run) and once more under `tracemalloc`, returns its results"
+    run = ENGINES[engine]
+    source = bench.source(scale)
+    ops = count_ops(source)
+    _, errcode = run_once(run, source, bench.cold)
+    if errcode != 0: return {'name': bench.name, 'error': f"exited with error code {errcode}"}
+    walls = [run_once(run, source, bench.cold)[0] for _ in range(repeat)]
+
+    if bench.cold: clear_caches()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()): run(source)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+
+    best = min(walls)
+    return {
+        'name': bench.name,
+        'ops': ops,
+        'wall': best,
+        'wall_median': statistics.median(walls),
+        'ops_per_sec': ops / best if best else 0.0,
+        'peak_kib': peak / 1024,
+    }
+
+
+def compare(results: list[dict[str, Any]], baseline: dict[str, Any], threshold: float = 0.25) -> list[str]:
+    "Returns a message for every result that's slower(by best wall time) or uses more memory than in `baseline` by more than `threshold`(`0.25` is 25%)"
+    base = {r['name']: r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = base.get(r['name'])
+        if b is None or 'error' in b: continue
+        if 'error' in r:
+            regressions.append(f"{r['name']}: {r['error']}")
+            continue
+        for key, what in (('wall', 'wall time'), ('peak_kib', 'peak memory')):
+            if b[key] and r[key] > b[key] * (1 + threshold):
+                regressions.append(f"{r['name']}: {what} went from {b[key]:.4f} to {r[key]:.4f}({(r[key] / b[key] - 1) * 100:+.1f}%)")
+    return regressions
+
+
+def format_table(results: list[dict[str, Any]], baseline: dict[str, Any] | None = None) -> str:
+    base = {r['name']: r for r in baseline.get('results', [])} if baseline else {}
+    out = [f"{'benchmark':<14} {'ops':>9} {'wall(s)':>9} {'median(s)':>10} {'ops/sec':>11} {'peak(KiB)':>10}" + (f" {'vs base':>8}" if base else '')]
+    for r in results:
+        if 'error' in r:
+            out.append(f"{r['name']:<14} {r['error']}")
+            continue
+        line = f"{r['name']:<14} {r['ops']:>9} {r['wall']:>9.4f} {r['wall_median']:>10.4f} {r['ops_per_sec']:>11.0f} {r['peak_kib']:>10.1f}"
+        b = base.get(r['name'])
+        if b and 'error' not in b and b['wall']: line += f" {(r['wall'] / b['wall'] - 1) * 100:>+7.1f}%"
+        out.append(line)
+    return '\n'.join(out)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="benchmarks the CatScript engines")
+    parser.add_argument('names', nargs='*', help="the benchmarks to run(all of them if none are given)")
+    parser.add_argument('--engine', choices=list(ENGINES), default='tree')
+    parser.add_argument('--scale', type=int, default=1, help="how big the benchmarks are")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs of each benchmark, the best one counts")
+    parser.add_argument('--save', metavar='FILE', help="write the results to FILE as a baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare against the baseline in FILE, exit code 1 if anything regressed")
+    parser.add_argument('--threshold', type=float, default=0.25, help="how much worse than the baseline a result can be(0.25 is 25%%)")
+    args = parser.parse_args(argv)
+
+    known = {b.name: b for b in CORPUS}
+    unknown = [n for n in args.names if n not in known]
+    if unknown:
+        parser.error(f"unknown benchmarks {', '.join(unknown)}, choose from {', '.join(known)}")
+    benches = [known[n] for n in args.names] if args.names else CORPUS
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        if (baseline.get('engine'), baseline.get('scale')) != (args.engine, args.scale):
+            print(f"warning: the baseline is for engine '{baseline.get('engine')}' at scale {baseline.get('scale')}")
+
+    results = [measure(b, args.engine, args.scale, args.repeat) for b in benches]
+    print(format_table(results, baseline))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'engine': args.engine, 'scale': args.scale, 'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"saved the results to '{args.save}'")
+
+    failed = any('error' in r for r in results)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions: print(f"regression: {r}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
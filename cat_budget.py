@@ -0,0 +1,102 @@
+'''Execution budgets for CatScript, pass a `Budget` to `interpreter.run_code` as its `budget` to limit the run\n
+A budget can limit how many statements run(each iteration of a `for` loop counts as one too), how deep `fn` calls go,
+how long the run takes and, with `tracemalloc`, how much memory it allocates.
+Going over a limit stops the script with a `BudgetError`, and `counters()` returns what the run used either way\n
+Every limit is checked before each statement(and iteration), so a single slow line(like a long `Sleep()`) isn't cut short, the run stops before the next one.
+If the last line went over the time or memory limit, the run isn't stopped, but `counters()` still says which limit it went over.
+A run given a budget that's already running(like the iterations of a `pfor` loop) counts on with it, instead of starting it over'''
+from time import perf_counter
+from typing import Any, Callable
+import tracemalloc
+from interpreter import Error
+
+
+
+
+class Budget:
+    def __init__(self, max_statements: int | None = None, max_depth: int | None = None, timeout: float | None = None, max_memory: int | None = None, clock: Callable[[], float] = perf_counter) -> None:
+        "`timeout` is in seconds, `max_memory` is in bytes(allocated since the run started, as `tracemalloc` sees it)"
+        self.max_statements: int | None = max_statements
+        self.max_depth: int | None = max_depth
+        self.timeout: float | None = timeout
+        self.max_memory: int | None = max_memory
+        self.__clock: Callable[[], float] = clock
+        self.statements: int = 0
+        self.depth: int = 0
+        self.deepest: int = 0
+        self.elapsed: float = 0.0
+        self.peak_memory: int = 0
+        self.exceeded: str | None = None # which limit stopped the run(or the last line went over)
+        self.__start: float = 0.0
+        self.__deadline: float | None = None
+        self.__memory_base: int = 0
+        self.__traces: bool = False # if the budget started `tracemalloc`, and has to stop it
+        self.__runs: int = 0 # how many runs are using it, only the first one starts it and stops it
+
+    def __exceed(self, limit: str, details: str, ln: int | None) -> Error:
+        self.exceeded = limit
+        return Error('BudgetError', details, ln)
+
+    # called by `run_code`
+
+    def start(self):
+        self.__runs += 1
+        if self.__runs > 1: return
+        self.statements = self.depth = self.deepest = self.peak_memory = 0
+        self.elapsed = 0.0
+        self.exceeded = None
+        if self.max_memory is not None:
+            self.__traces = not tracemalloc.is_tracing()
+            if self.__traces: tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.__memory_base = tracemalloc.get_traced_memory()[0]
+        self.__start = self.__clock()
+        self.__deadline = self.__start + self.timeout if self.timeout is not None else None
+
+    def stop(self):
+        self.__runs -= 1
+        if self.__runs: return
+        self.elapsed = self.__clock() - self.__start
+        if self.exceeded is None and self.timeout is not None and self.elapsed > self.timeout: self.exceeded = 'timeout'
+        if self.max_memory is not None:
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1] - self.__memory_base)
+            if self.exceeded is None and self.peak_memory > self.max_memory: self.exceeded = 'memory'
+            if self.__traces: tracemalloc.stop()
+            self.__traces = False
+
+    def statement(self, ln: int | None) -> Error | None:
+        self.statements += 1
+        return self.check(ln)
+
+    def check(self, ln: int | None) -> Error | None:
+        "Checks every limit, returns the `BudgetError` of the first one that was gone over"
+        if self.max_statements is not None and self.statements > self.max_statements:
+            return self.__exceed('statements', f"ran more than {self.max_statements} statements", ln)
+        if self.__deadline is not None and self.__clock() > self.__deadline:
+            return self.__exceed('timeout', f"ran for more than {self.timeout} seconds", ln)
+        if self.max_memory is not None:
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1] - self.__memory_base)
+            if self.peak_memory > self.max_memory:
+                return self.__exceed('memory', f"allocated more than {self.max_memory} bytes", ln)
+        return None
+
+    def enter(self, ln: int | None) -> Error | None:
+        "A `fn` call is starting"
+        self.depth += 1
+        if self.depth > self.deepest: self.deepest = self.depth
+        if self.max_depth is not None and self.depth > self.max_depth:
+            return self.__exceed('depth', f"calls went more than {self.max_depth} deep", ln)
+        return None
+
+    def leave(self):
+        self.depth -= 1
+
+    def counters(self) -> dict[str, Any]:
+        "Returns what the last run used"
+        return {
+            'statements': self.statements,
+            'max_depth': self.deepest,
+            'elapsed': self.elapsed,
+            'peak_memory': self.peak_memory,
+            'exceeded': self.exceeded,
+        }
@@ -0,0 +1,89 @@
+'''An on-disk cache of parsed CatScript files, like Python's `.pyc` files\n
+`load_program()` keeps the parsed `Program` of a script in `__catcache__/<name>.catc` next to it,
+so running the same unchanged script again skips cleaning and parsing its lines'''
+from hashlib import sha256
+import os
+import pickle
+import sys
+from interpreter import Program, PARSER_VERSION, parse_program
+
+
+
+CACHE_DIR = '__catcache__'
+MAGIC = b'CATC'
+FORMAT_VERSION = 1
+
+
+def cache_path(path: str) -> str:
+    "Returns where the cache file of the script at `path` goes"
+    head, tail = os.path.split(os.path.abspath(path))
+    return os.path.join(head, CACHE_DIR, os.path.splitext(tail)[0] + '.catc')
+
+
+def _header(source_stat: os.stat_result, digest: bytes) -> dict[str, object]:
+    return {
+        'format': FORMAT_VERSION,
+        'parser': PARSER_VERSION,
+        'python': sys.version_info[:2],
+        'mtime': source_stat.st_mtime_ns,
+        'size': source_stat.st_size,
+        'hash': digest,
+    }
+
+
+def read_cache(path: str, source_stat: os.stat_result, source: bytes | None = None) -> Program | None:
+    '''Returns the cached `Program` of the script at `path`, or `None` if there isn't a valid one\n
+    The cache is valid if it was written by the same parser and Python version and the source's mtime and size match,
+    if only the mtime changed, the source's hash is compared instead(`source` is read if it isn't given), and if it matches the cache is written again with the new mtime,
+    so the next read doesn't hash the source again'''
+    stale_mtime = False
+    try:
+        with open(cache_path(path), 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC: return None
+            header = pickle.load(f)
+            if (header.get('format'), header.get('parser'), header.get('python')) != (FORMAT_VERSION, PARSER_VERSION, sys.version_info[:2]):
+                return None
+            if header.get('size') != source_stat.st_size: return None
+            if header.get('mtime') != source_stat.st_mtime_ns:
+                if source is None:
+                    with open(path, 'rb') as sf: source = sf.read()
+                if header.get('hash') != sha256(source).digest(): return None
+                stale_mtime = True
+            program = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(program, Program): return None
+    if stale_mtime: write_cache(path, source_stat, source, program)
+    return program
+
+
+def write_cache(path: str, source_stat: os.stat_result, source: bytes, program: Program) -> bool:
+    "Writes the cache file of the script at `path`, returns `False` if it couldn't be written(like a read-only directory)"
+    cpath = cache_path(path)
+    tmp = f"{cpath}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cpath), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC)
+            pickle.dump(_header(source_stat, sha256(source).digest()), f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(program, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cpath)
+    except Exception:
+        try: os.remove(tmp)
+        except OSError: pass
+        return False
+    return True
+
+
+def load_program(path: str, use_cache: bool = True) -> Program:
+    "Returns the parsed `Program` of the script at `path`, from its cache file if it's up to date, otherwise parsing it and updating the cache"
+    source_stat = os.stat(path)
+    if use_cache:
+        program = read_cache(path, source_stat)
+        if program is not None: return program
+
+    with open(path, 'rb') as f:
+        source = f.read()
+    program = parse_program(source.decode())
+    if use_cache: write_cache(path, source_stat, source, program)
+    return program
@@ -2,14 +2,21 @@ from typing import Any
 
 
 
+def format_printf(string: str, *insertions: Any) -> str:
+    "Fills the `{}`s in `string` with `insertions` in one pass, text that was inserted isn't searched for `{}`s again"
+    parts = string.split('{}')
+    if len(insertions) != len(parts) - 1:
+        raise Exception(f"expected {len(parts) - 1} {'argument' if len(parts) - 1 == 1 else 'arguments'}, but {len(insertions)} were given")
+
+    out = [parts[0]]
+    for i, part in zip(insertions, parts[1:]):
+        out.append(str(i))
+        out.append(part)
+    return ''.join(out)
+
+
 def printf(string: str, *insertions: Any):
-    if len(insertions) != string.count('{}'):
-        raise Exception(f"expected {string.count('{}')} {'argument' if string.count('{}') == 1 else 'arguments'}, but {len(insertions)} were given")
-    
-    for i in insertions:
-        string = string.replace('{}', str(i), 1)
-    
-    print(string, end='')
+    print(format_printf(string, *insertions), end='')
 
 
 def split_str_by_index(string: str, index: int, error_if_index_to_big: bool = True) -> tuple[str, str, str]:
@@ -0,0 +1,146 @@
+'''Tracing hooks and counters for CatScript, pass a `Hooks` to `interpreter.run_code`(or `evaluate()`, `Func.run()` or `Interpreter`) as its `hooks`\n
+Callbacks are registered with `hooks.on(event, callback)`, the events are
+`line`(ln): a line is about to run, `call_enter`(name, ln): a `fn` call starts on line `ln`, `call_exit`(name): it returned,
+`builtin`(name, ln): a builtin is called, `jump`(from_ln, to_ln): a `goto` or an if/elseif/else chain skipped lines,
+`error`(error, ln): the script stopped with an error. Lines are numbered like the script's source\n
+The counters(statements, calls, builtin calls, jumps, errors, the deepest the calls went and the hit rates of the caches) are kept for every run the hooks are passed to,
+`to_json()` and `to_prometheus()` dump them.
+When `run_code` isn't given hooks, all it costs is an `is not None` check per line and per builtin call, `for` loops only run as fast loops(see `cat_optimize`) without them'''
+import json
+from typing import Any, Callable
+from interpreter import Error, Func, Scope, EXPR_CACHE, parse_cache_stats
+
+
+
+EVENTS = ('line', 'call_enter', 'call_exit', 'builtin', 'jump', 'error')
+
+
+class Hooks:
+    def __init__(self, prefix: str = 'catscript') -> None:
+        "`prefix` starts the names of the Prometheus metrics"
+        self.prefix: str = prefix
+        self.listeners: dict[str, list[Callable[..., Any]]] = {event: [] for event in EVENTS}
+        self.runs: int = 0
+        self.statements: int = 0
+        self.calls: int = 0
+        self.builtin_calls: dict[str, int] = {}
+        self.jumps: int = 0
+        self.errors: int = 0
+        self.max_depth: int = 0
+        self.ln: int = 0 # the line running now, builtins are called from it
+        self.__stack: list[str] = [] # the names of the running calls
+        self.__bases: list[int] = [] # how many calls were running when each of the running `run_code`s started(`Func.run()` runs one inside of another)
+        self.__funcs: Scope | None = None # the functions of the last run, for the hit rates of their `memo fn` caches
+
+    def on(self, event: str, callback: Callable[..., Any]) -> Callable[..., Any]:
+        "Registers `callback` for `event`, returns it"
+        if event not in self.listeners: raise ValueError(f"unknown event '{event}', expected one of {', '.join(EVENTS)}")
+        self.listeners[event].append(callback)
+        return callback
+
+    def off(self, event: str, callback: Callable[..., Any]):
+        self.listeners[event].remove(callback)
+
+    # called by `run_code`
+
+    @property
+    def depth(self) -> int: return len(self.__stack)
+
+    def start(self, funcs: Scope):
+        self.runs += 1
+        if not self.__bases: self.__funcs = funcs
+        self.__bases.append(len(self.__stack))
+
+    def stop(self):
+        # after an error or `Exit()` the calls the run was in never returned
+        del self.__stack[self.__bases.pop():]
+
+    def line(self, ln: int):
+        self.statements += 1
+        self.ln = ln
+        for callback in self.listeners['line']: callback(ln)
+
+    def call(self, name: str, ln: int):
+        self.calls += 1
+        self.__stack.append(name)
+        if len(self.__stack) > self.max_depth: self.max_depth = len(self.__stack)
+        for callback in self.listeners['call_enter']: callback(name, ln)
+
+    def call_done(self):
+        name = self.__stack.pop()
+        for callback in self.listeners['call_exit']: callback(name)
+
+    def builtin(self, name: str):
+        self.builtin_calls[name] = self.builtin_calls.get(name, 0) + 1
+        for callback in self.listeners['builtin']: callback(name, self.ln)
+
+    def jump(self, from_ln: int, to_ln: int):
+        self.jumps += 1
+        for callback in self.listeners['jump']: callback(from_ln, to_ln)
+
+    def error(self, err: Error):
+        self.errors += 1
+        for callback in self.listeners['error']: callback(err, self.ln)
+
+    # counters
+
+    def caches(self) -> dict[str, dict[str, int]]:
+        "Returns the hits and misses of the expression cache, the parse cache and the `memo fn` caches of the last run"
+        memo = {'hits': 0, 'misses': 0}
+        if self.__funcs is not None:
+            for entry in self.__funcs.flatten().values():
+                stats = entry[1].memo_stats() if not entry[0] and isinstance(entry[1], Func) else None
+                if stats is None: continue
+                memo['hits'] += stats['hits']
+                memo['misses'] += stats['misses']
+        expr = EXPR_CACHE.stats()
+        parse = parse_cache_stats()
+        return {
+            'expr': {'hits': expr['hits'], 'misses': expr['misses']},
+            'parse': {'hits': parse['hits'], 'misses': parse['misses']},
+            'memo': memo,
+        }
+
+    def counters(self) -> dict[str, Any]:
+        caches = self.caches()
+        return {
+            'runs': self.runs,
+            'statements': self.statements,
+            'calls': self.calls,
+            'builtin_calls': dict(self.builtin_calls),
+            'jumps': self.jumps,
+            'errors': self.errors,
+            'max_depth': self.max_depth,
+            'caches': {name: {**stats, 'hit_rate': hit_rate(stats)} for name, stats in caches.items()},
+        }
+
+    def to_json(self) -> str: return json.dumps(self.counters(), indent=2)
+
+    def to_prometheus(self) -> str:
+        "Returns the counters in the Prometheus text format"
+        p = self.prefix
+        counters = self.counters()
+        out: list[str] = []
+
+        def metric(name: str, kind: str, help: str, samples: list[tuple[str, Any]]):
+            out.append(f"# HELP {p}_{name} {help}")
+            out.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples: out.append(f"{p}_{name}{labels} {value}")
+
+        metric('runs_total', 'counter', "Scripts run", [('', counters['runs'])])
+        metric('statements_total', 'counter', "Statements run", [('', counters['statements'])])
+        metric('calls_total', 'counter', "fn calls", [('', counters['calls'])])
+        metric('builtin_calls_total', 'counter', "Builtin calls", [(f'{{name="{name}"}}', n) for name, n in sorted(counters['builtin_calls'].items())])
+        metric('jumps_total', 'counter', "Jumps taken by goto and if/elseif/else chains", [('', counters['jumps'])])
+        metric('errors_total', 'counter', "Runs that stopped with an error", [('', counters['errors'])])
+        metric('call_depth_max', 'gauge', "The deepest the fn calls went", [('', counters['max_depth'])])
+        caches = counters['caches']
+        metric('cache_hits_total', 'counter', "Cache hits", [(f'{{cache="{name}"}}', s['hits']) for name, s in caches.items()])
+        metric('cache_misses_total', 'counter', "Cache misses", [(f'{{cache="{name}"}}', s['misses']) for name, s in caches.items()])
+        metric('cache_hit_ratio', 'gauge', "Cache hits out of lookups", [(f'{{cache="{name}"}}', s['hit_rate']) for name, s in caches.items()])
+        return '\n'.join(out) + '\n'
+
+
+def hit_rate(stats: dict[str, int]) -> float:
+    lookups = stats['hits'] + stats['misses']
+    return stats['hits'] / lookups if lookups else 0.0
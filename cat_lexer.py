@@ -0,0 +1,122 @@
+'''A tokenizer for CatScript, `tokenize()` splits the whole source into tokens in one pass\n
+Strings(with their escapes) and `//` comments are found once here, so nothing after this has to check whether a character is inside of a string.
+`true`, `false` and `null` are only turned into `True`, `False` and `None` where they're whole names, not inside of other names or strings'''
+import re
+
+
+
+NAME = 'name'
+NUMBER = 'number'
+STRING = 'string'
+OP = 'op'         # operators, brackets, braces, `,` and `.`
+ERROR = 'error'   # a character that can't start a token, like `'`
+
+LITERALS = {'true': 'True', 'false': 'False', 'null': 'None'}
+
+# each match is a token with the whitespace before it
+TOKEN_PATTERN = re.compile(r'''[ \t\r\f\v]*(?:
+    (?P<newline>\n)
+  | (?P<comment>//[^\n]*)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?)
+  | (?P<number>(?:0[xX][\da-fA-F_]+|0[bB][01_]+|0[oO][0-7_]+|(?:\d[\d_]*(?:\.[\d_]*)?|\.\d[\d_]*)(?:[eE][+-]?\d+)?[jJ]?))
+  | (?P<name>[^\W\d]\w*)
+  | (?P<op>\*\*=?|>>=?|<<=?|->|:=|[-+*/%&|^@<>!=]=|[-+*/%&|^~<>=.,:;@!()\[\]{}])
+  | (?P<error>.)
+)''', re.VERBOSE)
+
+
+class Token:
+    "A token, `start` and `end` are where it is in its cleaned line"
+    __slots__ = ('kind', 'text', 'start', 'end')
+
+    def __init__(self, kind: str, text: str, start: int, end: int) -> None:
+        self.kind: str = kind
+        self.text: str = text
+        self.start: int = start
+        self.end: int = end
+
+    def __repr__(self) -> str: return f"Token({self.kind}, {self.text!r})"
+
+
+def tokenize(text: str) -> tuple[list[str], list[list[Token]]]:
+    '''Returns the cleaned lines of `text`(without comments and the whitespace around them) and the tokens of each line\n
+    The cleaned lines are the same length as the source they came from, so a token's `start` and `end` can slice its line'''
+    lines: list[str] = []
+    tokens: list[list[Token]] = []
+    line: list[Token] = []
+    literals: list[Token] = []
+    for m in TOKEN_PATTERN.finditer(text + '\n'):
+        kind = m.lastgroup
+        if kind == 'comment': continue
+        if kind == 'newline':
+            if line:
+                base = line[0].start
+                cleaned = text[base:line[-1].end]
+                for tok in literals:
+                    at = tok.start - base
+                    cleaned = cleaned[:at] + tok.text + cleaned[at + len(tok.text):]
+                for tok in line:
+                    tok.start -= base
+                    tok.end -= base
+                lines.append(cleaned)
+                literals = []
+            else: lines.append('')
+            tokens.append(line)
+            line = []
+            continue
+        start, end = m.span(kind)
+        value = text[start:end]
+        if kind == 'name' and value in LITERALS:
+            line.append(tok := Token(NAME, LITERALS[value], start, end))
+            literals.append(tok)
+        else: line.append(Token(kind, value, start, end))
+    if text.endswith('\n') or not text:
+        lines.pop()
+        tokens.pop()
+    return lines, tokens
+
+
+def closing_bracket(tokens: list[Token], index: int) -> int:
+    "Returns the index of the bracket that closes the one at `index`, or `-1` if it isn't closed"
+    depth = 0
+    for n in range(index, len(tokens)):
+        text = tokens[n].text
+        if tokens[n].kind != OP: continue
+        if text in '([{': depth += 1
+        elif text in ')]}':
+            depth -= 1
+            if not depth: return n
+    return -1
+
+
+def split_tokens(tokens: list[Token], sep: str = ',') -> list[list[Token]]:
+    "Splits `tokens` at each `sep` that isn't inside of brackets"
+    out: list[list[Token]] = [[]]
+    depth = 0
+    for tok in tokens:
+        if tok.kind == OP:
+            text = tok.text
+            if text in '([{': depth += 1
+            elif text in ')]}': depth -= 1
+            elif text == sep and not depth:
+                out.append([])
+                continue
+        out[-1].append(tok)
+    return out
+
+
+def find_token(tokens: list[Token], text: str, start: int = 0) -> int:
+    "Returns the index of the first `text` operator from `start` that isn't inside of brackets, or `-1`"
+    depth = 0
+    for n in range(start, len(tokens)):
+        tok = tokens[n]
+        if tok.kind != OP: continue
+        if tok.text in '([{': depth += 1
+        elif tok.text in ')]}': depth -= 1
+        elif tok.text == text and not depth: return n
+    return -1
+
+
+def span(line: str, tokens: list[Token]) -> str:
+    "Returns the source of `tokens`(part of `line`)"
+    return line[tokens[0].start:tokens[-1].end] if tokens else ''
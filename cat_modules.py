@@ -0,0 +1,143 @@
+'''Modules for CatScript, `import "path"` runs another `.cat` file and puts what it defined under a namespace\n
+`import "lib/strings.cat"` makes the variable `strings`, `strings.Name` is a variable of the module and `strings.Name(args)` calls one of its fns
+(`import "lib/strings.cat" as s` names it `s` instead). Names starting with `_` are private to the module.
+An imported fn runs with its module's variables and fns instead of its caller's, like a Python function with its module's globals\n
+A module is parsed(with `cat_cache`, so it's only parsed again when it changes) and run once, and kept in a `ModuleCache` by its resolved path and mtime,
+so every script a process(or an `Interpreter`) runs that imports it gets the same module without running its `fn` definitions again.
+A module is looked for next to the module importing it, then in the directories of `SEARCH_PATH` and then in the current directory.
+While a module runs its path is on `used_stack`, so `IsMain()` is `false` in it and a module importing one that's still being imported is an error'''
+import os
+from typing import Any
+from interpreter import Error, Signal, Func, Scope, Program, EXIT, run_code
+from cat_cache import load_program
+from cat_output import OutputSink
+
+
+
+EXTENSION = '.cat'
+
+SEARCH_PATH: list[str] = [] # directories modules are looked for in, `run.py` puts the script's directory here
+
+
+class Module:
+    "An imported module, the variables its code made and the fns it defined(`funcs`, entries like a functions scope's)"
+    __slots__ = ('path', 'mtime', 'vars', 'funcs')
+
+    def __init__(self, path: str, mtime: int, vars: Scope, funcs: dict[str, tuple[bool, Any]]) -> None:
+        self.path: str = path
+        self.mtime: int = mtime
+        self.vars: Scope = vars
+        self.funcs: dict[str, tuple[bool, Any]] = funcs
+
+    def scopes(self, inputs: list[tuple[str, Any]], funcs: Scope, code: Program) -> tuple[Scope, Scope]:
+        "Returns the scopes a call to one of the module's fns runs with, `funcs` are the caller's, only its builtins(the outermost scope) are used"
+        root = funcs
+        while root.parent is not None: root = root.parent
+        return Scope(inputs, self.vars), code.funcs_scope(Scope(self.funcs, root))
+
+    def __repr__(self) -> str: return f"Module({self.path!r})"
+
+
+class Namespace:
+    "The value of the variable an `import` makes"
+    __slots__ = ('__name', '__module')
+
+    def __init__(self, name: str, module: Module) -> None:
+        self.__name: str = name
+        self.__module: Module = module
+
+    def _module(self) -> Module: return self.__module
+
+    def __getattr__(self, attr: str) -> Any:
+        "A variable of the module, or for a fn the name it's called by(so `Map(values, name.Fn)` works)"
+        if attr.startswith('_'): raise AttributeError(f"'{attr}' is private to its module")
+        module = self.__module
+        if dict.__contains__(module.vars, attr): return module.vars[attr]
+        if attr in module.funcs: return f'{self.__name}.{attr}'
+        raise AttributeError(f"module '{self.__name}' has no variable or fn '{attr}'")
+
+    def __repr__(self) -> str: return f"<module '{self.__name}' from '{self.__module.path}'>"
+
+
+class ModuleCache:
+    "The modules a process or `Interpreter` has imported, by their resolved paths"
+    def __init__(self) -> None:
+        self.__modules: dict[str, Module] = {}
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    def load(self, path: str, funcs: Scope, used_stack: list[str], output: OutputSink | None, ln: int) -> tuple[Module | None, Error | Signal | None]:
+        '''Returns the module at `path`(a resolved path), running it if it isn't cached or its file changed since\n
+        It runs with the builtins of `funcs`(the importer's functions) and writes to `output`, an error in it is printed and the import fails'''
+        try: mtime = os.stat(path).st_mtime_ns
+        except OSError as e: return None, Error('ImportError', f"cannot import '{path}'({e.strerror})", ln)
+        module = self.__modules.get(path)
+        if module is not None and module.mtime == mtime:
+            self.__hits += 1
+            return module, None
+        self.__misses += 1
+        if path in used_stack:
+            chain = used_stack[used_stack.index(path):] + [path]
+            return None, Error('ImportError', f"cyclic import {' -> '.join(repr(os.path.basename(p)) for p in chain)}", ln)
+        try: program = load_program(path)
+        except (OSError, UnicodeDecodeError) as e: return None, Error('ImportError', f"cannot read '{path}'({e})", ln)
+
+        root = funcs
+        while root.parent is not None: root = root.parent
+        vars = Scope()
+        mod_funcs = Scope(parent=Scope({name: entry for name, entry in dict.items(root) if entry[0]}))
+        used_stack.append(path)
+        try: errcode, _ = run_code(program, used_stack, False, vars, mod_funcs, output=output, modules=self)
+        finally: del used_stack[used_stack.index(path):]
+        if errcode == 1: return None, EXIT
+        if errcode == -1: return None, Error('ImportError', f"'{path}' stopped with an error", ln)
+
+        module = Module(path, mtime, vars, {name: entry for name, entry in dict.items(mod_funcs) if not entry[0]})
+        for _, func in module.funcs.values():
+            # the fns of the modules it imported already have theirs
+            if isinstance(func, Func) and func.module is None: func.module = module
+        self.__modules[path] = module
+        return module, None
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.__hits, 'misses': self.__misses, 'size': len(self.__modules)}
+
+    def clear(self):
+        self.__modules.clear()
+        self.__hits = self.__misses = 0
+
+    def __len__(self) -> int: return len(self.__modules)
+
+MODULES = ModuleCache()
+
+
+def resolve(path: str, used_stack: list[str]) -> str | None:
+    "Returns the resolved path of the module `path`(`.cat` is added if it has no extension), or `None` if it isn't found"
+    if not os.path.splitext(path)[1]: path += EXTENSION
+    if os.path.isabs(path): dirs = ['']
+    else: dirs = ([os.path.dirname(used_stack[-1])] if used_stack else []) + SEARCH_PATH + [os.getcwd()]
+    for directory in dirs:
+        full = os.path.join(directory, path)
+        if os.path.isfile(full): return os.path.realpath(full)
+    return None
+
+
+def import_module(path: str, name: str, vars: Scope, funcs: Scope, used_stack: list[str] | None = None, output: OutputSink | None = None, cache: ModuleCache | None = None, ln: int | None = None) -> Error | Signal | None:
+    "Imports the module at `path` as `name` into the scopes `vars` and `funcs`, `cache` is `MODULES` by default"
+    if used_stack is None: used_stack = []
+    if cache is None: cache = MODULES
+    resolved = resolve(path, used_stack)
+    if resolved is None: return Error('ImportError', f"module '{path}' not found", ln)
+    module, err = cache.load(resolved, funcs, used_stack, output, ln)
+    if err: return err
+
+    # importing the same module again(like in a loop) is fine, and picks up a new version of it
+    owner = vars.owner(name)
+    if owner is not None and not (isinstance(owner[name], Namespace) and owner[name]._module().path == resolved):
+        return Error('VariableError', f"cannot import '{path}' as '{name}', a variable with that name already exists", ln)
+    (owner if owner is not None else vars)[name] = Namespace(name, module)
+    for fn, entry in module.funcs.items():
+        if '.' in fn: continue # a fn of a module it imported
+        key = f'{name}.{fn}'
+        (funcs.owner(key) or funcs)[key] = entry
+    return None
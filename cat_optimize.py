@@ -0,0 +1,361 @@
+'''An optimizer pass over parsed CatScript, `parse_program` runs `optimize()` on every program it parses\n
+Constant folding: an `lt` variable that is never assigned to again anywhere in the script(and whose value only uses literals and other such variables)
+is a constant, and its value is put straight into the expressions in the `for` bodies after it, where Python folds it into whatever it's used with.
+It's skipped for a whole script that calls a function it doesn't define(other than the builtins), since that function could assign to the variable\n
+Fast loops: a `for` loop whose body only has `lt`s, assignments, expressions and if/elseif/else chains(no calls to `fn`s, `goto`, `return`, nested loops or `fn` definitions)
+is compiled into a single Python function the first time it runs, where the loop variable and the variables the body uses are local variables
+instead of a new `Scope` for every iteration. The variables it assigned to are written back when it stops.
+If a name the body calls turns out to be a `fn`, or anything else would make the loop run differently, it runs as a normal loop instead'''
+import ast
+import builtins
+from collections import Counter
+import math
+import re
+from typing import Any, Callable
+from interpreter import Error, Signal, Scope, Program, Expr, ExprStmt, LetStmt, AssignStmt, FnDef, ForStmt, PforStmt, IfChain, ElseStmt, Goto, ImportStmt, SCOPED_BUILTINS, ScopedBuiltin, cached_expr, call_name, make_builtins, _hoist_calls
+
+
+
+# functions that see or change the variables of the code calling them, a script using these isn't optimized
+DYNAMIC_NAMES = frozenset({'eval', 'exec', 'globals', 'locals', 'vars', 'dir', '__import__', 'breakpoint'})
+DYNAMIC_PATTERN = re.compile(r'\b(?:' + '|'.join(DYNAMIC_NAMES) + r')\b|:=')
+
+# functions that can't assign to(or see) the script's variables
+KNOWN_FUNCS = (frozenset(make_builtins()) - SCOPED_BUILTINS) | frozenset(name for name in dir(builtins) if name not in DYNAMIC_NAMES)
+
+CONSTANT_TYPES = (bool, int, float, str, type(None))
+
+
+def optimize(program: Program) -> Program:
+    "Folds the constants of a parsed script and marks the `for` loops that can run as fast loops, in place"
+    fold_constants(program)
+    mark_fast_loops(program)
+    return program
+
+
+# constant folding
+
+def _scan(program: Program, assigned: Counter, called: set[str], defined: set[str]) -> bool:
+    "Counts the assignments to each name in `program` and everything in it, collects the names it calls and the `fn`s it defines, returns `False` if it uses `DYNAMIC_NAMES`"
+    for node in program.nodes:
+        if node is None: continue
+        for expr in node.exprs:
+            if DYNAMIC_PATTERN.search(expr.source): return False
+            called.update(site.name for site in expr.sites)
+        if isinstance(node, LetStmt): assigned[node.name] += 1
+        elif isinstance(node, (AssignStmt, ImportStmt)): assigned[node.name] += 2
+        elif isinstance(node, (ForStmt, FnDef)) and node.body is not None:
+            if isinstance(node, ForStmt): assigned[node.var] += 2
+            if isinstance(node, PforStmt) and node.into is not None: assigned[node.into] += 2
+            if isinstance(node, FnDef): defined.add(node.name)
+            if not _scan(node.body, assigned, called, defined): return False
+    return True
+
+
+def _constant(expr: Expr, consts: dict[str, Any]) -> tuple[bool, Any]:
+    "Returns whether `expr` is made of literals and `consts` only, and its value"
+    if expr.code is None or expr.sites or '**' in expr.source: return False, None
+    if not all(name in consts for name in expr.code.co_names): return False, None
+    try: value = eval(expr.code, {'__builtins__': {}}, consts)
+    except Exception: return False, None
+    if type(value) not in CONSTANT_TYPES or (type(value) is float and not math.isfinite(value)): return False, None
+    return True, value
+
+
+class _Inline(ast.NodeTransformer):
+    "Replaces the names of constants with their values, except inside of lambdas and comprehensions(which can have their own variables with the same names)"
+    def __init__(self, consts: dict[str, Any]) -> None:
+        self.consts: dict[str, Any] = consts
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if not isinstance(node.ctx, ast.Load) or node.id not in self.consts: return node
+        value = self.consts[node.id]
+        # a negative number is written as `-n`, so `x ** 2` doesn't become `-n ** 2`
+        if type(value) in (int, float) and value < 0: return ast.copy_location(ast.UnaryOp(ast.USub(), ast.Constant(-value)), node)
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        # the name of a function stays a name, so the call is still a call
+        node.args = [self.visit(a) for a in node.args]
+        node.keywords = [self.visit(k) for k in node.keywords]
+        if not isinstance(node.func, ast.Name): node.func = self.visit(node.func)
+        return node
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.AST: return node
+    def visit_ListComp(self, node: ast.ListComp) -> ast.AST: return node
+    def visit_SetComp(self, node: ast.SetComp) -> ast.AST: return node
+    def visit_DictComp(self, node: ast.DictComp) -> ast.AST: return node
+    def visit_GeneratorExp(self, node: ast.GeneratorExp) -> ast.AST: return node
+
+
+def _names(expr: Expr) -> set[str]:
+    "Returns the names `expr` looks up"
+    out = set(expr.code.co_names) if expr.code is not None else set()
+    for site in expr.sites:
+        out.update(site.fallback.co_names)
+    return out
+
+
+def _substitute(expr: Expr, consts: dict[str, Any]) -> Expr:
+    if expr.exc is not None or not (_names(expr) & consts.keys()): return expr
+    tree = _Inline(consts).visit(ast.parse(expr.source, '<string>', 'eval'))
+    return cached_expr(ast.unparse(tree))
+
+
+def _conditional_lines(program: Program) -> set[int]:
+    "Returns the lines of `program` inside of if/elseif/else chains, which might not run"
+    out: set[int] = set()
+    for node in program.nodes:
+        if isinstance(node, IfChain) and node.end != -1 and not node.err: out.update(range(node.ln + 1, node.end))
+    return out
+
+
+def _propagate(program: Program, consts: dict[str, Any], assigned: Counter, in_loop: bool):
+    consts = dict(consts)
+    # with a `goto` the lines after an `lt` can run without it
+    records = not any(isinstance(node, Goto) for node in program.nodes)
+    conditional = _conditional_lines(program) if records else set()
+    for node in program.nodes:
+        if node is None: continue
+        if in_loop and consts and node.exprs: node.exprs = tuple(_substitute(expr, consts) for expr in node.exprs)
+        if isinstance(node, LetStmt):
+            if records and node.ln not in conditional and assigned[node.name] == 1:
+                is_constant, value = _constant(node.exprs[0], consts)
+                if is_constant: consts[node.name] = value
+        elif isinstance(node, ForStmt) and node.body is not None: _propagate(node.body, consts, assigned, True)
+        # a function can be called from anywhere, so its body starts without the constants around it
+        elif isinstance(node, FnDef) and node.body is not None: _propagate(node.body, {}, assigned, False)
+
+
+def fold_constants(program: Program):
+    "Puts the values of constant `lt` variables into the expressions of the `for` bodies that use them"
+    assigned: Counter = Counter()
+    called: set[str] = set()
+    defined: set[str] = set()
+    if not _scan(program, assigned, called, defined): return
+    if not called <= defined | KNOWN_FUNCS: return
+    _propagate(program, {}, assigned, False)
+
+
+# fast loops
+
+FAST_NODES = (LetStmt, AssignStmt, ExprStmt, IfChain, ElseStmt) # `Call` is an `ExprStmt`
+
+
+def _simple(body: Program) -> bool:
+    "If `body` only has the kinds of lines a fast loop can run"
+    for node in body.nodes:
+        if node is None: continue
+        if not isinstance(node, FAST_NODES) or getattr(node, 'err', None) is not None: return False
+    return True
+
+
+def mark_fast_loops(program: Program):
+    for node in program.nodes:
+        if isinstance(node, (ForStmt, FnDef)) and node.body is not None:
+            if type(node) is ForStmt and _simple(node.body): node.fast = FastLoop(node.var, node.body)
+            mark_fast_loops(node.body)
+
+
+class _Fallback(Exception):
+    "The body can't run as a fast loop"
+
+
+def _site(node: ast.Call, temp: str) -> tuple[str, list[str], str, str]:
+    return call_name(node), [ast.unparse(a) for a in node.args], ast.unparse(node), temp
+
+
+class _Plan:
+    "What the body of a fast loop does, worked out once from its lines"
+    __slots__ = ('stmts', 'lets', 'assigned', 'reads', 'calls', 'defined')
+
+    def __init__(self, var: str, body: Program) -> None:
+        self.lets: list[str] = [node.name for node in body.nodes if isinstance(node, LetStmt)]
+        self.assigned: list[str] = [] # outer variables the body assigns to, in the order they're first assigned
+        self.reads: list[str] = []    # every name the body looks up that isn't its own, if they're variables they're passed in
+        self.calls: list[str] = []    # the names of the calls, builtins are passed in
+        self.defined: set[str] = set() # the `lt` variables planned so far
+        if var in self.lets or len(set(self.lets)) != len(self.lets): raise _Fallback
+        self.stmts: list[tuple] = self.__lines(body, var, 1, len(body.nodes) + 1, True)
+
+    def __expr(self, expr: Expr, ln: int) -> tuple[list[tuple[str, list[str], str, str]], str | None]:
+        if expr.exc is not None: raise _Fallback
+        tree = ast.parse(expr.source, '<string>', 'eval')
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom)): raise _Fallback
+            if isinstance(node, ast.Name):
+                name = node.id
+                if name in DYNAMIC_NAMES or name.startswith('__cat_'): raise _Fallback
+                # an `lt` variable used before its `lt` line is the outer variable with the same name, or an error
+                if name in self.lets and name not in self.defined: raise _Fallback
+                if name not in self.lets and name not in self.reads: self.reads.append(name)
+        sites: list[tuple[str, list[str], str, str]] = []
+        body = _hoist_calls(tree.body, sites, _site)
+        for site in sites:
+            if site[0] not in self.calls: self.calls.append(site[0])
+        if sites and isinstance(body, ast.Name) and body.id == sites[-1][3]: return sites, None
+        return sites, ast.unparse(body)
+
+    def __lines(self, body: Program, var: str, start: int, stop: int, top: bool) -> list[tuple]:
+        "Plans the lines `start` to `stop`(not included) of `body`"
+        out: list[tuple] = []
+        ln = start
+        while ln < stop:
+            node = body.nodes[ln - 1]
+            if node is None:
+                ln += 1
+                continue
+            if isinstance(node, IfChain):
+                out.append(self.__chain(body, var, node))
+                ln = node.end + 1
+                continue
+            if isinstance(node, ElseStmt) or type(node) is ExprStmt and node.source == '}': raise _Fallback
+            if isinstance(node, LetStmt):
+                # an `lt` that only sometimes runs can't be a local variable
+                if not top: raise _Fallback
+                out.append(('let', node.ln, node.name, self.__expr(node.exprs[0], node.ln)))
+                self.defined.add(node.name)
+            elif isinstance(node, AssignStmt):
+                if node.name in self.lets and node.name not in self.defined: raise _Fallback
+                out.append(('assign', node.ln, node.name, self.__expr(node.exprs[0], node.ln)))
+                if node.name != var and node.name not in self.lets and node.name not in self.assigned: self.assigned.append(node.name)
+                if node.name not in self.lets and node.name not in self.reads: self.reads.append(node.name)
+            else: out.append(('expr', node.ln, self.__expr(node.exprs[0], node.ln)))
+            ln += 1
+        return out
+
+    def __chain(self, body: Program, var: str, node: IfChain) -> tuple:
+        "Plans an if/elseif/else chain from its `if` or `elseif` line"
+        cond = self.__expr(node.exprs[0], node.ln)
+        then = self.__lines(body, var, node.ln + 1, node.next if node.next != -1 else node.end, False)
+        otherwise: list[tuple] = []
+        if node.next != -1:
+            branch = body.nodes[node.next - 1]
+            if isinstance(branch, IfChain): otherwise = [self.__chain(body, var, branch)]
+            elif isinstance(branch, ElseStmt): otherwise = self.__lines(body, var, branch.ln + 1, branch.end, False)
+            else: raise _Fallback
+        return ('if', node.ln, cond, then, otherwise)
+
+
+def _codegen(plan: _Plan, var: str, outer_var: bool, passed: list[str], builtin_calls: dict[str, str]) -> str:
+    "Writes the Python source of a fast loop, `passed` are the variables passed in and `builtin_calls` the local names of the builtins it calls"
+    target = var if var != '_' else '__cat_i'
+    assigned = plan.assigned + [var] if outer_var else plan.assigned
+    out = [f"def __cat_loop(__cat_start, __cat_stop, __cat_out{''.join(', ' + name for name in passed)}{''.join(', ' + name for name in builtin_calls.values())}):",
+           '    try:',
+           f'        for {target} in range(__cat_start, __cat_stop):',
+           '            pass']
+
+    def fail(kind: str, ln: int, depth: str) -> str: return f"{depth}except Exception as __cat_e: return __cat_Error({kind!r}, __cat_e, {ln})"
+
+    def expr(ex: tuple, ln: int, depth: str) -> str:
+        "Writes the calls of an expression, returns the Python expression for its value"
+        sites, source = ex
+        for name, args, call, temp in sites:
+            if name in builtin_calls:
+                for n, arg in enumerate(args):
+                    out.append(f'{depth}try: __cat_a{n} = {arg}')
+                    out.append(fail('EvalError', ln, depth))
+                out.append(f"{depth}try: {temp}, __cat_err = {builtin_calls[name]}({ln}{''.join(f', __cat_a{n}' for n in range(len(args)))})")
+                out.append(fail('FuncError', ln, depth))
+                out.append(f'{depth}if __cat_err: return __cat_err')
+            else:
+                out.append(f'{depth}try: {temp} = {call}')
+                out.append(fail('EvalError', ln, depth))
+        return source if source is not None else sites[-1][3]
+
+    def lines(stmts: list[tuple], depth: str):
+        for stmt in stmts:
+            kind, ln = stmt[0], stmt[1]
+            if kind == 'if':
+                value = expr(stmt[2], ln, depth)
+                if stmt[2][1] is None: out.append(f'{depth}if {value}:')
+                else:
+                    out.append(f'{depth}try: __cat_c = {value}')
+                    out.append(fail('EvalError', ln, depth))
+                    out.append(f'{depth}if __cat_c:')
+                out.append(f'{depth}    pass')
+                lines(stmt[3], depth + '    ')
+                if stmt[4]:
+                    out.append(f'{depth}else:')
+                    lines(stmt[4], depth + '    ')
+                continue
+            ex = stmt[-1]
+            value = expr(ex, ln, depth)
+            if kind == 'expr':
+                if ex[1] is None: continue
+                out.append(f'{depth}try: {value}')
+            elif ex[1] is None: out.append(f'{depth}{stmt[2]} = {value}')
+            else: out.append(f'{depth}try: {stmt[2]} = {value}')
+            out.append(fail('EvalError', ln, depth))
+
+    lines(plan.stmts, '            ')
+    out.append('    finally:')
+    out.append(f"        __cat_out.extend(({''.join(name + ', ' for name in assigned)}))")
+    out.append('    return None')
+    return '\n'.join(out)
+
+
+class FastLoop:
+    '''The body of a `for` loop that might run as a single Python function(see the module's docstring)\n
+    It's planned the first time the loop runs, and compiled for each combination of which of its names are variables and which of its calls are builtins'''
+    __slots__ = ('var', 'body', 'plan', 'compiled')
+
+    def __init__(self, var: str, body: Program) -> None:
+        self.var: str = var
+        self.body: Program = body
+        self.plan: _Plan | bool | None = None # `False` if the body can't run as a fast loop after all
+        self.compiled: dict[tuple[Any, ...], Callable[..., Any]] = {}
+
+    def __getstate__(self): return (self.var, self.body)
+
+    def __setstate__(self, state):
+        self.var, self.body = state
+        self.plan = None
+        self.compiled = {}
+
+    def run(self, start: int, stop: int, vars: Scope, funcs: Scope) -> tuple[bool, Error | Signal | None]:
+        '''Runs the loop over `range(start, stop)` with the variables `vars` and functions `funcs` around it,
+        returns `False` if it has to run as a normal loop instead(and nothing ran), otherwise `True` and the error or signal the body stopped with'''
+        plan = self.plan
+        if plan is None:
+            try: plan = _Plan(self.var, self.body)
+            except _Fallback: plan = False
+            self.plan = plan
+        if plan is False: return False, None
+
+        var = self.var
+        var_owner = vars.owner(var) if var != '_' else None
+        for name in plan.lets:
+            if name in vars: return False, None # the `lt` errors
+        owners: list[Scope] = []
+        for name in plan.assigned:
+            owner = vars.owner(name)
+            if owner is None: return False, None # the assignment errors
+            owners.append(owner)
+        if var_owner is not None: owners.append(var_owner)
+        builtin_funcs: list[Callable[..., Any]] = []
+        is_builtin: list[bool] = []
+        for name in plan.calls:
+            entry = funcs.get(name)
+            if entry is not None:
+                # a fn(even through `Map`) or `Snapshot` could use the variables the loop hasn't written back yet
+                if not entry[0] or type(entry[1]) is ScopedBuiltin: return False, None
+                builtin_funcs.append(entry[1])
+            is_builtin.append(entry is not None)
+        passed = [name for name in plan.reads if name in vars]
+        if var_owner is not None and var not in passed: passed.append(var)
+
+        key = (tuple(passed), tuple(is_builtin))
+        func = self.compiled.get(key)
+        if func is None:
+            builtin_calls = {name: f'__cat_f{n}' for n, name in enumerate(name for name, b in zip(plan.calls, is_builtin) if b)}
+            namespace: dict[str, Any] = {'__cat_Error': Error}
+            exec(compile(_codegen(plan, var, var_owner is not None, passed, builtin_calls), '<fast loop>', 'exec'), namespace)
+            func = self.compiled[key] = namespace['__cat_loop']
+
+        out: list[Any] = []
+        err = func(start, stop, out, *[vars[name] for name in passed], *builtin_funcs)
+        names = plan.assigned + [var] if var_owner is not None else plan.assigned
+        for owner, name, value in zip(owners, names, out): owner[name] = value
+        return True, err
@@ -0,0 +1,102 @@
+'''Where `Println` and `Printf` write to\n
+An `OutputSink` collects what's written and writes it to its stream in one go once `buffer_size` characters are waiting,
+`run_code` flushes it when the script ends or errors and before `GetText` and `Sleep`.
+While a script runs, what Python's `print()` in an expression writes goes through its sink too(see `capture()`), so it stays in order with `Println`.
+That's kept per context(thread or asyncio task), so scripts running at the same time each keep their own output'''
+from contextvars import ContextVar
+import io
+import sys
+from typing import Any, TextIO
+
+
+
+DEFAULT_BUFFER_SIZE = 8192
+
+# the sink capturing what's printed in the current context and the capture it's inside of, `(sink, outer)`
+_capturing: ContextVar[tuple['OutputSink', Any] | None] = ContextVar('cat_output_capturing', default=None)
+
+
+class _Redirect:
+    "Stands in for `sys.stdout`, what's written to it goes to the sink capturing the current context, or to `inner`(what `sys.stdout` was) if none is"
+    def __init__(self, inner: TextIO) -> None:
+        self.inner: TextIO = inner
+
+    def target(self) -> Any:
+        capture = _capturing.get()
+        return capture[0] if capture is not None else self.inner
+
+    def write(self, text: str): return self.target().write(text)
+
+    def flush(self): self.target().flush()
+
+    def __getattr__(self, name: str) -> Any: return getattr(self.inner, name)
+
+
+def _stdout() -> TextIO:
+    "Returns `sys.stdout`, without the `_Redirect`s around it"
+    stream = sys.stdout
+    while isinstance(stream, _Redirect): stream = stream.inner
+    return stream
+
+
+class OutputSink:
+    '''Buffers text for `stream`(`sys.stdout` at the time of each flush if it isn't given), a `buffer_size` of `0` writes everything straight away\n
+    Use `to_file()` or `to_memory()` to send the output somewhere else, and `capture()` to send what Python prints through it'''
+    def __init__(self, stream: TextIO | None = None, buffer_size: int = DEFAULT_BUFFER_SIZE, owns_stream: bool = False) -> None:
+        # a sink writing to the `_Redirect` would write to itself while it captures
+        self.__stream: TextIO | None = stream.inner if isinstance(stream, _Redirect) else stream
+        self.__owns_stream: bool = owns_stream
+        self.__parts: list[str] = []
+        self.__size: int = 0
+        self.buffer_size: int = buffer_size
+
+    @classmethod
+    def to_file(cls, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, mode: str = 'w', encoding: str = 'utf-8') -> 'OutputSink':
+        "Returns a sink writing to the file at `path`, `close()` it when done"
+        return cls(open(path, mode, encoding=encoding), buffer_size, True)
+
+    @classmethod
+    def to_memory(cls, buffer_size: int = DEFAULT_BUFFER_SIZE) -> 'OutputSink':
+        "Returns a sink writing to a `StringIO`, `getvalue()` returns everything written to it"
+        return cls(io.StringIO(), buffer_size, True)
+
+    def stream(self) -> TextIO:
+        return self.__stream if self.__stream is not None else _stdout()
+
+    def capture(self):
+        '''Sends what Python prints in the current context(thread or asyncio task) through the sink until `release()` is called,
+        so it's buffered in order with the rest of the output. Calls nest, and the other contexts aren't affected'''
+        if not isinstance(sys.stdout, _Redirect): sys.stdout = _Redirect(sys.stdout)
+        _capturing.set((self, _capturing.get()))
+
+    def release(self):
+        "Ends the last `capture()` of the current context"
+        capture = _capturing.get()
+        if capture is not None: _capturing.set(capture[1])
+
+    def write(self, text: str):
+        self.__parts.append(text)
+        self.__size += len(text)
+        if self.__size >= self.buffer_size: self.flush()
+
+    def flush(self):
+        if not self.__parts: return
+        stream = self.stream()
+        stream.write(''.join(self.__parts))
+        self.__parts.clear()
+        self.__size = 0
+        stream.flush()
+
+    def getvalue(self) -> str:
+        "Returns everything written so far, for a sink made with `to_memory()`"
+        self.flush()
+        return self.stream().getvalue()
+
+    def close(self):
+        self.flush()
+        if self.__owns_stream and not isinstance(self.__stream, io.StringIO): self.__stream.close()
+
+    def __enter__(self) -> 'OutputSink': return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,156 @@
+'''Runs `pfor` loops on a process pool\n
+`pfor i = start, end {` runs its body like a `for` loop, but the range is split into chunks that run in parallel on a `ProcessPoolExecutor`.
+`pfor i = start, end into name {` also puts the values the body passed to `Collect()` in the list `name`, in the order of the iterations\n
+Every iteration starts with the variables and functions of the code around the loop as they were when it started, so assigning to an outer variable only lasts for that iteration,
+they(and the body) are pickled to be sent to the workers, and the workers only have the standard builtins(made again in the worker, like Python's).
+The output of each chunk is captured and written after the chunks before it, so it's the same as if the loop ran in order.
+A run with a `Budget` or `Hooks` runs the chunks in its own process, under them, so a loop can't get around the budget\n
+`configure()` sets how many workers there are(`os.cpu_count()` by default, `1` runs the loop in this process) and how many iterations are in a chunk'''
+from concurrent.futures import Future, ProcessPoolExecutor
+import atexit
+import contextlib
+import io
+import os
+import pickle
+from typing import Any, Callable
+from cat_output import OutputSink
+from interpreter import Error, Signal, Program, Scope, EXIT, NO_PRINT, make_builtins, run_code
+
+
+
+CHUNKS_PER_WORKER = 4 # when the chunk size isn't set, the range is split into this many chunks per worker
+
+WORKERS: int | None = None
+CHUNK_SIZE: int | None = None
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers: int = 0
+_in_worker: bool = False # a `pfor` inside of a `pfor` runs in the worker instead of starting more processes
+
+
+def configure(workers: int | None = None, chunk_size: int | None = None):
+    "Sets the number of workers and the number of iterations in a chunk, `None` is the default"
+    global WORKERS, CHUNK_SIZE
+    WORKERS, CHUNK_SIZE = workers, chunk_size
+
+
+def shutdown():
+    global _pool
+    if _pool is not None: _pool.shutdown(cancel_futures=True)
+    _pool = None
+
+atexit.register(shutdown)
+
+
+def _start_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    "Returns the process pool, it's started once and kept for the next loops(unless the number of workers changes)"
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown()
+        _pool = ProcessPoolExecutor(workers, initializer=_start_worker)
+        _pool_workers = workers
+    return _pool
+
+
+def chunks(start: int, stop: int, workers: int, chunk_size: int | None = None) -> list[tuple[int, int]]:
+    "Splits `range(start, stop)` into `(start, stop)` chunks"
+    if chunk_size is None: chunk_size = max(1, -(-(stop - start) // (workers * CHUNKS_PER_WORKER)))
+    return [(n, min(n + chunk_size, stop)) for n in range(start, stop, chunk_size)]
+
+
+def sendable(name: str) -> bool:
+    '''Returns whether the variable `name` is sent to the workers
+
+    Python's builtins(`__builtins__`, which `eval` put in the variables) are this process's, a worker's `eval` puts its own back,
+    and the temporary variables of the calls that are running belong to the expression the loop is in'''
+    return name != '__builtins__' and not name.startswith('__cat_')
+
+
+def pack(body: Program, var: str, ln: int, vars: Scope, funcs: Scope) -> tuple[bytes | None, Error | None]:
+    "Pickles what the workers need to run the body(see `sendable()`), returns an error naming the first variable or function that can't be pickled"
+    values = {name: value for name, value in vars.flatten().items() if sendable(name)}
+    user_funcs = {name: entry for name, entry in funcs.flatten().items() if not entry[0]}
+    try: return pickle.dumps((body, var, ln, values, user_funcs)), None
+    except Exception:
+        for kind, table in (('variable', values), ('function', user_funcs)):
+            for name, value in table.items():
+                try: pickle.dumps(value)
+                except Exception as e: return None, Error('PforError', f"cannot send {kind} '{name}' to the workers({e})", ln)
+        raise
+
+
+_UNSET = object()
+
+class ChunkScope(Scope):
+    "The variables around the loop, made once for a chunk, `restore()` undoes what an iteration assigned to them"
+    __slots__ = ('saved',)
+
+    def __init__(self, values: dict[str, Any]) -> None:
+        super().__init__(values)
+        self.saved: dict[str, Any] = {} # the values the names that were assigned to had before
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.saved: self.saved[key] = dict.get(self, key, _UNSET)
+        dict.__setitem__(self, key, value)
+
+    def restore(self):
+        for key, value in self.saved.items():
+            if value is _UNSET: dict.pop(self, key, None)
+            else: dict.__setitem__(self, key, value)
+        self.saved.clear()
+
+
+def run_chunk(payload: bytes, start: int, stop: int, budget: Any = None, hooks: Any = None) -> tuple[int, str, list[Any]]:
+    "Runs the iterations `start` to `stop` of a loop, returns the error code, the output and the collected values, `budget` and `hooks` are passed to `run_code`"
+    body, var, ln, values, user_funcs = pickle.loads(payload)
+    collected: list[Any] = []
+    with contextlib.redirect_stdout(io.StringIO()) as text:
+        output = OutputSink()
+        outer = ChunkScope(values)
+        funcs = Scope(user_funcs, Scope())
+        funcs.parent.update(make_builtins([], output, outer, funcs))
+        funcs.parent['Collect'] = (True, lambda ln, value: (collected.append(value), None))
+        funcs = body.funcs_scope(funcs)
+        for i in range(start, stop):
+            vars = Scope({} if var == '_' else {var: i}, outer)
+            errcode, _ = run_code(body, [], False, vars, funcs, output=output, budget=budget, hooks=hooks)
+            outer.restore()
+            if errcode == 2:
+                print(Error('PforError', "cannot return from inside of a pfor loop", ln).error())
+                errcode = -1
+            if errcode != 0: return errcode, text.getvalue(), collected
+    return 0, text.getvalue(), collected
+
+
+def run_pfor(body: Program, var: str, ln: int, start: int, stop: int, vars: Scope, funcs: Scope, write: Callable[[str], Any], budget: Any = None, hooks: Any = None) -> tuple[list[Any] | None, Error | Signal | None]:
+    '''Runs a `pfor` loop, returns the collected values\n
+    The output of the chunks is passed to `write` in order, if a chunk errors or exits the chunks after it are thrown away and the error is `NO_PRINT` or `EXIT`.
+    With a `budget`(a `cat_budget.Budget`) or `hooks`(`cat_hooks.Hooks`) the chunks run in this process, one after another, under them'''
+    payload, err = pack(body, var, ln, vars, funcs)
+    if err: return None, err
+
+    workers = WORKERS if WORKERS is not None else os.cpu_count() or 1
+    parts = chunks(start, stop, workers, CHUNK_SIZE)
+    futures: list[Future] = []
+    if workers <= 1 or len(parts) == 1 or _in_worker or budget is not None or hooks is not None:
+        results = (run_chunk(payload, a, b, budget, hooks) for a, b in parts)
+    else:
+        futures = [get_pool(workers).submit(run_chunk, payload, a, b) for a, b in parts]
+        results = (f.result() for f in futures)
+
+    collected: list[Any] = []
+    try:
+        for errcode, text, values in results:
+            if text: write(text)
+            collected.extend(values)
+            if errcode == 1: return None, EXIT
+            if errcode != 0: return None, NO_PRINT
+    except Exception as e: return None, Error('PforError', e, ln)
+    finally:
+        for f in futures: f.cancel()
+    return collected, None
@@ -0,0 +1,139 @@
+'''A profiler for CatScript, pass a `Profiler` to `interpreter.run_code` as its `profiler` to record the run\n
+It records how many times each line ran and how long it took(with and without the `fn` calls it made), the same for each `fn`, and how many iterations each `for` loop did\n
+Lines are numbered like the script's source, a `fn` is known by its name and the line it's defined on, the script itself is `<main>`.
+When `run_code` isn't given a profiler, all it costs is an `is not None` check per line'''
+from time import perf_counter
+from typing import Any, Callable
+import json
+import marshal
+from interpreter import Program
+
+
+
+MAIN = ('<main>', 0)
+
+
+class Profiler:
+    def __init__(self, filename: str = '<string>', clock: Callable[[], float] = perf_counter) -> None:
+        self.filename: str = filename
+        self.__clock: Callable[[], float] = clock
+        self.__source: list[str] = []
+        self.lines: dict[int, list[float]] = {} # line: [count, self time, cumulative time]
+        self.funcs: dict[tuple[str, int], list[float]] = {} # (name, line): [calls, non recursive calls, self time, cumulative time]
+        self.callers: dict[tuple[str, int], dict[tuple[str, int], list[float]]] = {} # callee: {caller: [calls, self time, cumulative time]}
+        self.loops: dict[int, int] = {} # line of the `for`: iterations
+        self.total: float = 0.0
+        self.__line_stack: list[list[Any]] = [] # [line, start, time in calls], the lines that are running(or waiting on a call)
+        self.__call_stack: list[list[Any]] = [] # [(name, line), start, time in calls]
+        self.__active: dict[tuple[str, int], int] = {} # how many calls of each `fn` are running, so recursion isn't counted twice in cumulative times
+        self.__active_lines: dict[int, int] = {} # the same for lines
+        self.__runs: int = 0 # how many runs are recording to it, only the first one starts it and stops it
+
+    # called by `run_code`
+
+    def start(self, program: Program):
+        self.__runs += 1
+        if self.__runs > 1: return # a run inside of the script's(like a fn `Map` calls), its lines are the script's
+        self.__source = program.lines
+        self.call(*MAIN)
+
+    def stop(self):
+        "Ends anything still running(after an error or `Exit()`), then the script"
+        self.__runs -= 1
+        if self.__runs: return
+        while self.__line_stack: self.line_done()
+        while self.__call_stack: self.call_done()
+        self.total = self.funcs[MAIN][3] if MAIN in self.funcs else 0.0
+
+    def line(self, ln: int):
+        stats = self.lines.get(ln)
+        if stats is None: stats = self.lines[ln] = [0, 0.0, 0.0]
+        stats[0] += 1
+        self.__active_lines[ln] = self.__active_lines.get(ln, 0) + 1
+        self.__line_stack.append([ln, self.__clock(), 0.0])
+
+    def line_done(self):
+        ln, start, in_calls = self.__line_stack.pop()
+        time = self.__clock() - start
+        stats = self.lines[ln]
+        stats[1] += time - in_calls
+        self.__active_lines[ln] -= 1
+        if not self.__active_lines[ln]: stats[2] += time
+
+    def call(self, name: str, ln: int):
+        key = (name, ln)
+        stats = self.funcs.get(key)
+        if stats is None: stats = self.funcs[key] = [0, 0, 0.0, 0.0]
+        stats[0] += 1
+        active = self.__active.get(key, 0)
+        if not active: stats[1] += 1
+        self.__active[key] = active + 1
+        if self.__call_stack:
+            edge = self.callers.setdefault(key, {}).setdefault(self.__call_stack[-1][0], [0, 0.0, 0.0])
+            edge[0] += 1
+        self.__call_stack.append([key, self.__clock(), 0.0])
+
+    def call_done(self):
+        key, start, in_calls = self.__call_stack.pop()
+        time = self.__clock() - start
+        stats = self.funcs[key]
+        stats[2] += time - in_calls
+        self.__active[key] -= 1
+        if not self.__active[key]: stats[3] += time
+        if self.__call_stack:
+            caller = self.__call_stack[-1]
+            caller[2] += time
+            edge = self.callers[key][caller[0]]
+            edge[1] += time - in_calls
+            edge[2] += time
+        # the line that made the call was waiting on it
+        if self.__line_stack: self.__line_stack[-1][2] += time
+
+    def loop_iteration(self, ln: int):
+        self.loops[ln] = self.loops.get(ln, 0) + 1
+
+    # reports
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'file': self.filename,
+            'total': self.total,
+            'lines': [{'line': ln, 'source': self.source(ln), 'count': s[0], 'self': s[1], 'cumulative': s[2]} for ln, s in sorted(self.lines.items())],
+            'functions': [{'name': name, 'line': ln, 'calls': s[0], 'primitive_calls': s[1], 'self': s[2], 'cumulative': s[3]} for (name, ln), s in sorted(self.funcs.items(), key=lambda f: -f[1][3])],
+            'loops': [{'line': ln, 'iterations': n} for ln, n in sorted(self.loops.items())],
+        }
+
+    def to_json(self) -> str: return json.dumps(self.to_dict(), indent=2)
+
+    def pstats_dict(self) -> dict[tuple[str, int, str], tuple[int, int, float, float, dict[tuple[str, int, str], tuple[int, int, float, float]]]]:
+        "Returns the function timings in the format `pstats.Stats` loads(what `cProfile` dumps)"
+        out = {}
+        for (name, ln), (calls, primitive, self_time, cumulative) in self.funcs.items():
+            callers = {(self.filename, cln, cname): (n, n, tt, ct) for (cname, cln), (n, tt, ct) in self.callers.get((name, ln), {}).items()}
+            out[(self.filename, ln, name)] = (primitive, calls, self_time, cumulative, callers)
+        return out
+
+    def dump_stats(self, path: str):
+        "Writes a file `pstats.Stats(path)`(or `python -m pstats path`) can read"
+        with open(path, 'wb') as f: marshal.dump(self.pstats_dict(), f)
+
+    def source(self, ln: int) -> str:
+        return self.__source[ln - 1] if 0 < ln <= len(self.__source) else ''
+
+    def report(self, limit: int | None = None) -> str:
+        "Returns the text report, lines in order(or the `limit` slowest), then functions and loops"
+        out = [f"profile of {self.filename}, {self.total:.6f}s total", '']
+        lines = sorted(self.lines.items())
+        if limit is not None: lines = sorted(sorted(lines, key=lambda l: -l[1][1])[:limit])
+        out.append(f"{'line':>6} {'count':>9} {'self(s)':>11} {'cum(s)':>11}  source")
+        for ln, (count, self_time, cumulative) in lines:
+            out.append(f"{ln:>6} {count:>9} {self_time:>11.6f} {cumulative:>11.6f}  {self.source(ln)}")
+        out += ['', f"{'function':<20} {'line':>6} {'calls':>9} {'self(s)':>11} {'cum(s)':>11}"]
+        for (name, ln), (calls, primitive, self_time, cumulative) in sorted(self.funcs.items(), key=lambda f: -f[1][3]):
+            calls_text = str(calls) if calls == primitive else f"{calls}/{primitive}"
+            out.append(f"{name:<20} {ln:>6} {calls_text:>9} {self_time:>11.6f} {cumulative:>11.6f}")
+        if self.loops:
+            out += ['', f"{'for loop':>8} {'iterations':>11}"]
+            for ln, n in sorted(self.loops.items()):
+                out.append(f"{ln:>8} {n:>11}")
+        return '\n'.join(out)
@@ -0,0 +1,71 @@
+'''An incremental REPL for CatScript, the `repl` command of `run.py`\n
+Every statement runs as soon as it's entered, in an `Interpreter`, so the variables and functions it made stay around for the next one.
+A line that opens a `{ ... }` block is kept until its braces balance(counted from its tokens, so braces in strings and comments don't count),
+then the whole block runs at once. Only the new code is parsed and run, nothing entered before runs again\n
+A line that's just an expression shows its value(unless it's `null`), `.load [file path]` runs a file in the same scope and `.exit` leaves'''
+from typing import Any, Callable
+from cat_lexer import OP, tokenize
+from interpreter import Interpreter, ExprStmt
+from cat_cache import load_program
+import cat_modules
+import os
+
+
+
+class Repl:
+    "The state of a REPL session, `feed()` it lines"
+    def __init__(self, interpreter: Interpreter | None = None) -> None:
+        self.interpreter: Interpreter = interpreter if interpreter is not None else Interpreter()
+        self.buffer: list[str] = []
+        self.depth: int = 0 # how many blocks the buffered lines left open
+
+    def pending(self) -> bool:
+        "If there are buffered lines waiting for their block to be closed"
+        return bool(self.buffer)
+
+    def feed(self, line: str) -> tuple[int, Any] | None:
+        "Adds a line, returns `None` if it's waiting for more, otherwise runs the buffered code and returns its error code and value(like `Interpreter.run()`)"
+        for toks in tokenize(line)[1]:
+            for tok in toks:
+                if tok.kind == OP and tok.text in '{}': self.depth += 1 if tok.text == '{' else -1
+        if not self.buffer and not line.strip(): return None
+        self.buffer.append(line)
+        if self.depth > 0: return None
+        source = '\n'.join(self.buffer)
+        self.buffer, self.depth = [], 0
+        return self.run(source)
+
+    def run(self, source: str) -> tuple[int, Any]:
+        "Runs code in the session, a single expression is run as `return expression` so its value comes back"
+        program = self.interpreter.parse(source)
+        nodes = [node for node in program.nodes if node is not None]
+        if len(nodes) == 1 and isinstance(nodes[0], ExprStmt) and nodes[0].source != '}': source = 'return ' + nodes[0].source
+        return self.interpreter.run(source)
+
+    def load(self, path: str) -> tuple[int, Any]:
+        "Runs the script at `path` in the session"
+        cat_modules.SEARCH_PATH[:] = [os.path.dirname(os.path.abspath(path))]
+        return self.interpreter.run(load_program(path))
+
+
+def main(read: Callable[[str], str] = input, write: Callable[[str], Any] = print):
+    "Reads lines with `read` until `.exit`, the end of the input or `Exit()`"
+    repl = Repl()
+    while True:
+        try: line = read('... ' if repl.pending() else '>>> ')
+        except (EOFError, KeyboardInterrupt):
+            write('')
+            break
+        command = line.strip()
+        if not repl.pending() and command == '.exit': break
+        if not repl.pending() and command.startswith('.load '):
+            path = command.removeprefix('.load ').strip()
+            if not os.path.isfile(path):
+                write(f"path '{path}' is not a file")
+                continue
+            res = repl.load(path)
+        else: res = repl.feed(line)
+        if res is None: continue
+        errcode, value = res
+        if errcode == 1: break
+        if errcode in (0, 2) and value is not None: write(repr(value))
@@ -0,0 +1,147 @@
+'''Snapshots of a CatScript interpreter's state, so a run can start from where a slow setup left off instead of running it again\n
+A snapshot has the global variables, the fns the scripts defined(their code, arguments and default values) and the parse cache,
+`save()` writes one and `load()` reads it back, `save_interpreter()` and `load_interpreter()` do the same for an `Interpreter`.
+Scripts can take one with `Snapshot("path")`, and `run.py` has `run --snapshot` and `run --resume=[snapshot path]`\n
+It also has where the script that took it was: the line after its `Snapshot()`, or its end for `run --snapshot`.
+Resuming that script(`resume_point()`) carries on from there, any other script(or the same one once it's changed) runs from its first line with the snapshot's state.
+A script can't carry on from a snapshot it took in a fn or a loop, where the rest of the call or loop would be lost\n
+The file is pickled, with a header that has its format, parser and Python versions, a snapshot from different versions isn't loaded.
+Values that can't be pickled(like a Python lambda in a variable) can't be in a snapshot, saving one raises a `SnapshotError` naming it'''
+import hashlib
+import io
+import os
+import pickle
+import sys
+from typing import Any
+from interpreter import Frame, Func, Interpreter, Program, Scope, PARSER_VERSION, _parse_cache
+
+
+
+MAGIC = b'CATS'
+FORMAT_VERSION = 2
+TEMP_PREFIX = '__cat_' # the temporary variables of expressions that were running
+
+
+class SnapshotError(Exception):
+    "A snapshot couldn't be saved or loaded"
+
+
+Resume = tuple[str, int | None, tuple[tuple[int, int, int], ...]]
+
+
+class Snapshot:
+    "The state in a snapshot, `funcs` are functions scope entries(`(False, Func)`)"
+    __slots__ = ('vars', 'funcs', 'programs', 'resume')
+
+    def __init__(self, vars: dict[str, Any], funcs: dict[str, tuple[bool, Func]], programs: dict[str, Program], resume: Resume | None = None) -> None:
+        self.vars: dict[str, Any] = vars
+        self.funcs: dict[str, tuple[bool, Func]] = funcs
+        self.programs: dict[str, Program] = programs
+        # the `script_key()` of the script that took it, the line(starting at 0) it carries on from(`None` in a fn or loop) and the line jumps waiting there
+        self.resume: Resume | None = resume
+
+
+def script_key(program: Program) -> str:
+    "Returns what a script is known by in a snapshot, a hash of its source"
+    return hashlib.sha256('\n'.join(program.lines).encode()).hexdigest()
+
+
+def resume_at(main: Frame, vars: Scope) -> Resume:
+    "Returns where the script running in the frame `main` carries on from after a snapshot taken with the variables `vars`, the next line if they're the script's own"
+    if vars is not main.vars: return script_key(main.program), None, ()
+    return script_key(main.program), main.ln + 1, tuple((jump.origin, jump.at, jump.to) for jump in main.scheduled)
+
+
+def resume_point(snapshot: Snapshot, program: Program) -> tuple[int, tuple[tuple[int, int, int], ...]]:
+    '''Returns the line(starting at 0) `program` starts from when it's resumed from `snapshot` and the line jumps waiting there(`run_code`'s `start` and `jumps`),
+    where it was if it took the snapshot, otherwise its first line. Raises a `SnapshotError` if it took it in a fn or loop'''
+    if snapshot.resume is None or snapshot.resume[0] != script_key(program): return 0, ()
+    _, start, jumps = snapshot.resume
+    if start is None: raise SnapshotError("the script took the snapshot in a fn or loop, it can only carry on from one it took on a line of its own")
+    return start, jumps
+
+
+def take(vars: Scope | dict[str, Any], funcs: Scope | dict[str, tuple[bool, Any]], programs: dict[str, Program] | None = None, resume: Resume | None = None) -> Snapshot:
+    "Makes a snapshot of the variables `vars`, the fns in `funcs`(not the builtins), `programs`(the parse cache by default) and `resume`(see `Snapshot`)"
+    if isinstance(vars, Scope): vars = vars.flatten()
+    if isinstance(funcs, Scope): funcs = funcs.flatten()
+    # `eval()` puts Python's `__builtins__` in the global scope it runs in
+    return Snapshot({name: value for name, value in vars.items() if not name.startswith(TEMP_PREFIX) and name != '__builtins__'},
+                    {name: entry for name, entry in funcs.items() if not entry[0]},
+                    dict(_parse_cache if programs is None else programs), resume)
+
+
+def _header() -> dict[str, Any]:
+    return {'format': FORMAT_VERSION, 'parser': PARSER_VERSION, 'python': sys.version_info[:2]}
+
+
+def dumps(snapshot: Snapshot) -> bytes:
+    "Returns the snapshot as the bytes of a snapshot file, raises a `SnapshotError` naming the first value that can't be pickled"
+    header = pickle.dumps(_header(), pickle.HIGHEST_PROTOCOL)
+    try: return MAGIC + header + pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        for kind, table in (('variable', snapshot.vars), ('fn', snapshot.funcs)):
+            for name, value in table.items():
+                try: pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                except Exception as e: raise SnapshotError(f"cannot snapshot {kind} '{name}', its value can't be saved({e})") from None
+        # a parsed program that can't be pickled isn't worth failing for
+        snapshot = Snapshot(snapshot.vars, snapshot.funcs, {}, snapshot.resume)
+        return MAGIC + header + pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+
+
+def loads(data: bytes) -> Snapshot:
+    "Reads the bytes of a snapshot file, raises a `SnapshotError` if it isn't one or was made by other versions"
+    f = io.BytesIO(data)
+    if f.read(len(MAGIC)) != MAGIC: raise SnapshotError("not a CatScript snapshot")
+    try: header = pickle.load(f)
+    except Exception as e: raise SnapshotError(f"the snapshot is damaged({e})") from None
+    if not isinstance(header, dict): raise SnapshotError("the snapshot is damaged(it has no header)")
+    for key, current in _header().items():
+        if header.get(key) != current:
+            raise SnapshotError(f"the snapshot was made with {key} version {header.get(key)}, but this is version {current}")
+    try: snapshot = pickle.load(f)
+    except Exception as e: raise SnapshotError(f"the snapshot is damaged({e})") from None
+    if not isinstance(snapshot, Snapshot): raise SnapshotError("the snapshot is damaged(it has no state)")
+    return snapshot
+
+
+def save(path: str, vars: Scope | dict[str, Any], funcs: Scope | dict[str, tuple[bool, Any]], programs: dict[str, Program] | None = None, resume: Resume | None = None):
+    "Writes a snapshot of `vars`, `funcs`, `programs` and `resume`(see `take()`) to the file at `path`"
+    data = dumps(take(vars, funcs, programs, resume))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f: f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise SnapshotError(f"cannot write '{path}'({e.strerror})") from None
+
+
+def load(path: str) -> Snapshot:
+    "Reads the snapshot file at `path`"
+    try:
+        with open(path, 'rb') as f: data = f.read()
+    except OSError as e: raise SnapshotError(f"cannot read '{path}'({e.strerror})") from None
+    return loads(data)
+
+
+def save_interpreter(interpreter: Interpreter, path: str, program: Program | None = None):
+    '''Writes a snapshot of an `Interpreter`'s global variables, the fns its scripts defined and its parse cache(and the module's)\n
+    `program` is the script it just ran, resuming it from the snapshot carries on after its last line'''
+    resume = (script_key(program), len(program.nodes), ()) if program is not None else None
+    save(path, interpreter.vars, interpreter.funcs, {**_parse_cache, **interpreter.programs}, resume)
+
+
+def restore(snapshot: Snapshot, interpreter: Interpreter | None = None) -> Interpreter:
+    "Returns an `Interpreter`(a new one if it isn't given) with the state of `snapshot` added to it"
+    if interpreter is None: interpreter = Interpreter()
+    interpreter.vars.update(snapshot.vars)
+    interpreter.funcs.update(snapshot.funcs)
+    interpreter.programs.update(snapshot.programs)
+    return interpreter
+
+
+def load_interpreter(path: str, interpreter: Interpreter | None = None) -> Interpreter:
+    "Returns an `Interpreter`(a new one if it isn't given) with the state of the snapshot at `path` added to it"
+    return restore(load(path), interpreter)
@@ -0,0 +1,512 @@
+'''A bytecode compiler and stack VM for CatScript, an optional alternative to `interpreter.run_code`\n
+A parsed `Program` is compiled into a flat `array` of instructions(`op, a, b` triples) with a constant pool,
+`for` bodies and if/elseif/else chains are compiled inline as jumps, and `fn` bodies are compiled into their own `Chunk` the first time they're called\n
+Expressions are still evaluated by Python(the `Expr`s `parse_program` compiled), with the calls in them compiled as instructions, so variables live in `Scope`s like they do in `run_code`.
+The common statements compile to a single instruction that evaluates and uses the value, and a `for` body that can't create variables or functions
+runs in the scope around it instead of a new scope every iteration(its loop variable is removed when the loop ends, like the scope would be), unless the script could take a `Snapshot`\n
+Variables can't have slots: CatScript scopes are dynamic(a fn sees its caller's variables), so which scope a name is in is only known when it runs'''
+from array import array
+from typing import Any
+from cat_output import OutputSink
+from interpreter import Error, Exit, NoPrint, Return, Signal, Func, Scope, Program, Stmt, ErrorStmt, ReturnStmt, LetStmt, AssignStmt, FnDef, ForStmt, PforStmt, IfChain, ElseStmt, Goto, ImportStmt, Expr, RETURN, ScopedBuiltin, cached_expr, parse_program, make_builtins, to_catscript_type
+
+
+
+# opcodes, every instruction is `op, a, b`
+EVAL = 0           # push the result of the code object `consts[a]`
+POP = 1            # pop and discard
+JUMP = 2           # jump to `a`
+JUMP_IF_FALSE = 3  # pop, jump to `a` if the value is falsy
+IF_FALSE = 4       # evaluate the code object `consts[b]`, jump to `a` if the value is falsy
+CALL = 5           # run the call site `consts[a]`, a call if its name is a function and its fallback otherwise, `b` is `1` to discard the result
+NEW_VAR = 6        # error if the variable `consts[a]` already exists
+LET = 7            # pop into the new variable `consts[a]`
+LET_EVAL = 8       # evaluate the code object `consts[a][1]` into the new variable `consts[a][0]`, or error if it already exists
+STORE = 9          # pop into the existing variable `consts[a]`, then jump to `b`
+ASSIGN_EVAL = 10   # evaluate the code object `consts[a][1]` into the existing variable `consts[a][0]` and jump to `b`, or carry on if it doesn't exist
+IF_NOT_VAR = 11    # jump to `b` if the variable `consts[a]` doesn't exist
+EVAL_POP = 12      # evaluate the code object `consts[a]` and discard the result
+DEL_TEMPS = 13     # delete the temporary variables `consts[a]`
+DEF_FUNC = 14      # define the function `consts[a]`, popping `b` default values
+CHECK_RANGE = 15   # error if the range start or end on the stack isn't an Int
+FOR_PREP = 16      # pop the range end and start, start the loop `consts[a]` or jump to `b` if the range is empty
+FOR_NEXT = 17      # go to the next iteration of the loop at `b`(in a new scope), or leave it
+FOR_STEP = 18      # go to the next iteration of the loop at `b`(in the same scope), or leave it
+GOTO = 19          # pop a line number and jump to it using the line table `consts[a]`
+RAISE = 20         # stop with the error `consts[a]`
+HALT = 21          # end of the chunk
+RETURN_VALUE = 22  # pop the return value and leave the function
+RETURN_EVAL = 23   # evaluate the code object `consts[a]` and leave the function with it
+PFOR = 24          # pop the range end and start and run the `pfor` loop `consts[a]` on the process pool
+FAST_FOR = 25      # run the `cat_optimize.FastLoop` `consts[a]` over the range on the stack, then pop it and jump to `b`, or carry on if it can't run
+IMPORT = 26        # import the module of the `ImportStmt` `consts[a]`
+
+OPNAMES = ('EVAL', 'POP', 'JUMP', 'JUMP_IF_FALSE', 'IF_FALSE', 'CALL', 'NEW_VAR', 'LET', 'LET_EVAL', 'STORE', 'ASSIGN_EVAL', 'IF_NOT_VAR', 'EVAL_POP', 'DEL_TEMPS', 'DEF_FUNC',
+           'CHECK_RANGE', 'FOR_PREP', 'FOR_NEXT', 'FOR_STEP', 'GOTO', 'RAISE', 'HALT', 'RETURN_VALUE', 'RETURN_EVAL', 'PFOR', 'FAST_FOR', 'IMPORT')
+
+IN_BLOCK = -1 # a line inside a `for` or `fn` body, which can't be jumped to from outside of it
+
+# the statements that add a variable to the scope they run in, a `for` body without them doesn't need a scope of its own
+DEFINES_VARS = (LetStmt, FnDef, ImportStmt, PforStmt)
+
+
+class Chunk:
+    "A compiled script or `fn` body"
+    __slots__ = ('ops', 'consts', 'lns')
+
+    def __init__(self, ops: array, consts: list[Any], lns: list[int]) -> None:
+        self.ops: array = ops
+        self.consts: list[Any] = consts
+        self.lns: list[int] = lns # the source line of each instruction, for errors
+
+    def disassemble(self) -> str:
+        out = []
+        for pc in range(0, len(self.ops), 3):
+            op, a, b = self.ops[pc], self.ops[pc+1], self.ops[pc+2]
+            out.append(f"{pc:>5} (line {self.lns[pc // 3]:>3}) {OPNAMES[op]:<14} {a:>4} {b:>4}")
+        return '\n'.join(out)
+
+
+def needs_scope(body: Program) -> bool:
+    "Returns whether a `for` body has to run in a new scope every iteration, because something in it adds a variable"
+    return any(isinstance(node, DEFINES_VARS) for node in body.nodes)
+
+
+def can_run_in_place(program: Program) -> bool:
+    '''Returns whether the `for` bodies in `program` that don't need a scope can run in the scope around them
+
+    `Snapshot` saves the variables of the run, which would have the loop variables of those loops in them, so not if it could be called(by the script, its fns or a module it imports)'''
+    return not any(isinstance(node, ImportStmt) for node in program.nodes) and not any('Snapshot' in line for line in program.lines)
+
+
+class Compiler:
+    def __init__(self, in_place: bool = True) -> None:
+        self.__in_place: bool = in_place
+        self.__ops: array = array('l')
+        self.__consts: list[Any] = []
+        self.__const_ids: dict[int, int] = {}
+        self.__lns: list[int] = []
+
+    def pc(self) -> int: return len(self.__ops)
+
+    def const(self, value: Any) -> int:
+        # by identity, hashing a code object hashes all of it
+        index = self.__const_ids.get(id(value))
+        if index is None:
+            index = self.__const_ids[id(value)] = len(self.__consts)
+            self.__consts.append(value)
+        return index
+
+    def emit(self, op: int, ln: int, a: int = 0, b: int = 0) -> int:
+        ops = self.__ops
+        pc = len(ops)
+        ops.append(op)
+        ops.append(a)
+        ops.append(b)
+        self.__lns.append(ln)
+        return pc
+
+    def patch(self, pc: int, a: int | None = None, b: int | None = None):
+        if a is not None: self.__ops[pc+1] = a
+        if b is not None: self.__ops[pc+2] = b
+
+    def chunk(self) -> Chunk: return Chunk(self.__ops, self.__consts, self.__lns)
+
+    def expr(self, expr: Expr, ln: int, discard: bool = False):
+        "Compiles an expression the same way `eval_exprs` runs it, each call site is a call if its name is a function when it runs, pushes its value unless `discard`"
+        if expr.exc is not None:
+            self.emit(RAISE, ln, self.const(Error('EvalError', expr.exc, ln)))
+            return
+        for n, site in enumerate(expr.sites):
+            self.emit(CALL, ln, self.const((site.name, site.args, site.fallback, site.temp)), int(discard and expr.code is None and n == len(expr.sites) - 1))
+        if expr.code is not None: self.emit(EVAL_POP if discard else EVAL, ln, self.const(expr.code))
+        temps = tuple(site.temp for site in expr.sites if site.temp is not None)
+        if temps: self.emit(DEL_TEMPS, ln, self.const(temps))
+
+    def region(self, program: Program) -> tuple[dict[int, int], dict[int, int], list[tuple[int, int, bool]]]:
+        '''Compiles the lines of a script or block body\n
+        Returns the instruction each line starts at, where reaching each elseif/else line without jumping to it starts(the jump that leaves its chain),
+        and the jumps that still need to be pointed at a line(`finish()` does that once the end of the region is known), `(pc, line, arrive)`.
+        A jump that `arrive`s at a line acts like the line before it ended, otherwise it runs the line'''
+        line_pcs: dict[int, int] = {}
+        arrive_pcs: dict[int, int] = {}
+        fixups: list[tuple[int, int, bool]] = []
+        blocks = program.blocks
+        if_ends = {b.end for b in blocks.values() if b.is_if}
+        skip_to = 0
+        for n, node in enumerate(program.nodes):
+            ln = n + 1
+            if ln < skip_to:
+                line_pcs[ln] = IN_BLOCK
+                continue
+            if isinstance(node, (IfChain, ElseStmt)):
+                block = blocks.get(ln)
+                if block is not None and block.line != ln and block.end != -1:
+                    # reaching an elseif/else line from the end of the previous branch(or from the end of a chain inside of it) leaves the chain,
+                    # jumping to it (from a false condition or a `goto`) runs it
+                    arrive_pcs[ln] = self.emit(JUMP, ln)
+                    fixups.append((arrive_pcs[ln], block.end + 1, True))
+            line_pcs[ln] = len(self.__ops)
+            if node is None or (ln in if_ends and node.source == '}'): continue
+            skip_to = self.stmt(node, fixups)
+        return line_pcs, arrive_pcs, fixups
+
+    def finish(self, line_pcs: dict[int, int], arrive_pcs: dict[int, int], fixups: list[tuple[int, int, bool]], end_pc: int):
+        "Points the jumps of a region at their lines, a jump to the line after the last one goes to `end_pc`"
+        line_pcs[len(line_pcs) + 1] = end_pc
+        table = self.const(line_pcs)
+        for pc, line, arrive in fixups:
+            if line == 0: self.patch(pc, a=table) # goto
+            else: self.patch(pc, a=arrive_pcs.get(line, line_pcs[line]) if arrive else line_pcs[line])
+
+    def stmt(self, node: Stmt, fixups: list[tuple[int, int, bool]]) -> int:
+        "Compiles a single statement, returns the line to continue compiling from(`0` to continue normally)"
+        ln = node.ln
+        if isinstance(node, LetStmt):
+            expr = node.exprs[0]
+            if expr.exc is None and not expr.sites:
+                self.emit(LET_EVAL, ln, self.const((node.name, expr.code)))
+                return 0
+            self.emit(NEW_VAR, ln, self.const(node.name))
+            self.expr(expr, ln)
+            self.emit(LET, ln, self.const(node.name))
+
+        elif isinstance(node, AssignStmt):
+            expr = node.exprs[0]
+            if expr.exc is None and not expr.sites: jump = self.emit(ASSIGN_EVAL, ln, self.const((node.name, expr.code)))
+            else:
+                test = self.emit(IF_NOT_VAR, ln, self.const(node.name))
+                self.expr(expr, ln)
+                jump = self.emit(STORE, ln, self.const(node.name))
+                self.patch(test, b=self.pc())
+            # the variable doesn't exist, so it's an expression
+            self.expr(cached_expr(node.source), ln, discard=True)
+            self.patch(jump, b=self.pc())
+
+        elif isinstance(node, ErrorStmt):
+            self.emit(RAISE, ln, self.const(node.err))
+
+        elif isinstance(node, ReturnStmt):
+            expr = node.exprs[0] if node.exprs else cached_expr('None')
+            if expr.exc is None and not expr.sites: self.emit(RETURN_EVAL, ln, self.const(expr.code))
+            else:
+                self.expr(expr, ln)
+                self.emit(RETURN_VALUE, ln)
+
+        elif isinstance(node, FnDef):
+            for default in node.exprs: self.expr(default, ln)
+            if node.body_err or node.impure:
+                self.emit(RAISE, ln, self.const(node.body_err or node.impure))
+                return 0
+            self.emit(DEF_FUNC, ln, self.const((node.name, tuple(node.args), node.body, node.memo)), len(node.exprs))
+            return node.end
+
+        elif isinstance(node, ForStmt):
+            self.expr(node.exprs[0], ln)
+            self.expr(node.exprs[1], ln)
+            if node.body_err or node.fast is not None or isinstance(node, PforStmt): self.emit(CHECK_RANGE, ln)
+            if node.body_err:
+                self.emit(RAISE, ln, self.const(node.body_err))
+                return 0
+            if isinstance(node, PforStmt):
+                self.emit(PFOR, ln, self.const(node))
+                return node.end
+            fast = self.emit(FAST_FOR, ln, self.const(node.fast)) if node.fast is not None else None
+            scoped = not self.__in_place or needs_scope(node.body)
+            prep = self.emit(FOR_PREP, ln, self.const((node.var, node.body, scoped)))
+            body_start = self.pc()
+            line_pcs, arrive_pcs, body_fixups = self.region(node.body)
+            self.finish(line_pcs, arrive_pcs, body_fixups, self.emit(FOR_NEXT if scoped else FOR_STEP, ln, 0, body_start))
+            self.patch(prep, b=self.pc())
+            if fast is not None: self.patch(fast, b=self.pc())
+            return node.end
+
+        elif isinstance(node, IfChain):
+            expr = node.exprs[0]
+            if expr.exc is None and not expr.sites and not node.err: jump = self.emit(IF_FALSE, ln, 0, self.const(expr.code))
+            else:
+                self.expr(expr, ln)
+                if node.err:
+                    self.emit(RAISE, ln, self.const(node.err))
+                    return 0
+                jump = self.emit(JUMP_IF_FALSE, ln)
+            # the next branch runs, but past the end of the chain is reached like after its last line
+            if node.next != -1: fixups.append((jump, node.next, False))
+            else: fixups.append((jump, node.end + 1, True))
+
+        elif isinstance(node, ElseStmt):
+            if node.err: self.emit(RAISE, ln, self.const(node.err))
+
+        elif isinstance(node, Goto):
+            self.expr(node.exprs[0], ln)
+            fixups.append((self.emit(GOTO, ln), 0, False))
+
+        elif isinstance(node, ImportStmt):
+            self.emit(IMPORT, ln, self.const(node))
+
+        else: self.expr(node.exprs[0], ln, discard=True)
+        return 0
+
+
+def compile_program(program: Program) -> Chunk:
+    "Compiles a `Program`(a script or a `fn` body) into a `Chunk`, each program is only compiled once(its chunk is kept on it, and goes when it does)"
+    if program.chunk is not None: return program.chunk
+    compiler = Compiler(can_run_in_place(program))
+    line_pcs, arrive_pcs, fixups = compiler.region(program)
+    compiler.finish(line_pcs, arrive_pcs, fixups, compiler.emit(HALT, len(program) + 1))
+    program.chunk = chunk = compiler.chunk()
+    return chunk
+
+
+def _eval_error(chunk: Chunk, pc: int, vars: Scope, e: Exception) -> Error:
+    "Returns the error of the expression evaluated at `pc`, after deleting the temporary variables of its calls like `eval_exprs` does"
+    if chunk.ops[pc+3] == DEL_TEMPS:
+        for name in chunk.consts[chunk.ops[pc+4]]: vars.pop(name, None)
+    return Error('EvalError', e, chunk.lns[pc // 3])
+
+
+def execute(chunk: Chunk, vars: Scope, funcs: Scope, used_stack: list[str] | None = None, output: OutputSink | None = None, modules: Any = None) -> tuple[Any, Error | Signal | None]:
+    '''Runs a chunk to the end, calls to `fn`s push a frame instead of recursing, returns the returned value(if there's a `return` outside of a function) and the error or signal it stopped with
+
+    `used_stack` and `output` are the ones the builtins were made with, modules it imports run with them and are kept in `modules`(a `cat_modules.ModuleCache`, the process's by default)'''
+    loops: list[list[Any]] = []
+    try: return _execute(chunk, vars, funcs, used_stack if used_stack is not None else [], output, modules, loops)
+    finally:
+        # the loop variables of the loops it stopped inside of, which went in `vars` instead of a scope of their own
+        for loop in loops:
+            if loop[7]: loop[4].pop(loop[3], None)
+
+
+def _execute(chunk: Chunk, vars: Scope, funcs: Scope, used_stack: list[str], output: OutputSink | None, modules: Any, loops: list[list[Any]]) -> tuple[Any, Error | Signal | None]:
+    # the caller's chunk, pc, scopes, stack and loops, where the result goes(pushed if `None`, a temporary variable or dropped if `False`) and if it's a `memo fn`, its memo and key
+    frames: list[tuple[Chunk, int, Scope, Scope, list[Any], list[list[Any]], str | bool | None, tuple[Any, tuple[Any, ...]] | None]] = []
+    ops, consts = chunk.ops, chunk.consts
+    stack: list[Any] = []
+    # loops are `[index, end, where the loop variable goes, loop variable, outer vars, outer funcs, body, if the variable is removed at the end]`,
+    # the loop variable goes in its owner, the new scope of each iteration(`None`) or `vars` if it doesn't exist and the body runs in `vars`
+    pc = 0
+    while True:
+        op = ops[pc]
+        # the instructions in about the order they run most
+        if op == ASSIGN_EVAL:
+            name, code = consts[ops[pc+1]]
+            owner = vars.owner(name)
+            if owner is None: pc += 3
+            else:
+                try: owner[name] = eval(code, vars)
+                except Exception as e: return None, Error('EvalError', e, chunk.lns[pc // 3])
+                pc = ops[pc+2]
+        elif op == FOR_STEP:
+            loop = loops[-1]
+            index = loop[0] + 1
+            if index < loop[1]:
+                loop[0] = loop[2][loop[3]] = index
+                pc = ops[pc+2]
+            else:
+                loops.pop()
+                if loop[7]: vars.pop(loop[3], None)
+                pc += 3
+        elif op == IF_FALSE:
+            try: value = eval(consts[ops[pc+2]], vars)
+            except Exception as e: return None, Error('EvalError', e, chunk.lns[pc // 3])
+            if value: pc += 3
+            else: pc = ops[pc+1]
+        elif op == CALL:
+            name, args, fallback, temp = consts[ops[pc+1]]
+            ln = chunk.lns[pc // 3]
+            if name not in funcs:
+                try: res = eval(fallback, vars)
+                except Exception as e: return None, Error('EvalError', e, ln)
+            else:
+                try: func_inputs = [eval(arg, vars) for arg in args]
+                except Exception as e: return None, Error('EvalError', e, ln)
+                is_builtin, func = funcs[name]
+                if is_builtin:
+                    try: res, err = func.scoped(ln, vars, funcs, None, *func_inputs) if type(func) is ScopedBuiltin else func(ln, *func_inputs)
+                    except Exception as e: res, err = None, Error('FuncError', e, ln)
+                    if err: return None, err
+                else:
+                    formatted_inputs, err = func.bind(func_inputs, ln)
+                    if err: return None, err
+                    memo = func.memo()
+                    key = memo.key(formatted_inputs) if memo is not None else None
+                    hit = False
+                    if key is not None: hit, res = memo.lookup(key)
+                    if not hit:
+                        frames.append((chunk, pc + 3, vars, funcs, stack, loops, False if ops[pc+2] else temp, (memo, key) if key is not None else None))
+                        chunk = compile_program(func.code())
+                        ops, consts = chunk.ops, chunk.consts
+                        vars, funcs = func.scopes(formatted_inputs, vars, funcs)
+                        stack, loops = [], []
+                        pc = 0
+                        continue
+            if temp is not None: vars[temp] = res
+            elif not ops[pc+2]: stack.append(res)
+            pc += 3
+        elif op == RETURN_EVAL or op == RETURN_VALUE:
+            if op == RETURN_VALUE: value = stack.pop()
+            else:
+                try: value = eval(consts[ops[pc+1]], vars)
+                except Exception as e: return None, Error('EvalError', e, chunk.lns[pc // 3])
+            if not frames: return value, RETURN
+            chunk, pc, vars, funcs, stack, loops, dest, memo = frames.pop()
+            if memo is not None: memo[0].store(memo[1], value)
+            ops, consts = chunk.ops, chunk.consts
+            if dest is None: stack.append(value)
+            elif dest is not False: vars[dest] = value
+        elif op == EVAL_POP:
+            try: eval(consts[ops[pc+1]], vars)
+            except Exception as e: return None, _eval_error(chunk, pc, vars, e)
+            pc += 3
+        elif op == FOR_NEXT:
+            loop = loops[-1]
+            index = loop[0] + 1
+            if index < loop[1]:
+                loop[0] = index
+                vars, funcs = Scope(parent=loop[4]), loop[6].funcs_scope(loop[5])
+                if loop[2] is not None: loop[2][loop[3]] = index
+                elif loop[3] != '_': vars[loop[3]] = index
+                pc = ops[pc+2]
+            else:
+                loops.pop()
+                vars, funcs = loop[4], loop[5]
+                pc += 3
+        elif op == EVAL:
+            try: stack.append(eval(consts[ops[pc+1]], vars))
+            except Exception as e: return None, _eval_error(chunk, pc, vars, e)
+            pc += 3
+        elif op == LET_EVAL:
+            name, code = consts[ops[pc+1]]
+            if vars.owner(name) is not None: return None, Error('VariableError', f"cannot create variable '{name}', already exists", chunk.lns[pc // 3])
+            try: vars[name] = eval(code, vars)
+            except Exception as e: return None, Error('EvalError', e, chunk.lns[pc // 3])
+            pc += 3
+        elif op == DEL_TEMPS:
+            for name in consts[ops[pc+1]]: vars.pop(name, None)
+            pc += 3
+        elif op == JUMP:
+            pc = ops[pc+1]
+        elif op == JUMP_IF_FALSE:
+            if stack.pop(): pc += 3
+            else: pc = ops[pc+1]
+        elif op == STORE:
+            name = consts[ops[pc+1]]
+            vars.owner(name)[name] = stack.pop()
+            pc = ops[pc+2]
+        elif op == IF_NOT_VAR:
+            if vars.owner(consts[ops[pc+1]]) is not None: pc += 3
+            else: pc = ops[pc+2]
+        elif op == NEW_VAR:
+            name = consts[ops[pc+1]]
+            if vars.owner(name) is not None: return None, Error('VariableError', f"cannot create variable '{name}', already exists", chunk.lns[pc // 3])
+            pc += 3
+        elif op == LET:
+            vars[consts[ops[pc+1]]] = stack.pop()
+            pc += 3
+        elif op == POP:
+            stack.pop()
+            pc += 3
+        elif op == HALT:
+            if not frames: return None, None
+            chunk, pc, vars, funcs, stack, loops, dest, memo = frames.pop()
+            if memo is not None: memo[0].store(memo[1], None)
+            ops, consts = chunk.ops, chunk.consts
+            if dest is None: stack.append(None)
+            elif dest is not False: vars[dest] = None
+        elif op == FOR_PREP:
+            end = stack.pop()
+            start = stack.pop()
+            for what, value in (('start', start), ('end', end)):
+                if not isinstance(value, int):
+                    return None, Error('TypeError', f"expected Int for range {what}, but {to_catscript_type(type(value).__name__)} was given instead", chunk.lns[pc // 3])
+            if start >= end:
+                pc = ops[pc+2]
+                continue
+            var, body, scoped = consts[ops[pc+1]]
+            owner = vars.owner(var) if var != '_' else None
+            if scoped:
+                loops.append([start, end, owner, var, vars, funcs, body, False])
+                vars, funcs = Scope(parent=vars), body.funcs_scope(funcs)
+                if owner is not None: owner[var] = start
+                elif var != '_': vars[var] = start
+            else:
+                created = owner is None and var != '_'
+                target = owner if owner is not None else vars if created else {}
+                target[var] = start
+                loops.append([start, end, target, var, vars, funcs, body, created])
+            pc += 3
+        elif op == CHECK_RANGE:
+            for what, value in (('start', stack[-2]), ('end', stack[-1])):
+                if not isinstance(value, int):
+                    return None, Error('TypeError', f"expected Int for range {what}, but {to_catscript_type(type(value).__name__)} was given instead", chunk.lns[pc // 3])
+            pc += 3
+        elif op == DEF_FUNC:
+            name, argspec, body, memo = consts[ops[pc+1]]
+            ndefaults = ops[pc+2]
+            defaults = iter(stack[len(stack) - ndefaults:])
+            if ndefaults: del stack[len(stack) - ndefaults:]
+            processed_args = [(a, True, next(defaults)) if has_default else (a, False, None) for a, has_default in argspec]
+            (funcs.owner(name) or funcs)[name] = (False, Func(name, body, processed_args, memo=memo))
+            pc += 3
+        elif op == GOTO:
+            ln = chunk.lns[pc // 3]
+            table = consts[ops[pc+1]]
+            e_linenum = stack.pop()
+            if not isinstance(e_linenum, int):
+                return None, Error.ValueErr('goto', 'Int', e_linenum, ln)
+            if e_linenum == ln:
+                return None, Error('OutOfIndexError', f"cannot use goto to jump to the same line", ln)
+            elif e_linenum < 1 or e_linenum > len(table):
+                return None, Error('OutOfIndexError', f"{e_linenum} is not a valid line", ln)
+            pc = table[e_linenum]
+            if pc == IN_BLOCK:
+                return None, Error('OutOfIndexError', f"cannot use goto to jump into the body of a for loop or function", ln)
+        elif op == PFOR:
+            end = stack.pop()
+            err = consts[ops[pc+1]].run(stack.pop(), end, vars, funcs)
+            if err: return None, err
+            pc += 3
+        elif op == FAST_FOR:
+            ran, err = consts[ops[pc+1]].run(stack[-2], stack[-1], vars, funcs)
+            if ran:
+                del stack[-2:]
+                if err: return None, err
+                pc = ops[pc+2]
+            else: pc += 3
+        elif op == IMPORT:
+            err = consts[ops[pc+1]].run(vars, funcs, used_stack, output, modules)
+            if err: return None, err
+            pc += 3
+        elif op == RAISE:
+            return None, consts[ops[pc+1]]
+        else:
+            return None, Error('VMError', f"unknown opcode {op}", chunk.lns[pc // 3])
+
+
+def run_vm(text: str | list[str] | Program, return_values: bool = False, injected_vars: Scope | dict[str, Any] | None = None, injected_funcs: Scope | dict[str, Any] | None = None, output: OutputSink | None = None, profiler: Any = None, budget: Any = None, hooks: Any = None, modules: Any = None) -> tuple[int, tuple[Scope, Scope, Any] | None]:
+    '''Compiles and runs CatScript on the VM, returns the same error codes as `run_code`, `output` and `modules` are the same as `run_code`'s\n
+    The VM can't be profiled, limited or traced, giving it a `profiler`, `budget` or `hooks` is a `ValueError`(use `run_code` for those)'''
+    unsupported = [name for name, value in (('profiler', profiler), ('budget', budget), ('hooks', hooks)) if value is not None]
+    if unsupported: raise ValueError(f"the VM doesn't support {', '.join(unsupported)}, use run_code instead")
+    program: Program = text if isinstance(text, Program) else parse_program(text)
+    vars: Scope = injected_vars if isinstance(injected_vars, Scope) else Scope(injected_vars if isinstance(injected_vars, dict) else {})
+    if injected_funcs is None and output is None: output = OutputSink()
+    funcs: Scope = injected_funcs if isinstance(injected_funcs, Scope) else Scope(injected_funcs if isinstance(injected_funcs, dict) else {})
+    used_stack: list[str] = []
+    if injected_funcs is None: funcs.update(make_builtins(used_stack, output, vars, funcs))
+
+    if output is not None: output.capture()
+    try: value, err = execute(compile_program(program), vars, funcs, used_stack, output, modules)
+    finally:
+        if output is not None:
+            output.flush()
+            output.release()
+    errcode = 0
+    if isinstance(err, Return): return 2, (vars, funcs, value)
+    elif isinstance(err, Exit): errcode = 1
+    elif isinstance(err, NoPrint): errcode = -1
+    elif err:
+        print(err.error())
+        return -1, None
+    if return_values: return errcode, (vars, funcs, None)
+    return errcode, None
@@ -1,37 +1,19 @@
-from typing import Any
+from typing import Any, Callable
+import ast
+import keyword
+import marshal
+import os
+from types import CodeType
+from collections import OrderedDict
 from random import randint
 import time
+import cat_array
 import cat_funcs
+from cat_lexer import Token, tokenize, NAME, STRING, ERROR, closing_bracket, split_tokens, find_token, span
+from cat_output import OutputSink
 
 
 
-def split_str_by_index(string: str, index: int, error_if_index_to_big: bool = True) -> tuple[str, str, str]:
-    '''Returns the part of the string leading up to, the character at, and the string after, the index\n
-    If `error_if_index_to_big` is `False`, returns the original string, else raises an IndexError'''
-    #if index < 0: index += len(string)
-    if index > len(string) - 1 or index < 0:
-        if error_if_index_to_big:
-            raise IndexError(f"index {index} is out of range of string(len {len(string)})")
-        return string, '', ''
-    return string[:index], string[index], string[index+1:]
-
-
-def concat_dict(old_dict: dict[Any, Any], new_kv_pairs: tuple[Any, Any] | list[tuple[Any, Any]] | dict[Any, Any]) -> dict[Any, Any]:
-    out = old_dict.copy()
-    if isinstance(new_kv_pairs, dict):
-        if len(new_kv_pairs) == 1: out[list(new_kv_pairs)[0]] = new_kv_pairs[list(new_kv_pairs)[0]]
-        else:
-            for k, v in new_kv_pairs:
-                out[k] = v
-    elif isinstance(new_kv_pairs, tuple):
-        out[new_kv_pairs[0]] = new_kv_pairs[1]
-    else:
-        if len(new_kv_pairs) == 1: out[new_kv_pairs[0][0]] = new_kv_pairs[0][1]
-        for kv in new_kv_pairs:
-            out[kv[0]] = kv[1]
-    return out
-
-
 def generate_dict(entries: list[tuple[Any, set[Any]]]) -> dict[Any, Any]:
     out: dict[Any, Any] = {}
     for e in entries:
@@ -42,7 +24,7 @@ def generate_dict(entries: list[tuple[Any, set[Any]]]) -> dict[Any, Any]:
     return out
 
 
-CATSCRIPT_TYPES = generate_dict([ ('Int', ['int', 'integer']), ('Float', 'float'), ('String', ['string', 'str']), ('List', 'list'), ('Tuple', 'tuple'), ('Dict', ['dict', 'dictionary']), ('Set', 'set'), ('Null', ['null', 'nil', 'none', 'nonetype']) ])
+CATSCRIPT_TYPES = generate_dict([ ('Int', ['int', 'integer']), ('Float', 'float'), ('String', ['string', 'str']), ('List', 'list'), ('Tuple', 'tuple'), ('Dict', ['dict', 'dictionary']), ('Set', 'set'), ('Null', ['null', 'nil', 'none', 'nonetype']), ('Array', 'catarray') ])
 def to_catscript_type(t: str) -> str:
     return CATSCRIPT_TYPES.get(t.casefold(), t.casefold().capitalize())
 
@@ -101,49 +83,202 @@ class Error:
     
     def TypeErr(details: str, linenum: str):
         return Error('TypeError', details, linenum)
-    
-    def NoPrint(linenum: int):
-        "This error causes the interpreter to act as if there is an error, but not print it's details"
-        return Error('NoPrint', "This error causes the interpreter to act as if there is an error, but not print it's details", linenum)
-
-    # flag errors that makes the interpreter do things
-    def LineJump(linenum: tuple[int, int]):
-        "This error causes the interpreter to jump to the line stored in the second index of `ln`"
-        return Error('LineJump', "This error causes the interpreter to jump to the line stored in the second index of `ln`", linenum)
-    
-    def ScheduledLineJump(linenum: tuple[int, int, int]):
-        "This error causes the interpreter to jump to the line stored in the second index of `ln` when at the line stored in the third index of `ln`"
-        return Error('ScheduledLineJump', "This error causes the interpreter to jump to the line stored in the second index of `ln` when at the line stored in the third index of `ln`", linenum)
-    
-    def Exit(linenum: int):
-        "This error causes the interpreter to exit without an error, and an error code of `1`"
-        return Error('Exit', "This error causes the interpreter to exit without an error, and an error code of `1`", linenum)
-    
-    def Return(linenum: int):
-        "This error causes the interpreter to return the eval result of the current line, and an error code of `2`"
-        return Error('Return', "This error causes the interpreter to return the eval result of the current line, and an error code of `2`", linenum)
 
 
 
+class Signal:
+    '''A control signal, returned by a statement in place of an `Error` to make the interpreter do things\n
+    Signals are small `__slots__` objects(the common ones are preallocated) so jumping never builds an `Error` or formats a message'''
+    __slots__ = ()
+
+    def __repr__(self) -> str: return type(self).__name__
+
+class LineJump(Signal):
+    "Causes the interpreter to jump to line `to`"
+    __slots__ = ('to',)
+
+    def __init__(self, to: int) -> None: self.to: int = to
+
+    def __repr__(self) -> str: return f"LineJump({self.to})"
+
+class ScheduledLineJump(Signal):
+    "Causes the interpreter to jump to line `to` once it reaches line `at`, `origin` is the line that scheduled it"
+    __slots__ = ('origin', 'at', 'to')
+
+    def __init__(self, origin: int, at: int, to: int) -> None:
+        self.origin: int = origin
+        self.at: int = at
+        self.to: int = to
+
+    def __repr__(self) -> str: return f"ScheduledLineJump({self.origin}, {self.at}, {self.to})"
+
+class Exit(Signal):
+    "Causes the interpreter to exit without an error, and an error code of `1`"
+    __slots__ = ()
+
+class NoPrint(Signal):
+    "Causes the interpreter to act as if there is an error, but not print it's details(because it was already printed)"
+    __slots__ = ()
+
+class Return(Signal):
+    "Causes the interpreter to return the eval result of the current line, and an error code of `2`"
+    __slots__ = ()
+
+class Suspend(Signal):
+    '''Returned by a builtin that has to wait, `cat_async.run_code_async` awaits `awaitable`(which gives `(value, error)`) and the line carries on with the value\n
+    `state` is where the line was, see `eval_exprs`'''
+    __slots__ = ('awaitable', 'state')
+
+    def __init__(self, awaitable: Any) -> None:
+        self.awaitable: Any = awaitable
+        self.state: tuple[list[Any], int, int] | None = None
+
+EXIT = Exit()
+NO_PRINT = NoPrint()
+RETURN = Return()
+
+
+
+class Scope(dict):
+    '''A dict of variables(or functions) that falls back to its parent scope for names it doesn't have\n
+    Loop iterations and function calls get a new, empty `Scope` whose parent is the current one, instead of a copy of every outer name\n
+    `in`, `[]` and `get()` see the whole chain, use `owner()` to find the scope that holds a name'''
+    __slots__ = ('parent',)
+
+    def __init__(self, values: dict[str, Any] | list[tuple[str, Any]] = (), parent: 'Scope | None' = None) -> None:
+        dict.__init__(self, values)
+        self.parent: Scope | None = parent
+
+    def __missing__(self, key: str) -> Any:
+        # walks the chain instead of recursing, a deep chain of calls is a deep chain of scopes
+        scope = self.parent
+        while scope is not None:
+            if dict.__contains__(scope, key): return dict.__getitem__(scope, key)
+            scope = scope.parent
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self.owner(key) is not None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try: return self[key]
+        except KeyError: return default
+
+    def owner(self, key: str) -> 'Scope | None':
+        "Returns the innermost scope that defines `key`, or `None` if it isn't defined anywhere in the chain"
+        scope = self
+        while scope is not None:
+            if dict.__contains__(scope, key): return scope
+            scope = scope.parent
+        return None
+
+    def chain(self) -> list['Scope']:
+        "Returns this scope and its parents, innermost first"
+        out = []
+        scope = self
+        while scope is not None:
+            out.append(scope)
+            scope = scope.parent
+        return out
+
+    def names(self) -> set[str]:
+        "Returns every name visible from this scope"
+        out = set()
+        for scope in self.chain(): out.update(dict.keys(scope))
+        return out
+
+    def flatten(self) -> dict[str, Any]:
+        "Returns a plain dict of every name visible from this scope, inner scopes take priority"
+        out = {}
+        for scope in reversed(self.chain()): out.update(scope)
+        return out
+
+
 class ArgNotGiven:
     def __repr__(self) -> str: return 'ArgNotGiven'
 
+MEMO_SIZE = 1024
+
+class MemoTable:
+    '''The results of a `memo fn`, a bounded LRU cache keyed by the arguments it was called with
+
+    Only the arguments are part of the key, so it's up to the function to not depend on anything else(like the caller's variables)'''
+    def __init__(self, maxsize: int = MEMO_SIZE) -> None:
+        self.__maxsize: int = maxsize
+        self.__results: OrderedDict[tuple[Any, ...], Any] = OrderedDict()
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__unhashable: int = 0
+
+    def key(self, inputs: list[tuple[str, Any]]) -> tuple[Any, ...] | None:
+        "Returns the key for a call with the bound arguments `inputs`, or `None` if an argument isn't hashable(and the call can't be cached)"
+        # the types are part of the key, so `1`, `1.0` and `true` aren't the same call
+        key = tuple((type(v), v) for _, v in inputs)
+        try: hash(key)
+        except TypeError:
+            self.__unhashable += 1
+            return None
+        return key
+
+    def lookup(self, key: tuple[Any, ...]) -> tuple[bool, Any]:
+        "Returns whether the call was cached and its result"
+        if key in self.__results:
+            self.__hits += 1
+            self.__results.move_to_end(key)
+            return True, self.__results[key]
+        self.__misses += 1
+        return False, None
+
+    def store(self, key: tuple[Any, ...], result: Any):
+        self.__results[key] = result
+        if len(self.__results) > self.__maxsize: self.__results.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.__hits, 'misses': self.__misses, 'unhashable': self.__unhashable, 'size': len(self.__results), 'maxsize': self.__maxsize}
+
+    def clear(self):
+        self.__results.clear()
+        self.__hits = self.__misses = self.__unhashable = 0
+
+    def __len__(self) -> int: return len(self.__results)
+
 class Func:
-    def __init__(self, name: str, code: list[str], args: list[tuple[str, bool, Any | None]] = [], desciption: str = '[no description]') -> None:
+    def __init__(self, name: str, code: 'Program', args: list[tuple[str, bool, Any | None]] = [], desciption: str = '[no description]', memo: bool = False) -> None:
         self.__name: str = name
         self.__desc: str = desciption
-        self.__code: list[str] = code
+        self.__code: Program = code
         self.__args: list[tuple[str, bool]] = args
+        self.__memo: MemoTable | None = MemoTable() if memo else None
+        self.module: Any = None # the `cat_modules.Module` that defined it, if it was imported
     
     def name(self) -> str: return self.__name
 
+    def memo(self) -> MemoTable | None:
+        "Returns the results cache of a `memo fn`, or `None` if it isn't one"
+        return self.__memo
+
+    def memo_stats(self) -> dict[str, int] | None:
+        "Returns the hits, misses and size of the results cache of a `memo fn`, or `None` if it isn't one"
+        return self.__memo.stats() if self.__memo is not None else None
+
     def desc(self) -> str: return self.__desc
 
-    def run(self, vars: dict[str, Any], funcs: dict[str, tuple[bool, Any]], lines: list[str], used_stack: list[str], ln: int, inputs: list[Any]) -> tuple[int, tuple[dict[str, Any], dict[str, object], Any] | None, Error | None]:
-        #print(self.__args)
-        #print(inputs)
+    def args(self) -> list[tuple[str, bool, Any | None]]: return self.__args
+
+    def code(self) -> 'Program': return self.__code
+
+    def scopes(self, inputs: list[tuple[str, Any]], vars: Scope, funcs: Scope) -> tuple[Scope, Scope]:
+        '''Returns the variables and functions scopes a call with the bound arguments `inputs` runs with, when called from `vars` and `funcs`
+
+        The arguments shadow the caller's variables, everything else is looked up in(and written through to) the caller's scope,
+        unless the fn was imported, then it's its module's'''
+        if self.module is not None: return self.module.scopes(inputs, funcs, self.__code)
+        return Scope(inputs, vars), self.__code.funcs_scope(funcs)
+
+    def bind(self, inputs: list[Any], ln: int) -> tuple[list[tuple[str, Any]] | None, Error | None]:
+        "Pairs the given inputs with the argument names, filling in defaults"
         if len(inputs) > len(self.__args):
-            return -1, None, Error('FuncError', f"expected {len(self.__args)} arguments, but {len(inputs)} were given", ln)
+            return None, Error('FuncError', f"expected {len(self.__args)} arguments, but {len(inputs)} were given", ln)
         
         formatted_inputs = []
 
@@ -151,314 +286,831 @@ class Func:
             formatted_inputs.append((self.__args[n][0], i))
         if len(formatted_inputs) < len(self.__args):
             if not self.__args[len(formatted_inputs)][1]:
-                return -1, None, Error('FuncError', f"expected {len(self.__args)} arguments, but {len(formatted_inputs)} were given", ln)
+                return None, Error('FuncError', f"expected {len(self.__args)} arguments, but {len(formatted_inputs)} were given", ln)
             else:
                 for a in self.__args[len(formatted_inputs):]:
                     formatted_inputs.append((a[0], a[2]))
-        
-        run_res = run_code(self.__code, used_stack, True, injected_vars=concat_dict(vars, formatted_inputs), injected_funcs=funcs.copy())
-        return (*run_res, None)
+        return formatted_inputs, None
 
+    def run(self, vars: Scope, funcs: Scope, lines: list[str], used_stack: list[str], ln: int, inputs: list[Any], hooks: Any = None, output: OutputSink | None = None, budget: Any = None, profiler: Any = None) -> tuple[int, tuple[Scope, Scope, Any] | None, Error | None]:
+        '''Runs a call in a `run_code` of its own, `output` is the caller's sink, it's flushed before an error in the call is printed\n
+        `hooks`, `budget` and `profiler` are the caller's run's, the call is part of that run for them'''
+        #print(self.__args)
+        #print(inputs)
+        formatted_inputs, err = self.bind(inputs, ln)
+        if err: return -1, None, err
 
-def process_args(args: list[str], vars: dict[str, Any], funcs: dict[str, tuple[bool, Func | Any]], lines: list[str], used_stack: list[str], ln: int) -> tuple[list[tuple[str, bool, Any | None]], Error | None]:
-    out: list[tuple[str, bool, Any | None]] = []
-    for a in args:
-        if '=' in a:
-            argname, arg_default = a.split('=', 1)
-            c_arg_default, arg_def_err = evaluate(vars, funcs, arg_default.strip(), lines, used_stack, ln)
-            if arg_def_err: return None, arg_def_err
-            out.append((argname.strip(), True, c_arg_default))
-        else: out.append((a, False, None))
-    return out, None
-
-
-
-def get_char_not_in_str(string: str, char: str, quote_char: str = '"', nth_char_to_get: int = 1, respect_escapes: bool = True) -> int:
-    '''Returns the index of `char` in the given string
-    Returns `-1` if the char is not found'''
-    if char not in string: return -1
-    in_str = False
-    ignore_quote = 0
-    char_count = 0 if nth_char_to_get - 1 < 0 else nth_char_to_get - 1
-    for cn, c in enumerate(string):
-        if c == quote_char and not ignore_quote:
-            in_str = not in_str
-        elif c == '\\' and respect_escapes and in_str: ignore_quote = 2
-        elif c == char and not in_str:
-            if char_count: char_count -= 1
-            else: return cn
-        if ignore_quote: ignore_quote -= 1
-    return -1
-
-
-def split_by_chars_not_in_str(string: str, char: str, strip_splits: bool = False, quote_char: str = '"', respect_escapes: bool = True) -> list[str]:
-    if char not in string: return [string]
-    out: list[str] = []
-    current = string
-    while char in current:
-        char_index = get_char_not_in_str(current, char, quote_char, 1, respect_escapes)
-        if char_index == -1: out.append(current); return out
-        o, _, next = split_str_by_index(current, char_index)
-        if strip_splits: out.append(o.strip())
-        else: out.append(o)
-        current = next
-    if strip_splits: out.append(current.strip())
-    else: out.append(current)
-    return out
+        key = self.__memo.key(formatted_inputs) if self.__memo is not None else None
+        if key is not None:
+            hit, res = self.__memo.lookup(key)
+            if hit: return 2, (vars, funcs, res), None
+        
+        call_vars, call_funcs = self.scopes(formatted_inputs, vars, funcs)
+        if budget is not None:
+            err = budget.enter(ln)
+            if err:
+                budget.leave()
+                return -1, None, err
+        if profiler is not None: profiler.call(self.__name, self.__code.offset)
+        if hooks is not None: hooks.call(self.__name, ln if ln is not None else hooks.ln)
+        run_res = run_code(self.__code, used_stack, True, injected_vars=call_vars, injected_funcs=call_funcs, profiler=profiler, output=output, budget=budget, hooks=hooks)
+        if hooks is not None: hooks.call_done()
+        if profiler is not None: profiler.call_done()
+        if budget is not None: budget.leave()
+        if key is not None and run_res[0] in (0, 2): self.__memo.store(key, run_res[1][2])
+        return (*run_res, None)
 
 
-def collect_until_token(lines: list[str], ln: int, closing_token: str = '}', opening_token: str = '{') -> tuple[list[str], Error | None]:
-    out = []
-    nest = 0
-    for l in lines:
-        if l == closing_token:
-            if nest: out.append(l); nest -= 1
-            else: return out, None
-        else:
-            if l.endswith(opening_token) and not l.startswith(closing_token): nest += 1
-            out.append(l)
-    return None, Error.SyntaxErr(f"expected '{closing_token}', but found end of file", ln)
-
-
-def get_index_of_next_token_if(lines: list[str], ln: int, endcode: int = 0) -> tuple[int, Error | None]: # , tokens: str | tuple[str] = '}'):
-    '''`endcode`:
-    <= 0: `}`\n
-    1: `else`
-    >= 2: `elseif`
-    '''
-    #if isinstance(tokens, str): tokens = tuple([tokens])
-    nest: list[bool] = []
-    for n, l in enumerate(lines):
-        #print(n, endcode, nest, f"'{l}'")
-        if l.endswith('{') and not l.startswith('}'):
-            if l.startswith('if '): nest.append(True)
-            else: nest.append(False)
-        elif l == '}':
-            if len(nest): nest.pop()
-            elif endcode <= 0: return (n + 1) + ln, None
-            else: return -1, None
-        elif l in ('} else {', '}else {', '} else{', '}else{'):
-            if endcode == 1:
-                if len(nest):
-                    if not nest[-1]:
-                        return None, Error.SyntaxErr("unexpected else", ln)
-                else: return (n + 1) + ln, None
-        elif l.startswith(('} elseif ', '}elseif ')) and l.endswith('{'):
-            if endcode >= 2:
-                if len(nest):
-                    if not nest[-1]:
-                        return None, Error.SyntaxErr("unexpected elseif", ln)
-                else: return (n + 1) + ln, None
-    return None, Error.SyntaxErr("expected '}', '} else {', or '} elseif {', but found end of file", ln)
-
-
-def evaluate(vars: dict[str, Any], funcs: dict[str, tuple[bool, Func | Any]], input: str, lines: list[str], used_stack: list[str], ln: int) -> tuple[Any, Error | None]:
-    #print(funcs)
-    #print([f + '(' for f in list(funcs)])
-    #print(f"'{input}'")
-
-    singlequote_index = get_char_not_in_str(input, "'")
-    if singlequote_index != -1:
+class CallSite:
+    "A `Name(args)` call inside of an expression, it's a CatScript call if `Name` is a function when it runs, otherwise Python runs `fallback`"
+    __slots__ = ('name', 'args', 'fallback', 'temp')
+
+    def __init__(self, name: str, args: tuple[CodeType, ...], fallback: CodeType, temp: str | None) -> None:
+        self.name: str = name
+        self.args: tuple[CodeType, ...] = args
+        self.fallback: CodeType = fallback
+        self.temp: str | None = temp # the variable the result is stored in, `None` if the call is the whole expression
+
+
+class Expr:
+    '''An expression, compiled once by `compile_expr`\n
+    The calls in it that always run are pulled out into `sites`, which run first(innermost first) and store their results in temporary variables that `code` reads,
+    so a call to a CatScript function can run in its own frame instead of inside of Python's `eval`\n
+    If the whole expression is a single call, `code` is `None` and its value is the result of the last site'''
+    __slots__ = ('source', 'code', 'sites', 'exc')
+
+    def __init__(self, source: str, code: CodeType | None, sites: tuple[CallSite, ...] = (), exc: Exception | None = None) -> None:
+        self.source: str = source
+        self.code: CodeType | None = code
+        self.sites: tuple[CallSite, ...] = sites
+        self.exc: Exception | None = exc # the error compiling it gave, raised when(and if) it runs
+
+    def __reduce__(self):
+        # code objects can't be pickled, but they can be marshalled, so loading it doesn't compile it again
+        sites = tuple((site.name, site.args, site.fallback, site.temp) for site in self.sites)
+        return _load_expr, (self.source, marshal.dumps((self.code, sites)), self.exc)
+
+    def __repr__(self) -> str: return f"Expr({self.source!r})"
+
+
+def _compile_node(node: ast.expr) -> CodeType:
+    return compile(ast.fix_missing_locations(ast.Expression(node)), '<string>', 'eval')
+
+
+def call_name(node: ast.Call) -> str | None:
+    "Returns the name a call looks its function up by, `Name` for `Name(args)` and `name.Name` for `name.Name(args)`(a fn of an imported module), or `None`"
+    func = node.func
+    if isinstance(func, ast.Name): return func.id
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name): return f'{func.value.id}.{func.attr}'
+    return None
+
+
+def _call_site(node: ast.Call, temp: str) -> CallSite:
+    return CallSite(call_name(node), tuple(_compile_node(a) for a in node.args), _compile_node(node), temp)
+
+
+def _hoist_calls(node: ast.AST, sites: list[Any], site: Callable[[ast.Call, str], Any] = _call_site) -> ast.AST:
+    '''Replaces the calls in `node` that always run with temporary variables, calls that only sometimes run(after `and`/`or`, in `x if c else y` and in lambdas and comprehensions) are left to Python\n
+    `site` makes what goes in `sites` from each call(with its arguments already replaced) and its temporary variable'''
+    if isinstance(node, ast.Lambda): return node
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        # only the first iterable is evaluated outside of the comprehension
+        node.generators[0].iter = _hoist_calls(node.generators[0].iter, sites, site)
+        return node
+    if isinstance(node, ast.BoolOp):
+        node.values[0] = _hoist_calls(node.values[0], sites, site)
+        return node
+    if isinstance(node, ast.IfExp):
+        node.test = _hoist_calls(node.test, sites, site)
+        return node
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST): setattr(node, field, _hoist_calls(value, sites, site))
+        elif isinstance(value, list): value[:] = [_hoist_calls(v, sites, site) if isinstance(v, ast.AST) else v for v in value]
+    if isinstance(node, ast.Call) and call_name(node) is not None and not node.keywords and not any(isinstance(a, ast.Starred) for a in node.args):
+        temp = f'__cat_{len(sites)}'
+        sites.append(site(node, temp))
+        return ast.copy_location(ast.Name(temp, ast.Load()), node)
+    return node
+
+
+def compile_expr(source: str) -> Expr:
+    "Compiles an expression into an `Expr`, this never raises, if it doesn't compile the error is kept for when it runs"
+    try:
+        tree = ast.parse(source, '<string>', 'eval')
+        sites: list[CallSite] = []
+        body = _hoist_calls(tree.body, sites)
+        if not sites: return Expr(source, compile(source, '<string>', 'eval'))
+        if isinstance(body, ast.Name) and body.id == sites[-1].temp:
+            sites[-1].temp = None
+            return Expr(source, None, tuple(sites))
+        tree.body = body
+        return Expr(source, compile(ast.fix_missing_locations(tree), '<string>', 'eval'), tuple(sites))
+    except Exception as e:
+        return Expr(source, None, (), e)
+
+
+class ExprCache:
+    "A bounded LRU cache of compiled expressions, so the same expression text is only compiled once"
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.__maxsize: int = maxsize
+        self.__exprs: OrderedDict[str, Expr] = OrderedDict()
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    def get(self, source: str) -> Expr:
+        "Returns the `Expr` for `source`, compiling it on a miss"
+        expr = self.__exprs.get(source)
+        if expr is not None:
+            self.__hits += 1
+            self.__exprs.move_to_end(source)
+            return expr
+        self.__misses += 1
+        expr = compile_expr(source)
+        self.__exprs[source] = expr
+        if len(self.__exprs) > self.__maxsize: self.__exprs.popitem(last=False)
+        return expr
+
+    def add(self, expr: Expr) -> Expr:
+        "Caches an already compiled `Expr`, returns the one that's cached for its source if there already is one"
+        cached = self.__exprs.get(expr.source)
+        if cached is not None: return cached
+        self.__exprs[expr.source] = expr
+        if len(self.__exprs) > self.__maxsize: self.__exprs.popitem(last=False)
+        return expr
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.__hits, 'misses': self.__misses, 'size': len(self.__exprs), 'maxsize': self.__maxsize}
+
+    def clear(self):
+        self.__exprs.clear()
+        self.__hits = self.__misses = 0
+
+    def __len__(self) -> int: return len(self.__exprs)
+
+EXPR_CACHE = ExprCache()
+
+def cached_expr(source: str) -> Expr: return EXPR_CACHE.get(source)
+
+
+def _load_expr(source: str, compiled: bytes, exc: Exception | None) -> Expr:
+    "Makes a pickled `Expr` again from its marshalled code objects"
+    code, sites = marshal.loads(compiled)
+    return EXPR_CACHE.add(Expr(source, code, tuple(CallSite(*site) for site in sites), exc))
+
+
+def eval_exprs(exprs: tuple[Expr, ...], vars: Scope, funcs: Scope, ln: int, resume: tuple[list[Any], int, int] | None = None, result: Any = None, hooks: Any = None, main: 'Frame | None' = None) -> tuple[list[Any] | None, Error | Signal | None, tuple[Func, list[Any], tuple[list[Any], int, int]] | None]:
+    '''Evaluates `exprs` in order, returns their values, or an error\n
+    If a call to a CatScript function has to run first, returns `(None, None, (func, inputs, state))` instead,
+    once the function returns, pass `state` as `resume` and its return value as `result` to carry on from the same call.
+    `hooks`(a `cat_hooks.Hooks`) are told about the builtins that are called, `main` is the first frame of the run, for `ScopedBuiltin`s'''
+    if resume is None:
+        values: list[Any] = []
+        i = j = 0
+    else:
+        values, i, j = resume
+        site = exprs[i].sites[j]
+        if site.temp is not None: vars[site.temp] = result
+        j += 1
+    while i < len(exprs):
+        expr = exprs[i]
+        sites = expr.sites
+        if sites:
+            while j < len(sites):
+                site = sites[j]
+                entry = funcs.get(site.name)
+                if entry is None:
+                    try: result = eval(site.fallback, vars)
+                    except Exception as e: return None, Error('EvalError', e, ln), None
+                else:
+                    try: inputs = [eval(arg, vars) for arg in site.args]
+                    except Exception as e: return None, Error('EvalError', e, ln), None
+                    is_builtin, func = entry
+                    if not is_builtin: return None, None, (func, inputs, (values, i, j))
+                    if hooks is not None: hooks.builtin(site.name)
+                    try: result, err = func.scoped(ln, vars, funcs, main, *inputs) if type(func) is ScopedBuiltin else func(ln, *inputs)
+                    except Exception as e: return None, Error('FuncError', e, ln), None
+                    if err:
+                        if type(err) is Suspend: err.state = (values, i, j)
+                        return None, err, None
+                if site.temp is not None: vars[site.temp] = result
+                j += 1
+            j = 0
+            if expr.code is None:
+                for site in sites: vars.pop(site.temp, None)
+                values.append(result)
+                i += 1
+                continue
+        elif expr.exc is not None: return None, Error('EvalError', expr.exc, ln), None
+        try: values.append(eval(expr.code, vars))
+        except Exception as e: return None, Error('EvalError', e, ln), None
+        finally:
+            for site in sites: vars.pop(site.temp, None)
+        i += 1
+    return values, None, None
+
+
+def evaluate(vars: dict[str, Any], funcs: dict[str, tuple[bool, Func | Any]], input: str, lines: list[str], used_stack: list[str], ln: int, hooks: Any = None, output: OutputSink | None = None) -> tuple[Any, Error | Signal | None]:
+    "Evaluates a single expression outside of `run_code`, calls to CatScript functions in it are run with `Func.run()`, `hooks` and `output` are passed on to them"
+    if "'" in input and any(tok.kind == ERROR and tok.text == "'" for tok in tokenize(input)[1][0]):
         return None, Error.SyntaxErr("unexpected \"'\"", ln)
-    del singlequote_index
 
-    if input.startswith(tuple([f + '(' for f in list(funcs)])) and input.endswith(')'):
-        funcname, fargs = input.removesuffix(')').split('(', 1)
-        op_count = fargs.count('(')
-        cl_count = fargs.count(')')
-        
-        if op_count > cl_count:
-            fargs += (')' * (op_count - cl_count))
-        elif op_count < cl_count:
-            fargs = ('(' * (cl_count - op_count)) + fargs
-            
-        if fargs.strip() != '':
-            func_inputs, err = evaluate(vars, funcs, fargs.strip(), lines, used_stack, ln)
-        else: func_inputs, err = [], None
-        if err: return None, err
-        
-        if funcs[funcname][0]:
-            try:
-                if not isinstance(func_inputs, (list, tuple, set, dict)): func_inputs = [func_inputs]
-                #print(f"finp: '{func_inputs}'")
-                return funcs[funcname][1](ln, *func_inputs)
-            except Exception as e:
-                return None, Error('FuncError', e, ln)
+    exprs = (EXPR_CACHE.get(input),)
+    values, err, call = eval_exprs(exprs, vars, funcs, ln, None, None, hooks)
+    while call is not None:
+        func, inputs, state = call
+        func_errcode, func_res, func_err = func.run(vars, funcs, lines, used_stack, ln, inputs, hooks, output)
+        if func_err: return None, func_err
+        if func_errcode < 0: return None, NO_PRINT
+        elif func_errcode == 1: return None, EXIT
+        values, err, call = eval_exprs(exprs, vars, funcs, ln, state, func_res[2], hooks)
+    if err: return None, err
+    return values[0], None
+
+
+
+class Block:
+    "An opening line of a `{ ... }` block, with the lines of its `} elseif`/`} else {` branches and its closing `}` (all starting at 1)"
+    __slots__ = ('line', 'is_if', 'branches', 'end', 'bad')
+
+    def __init__(self, line: int, is_if: bool) -> None:
+        self.line: int = line
+        self.is_if: bool = is_if
+        self.branches: list[tuple[int, bool]] = [] # (line, is_else)
+        self.end: int = -1
+        self.bad: list[tuple[int, bool]] = [] # elseif/else lines in a nested non-`if` block, (line, is_else)
+
+    def body(self, lines: list[str]) -> list[str]: return lines[self.line:self.end - 1]
+
+    def branch_targets(self, ln: int) -> tuple[int, int, Error | None]:
+        "Returns the next branch after line `ln` (or `-1`) and the closing line of the chain"
+        later = [b for b in self.branches if b[0] > ln]
+        next_if = next((b for b, is_else in later if not is_else), -1)
+        if next_if == -1:
+            # no elseif, look for an else, an unexpected elseif on the way still errors
+            for b, is_else in self.bad:
+                if ln < b and not is_else and (self.end == -1 or b < self.end):
+                    return -1, -1, Error.SyntaxErr("unexpected elseif", ln)
+            if self.end == -1:
+                return -1, -1, Error.SyntaxErr("expected '}', '} else {', or '} elseif {', but found end of file", ln)
+            next_if = next((b for b, is_else in later if is_else), -1)
+            for b, is_else in self.bad:
+                if ln < b and is_else and (b < next_if if next_if != -1 else b < self.end):
+                    return -1, -1, Error.SyntaxErr("unexpected else", ln)
         else:
-            if not isinstance(func_inputs, (list, tuple, set, dict)): func_inputs = [func_inputs]
-            func_errcode, func_res, func_err = funcs[funcname][1].run(vars, funcs, lines, used_stack, ln, func_inputs)
-            if func_err: return None, func_err
-            if func_errcode < 0:
-                return None, Error.NoPrint(ln)
-            elif func_errcode == 1:
-                return None, Error.Exit(ln)
+            for b, is_else in self.bad:
+                if ln < b < next_if and not is_else:
+                    return -1, -1, Error.SyntaxErr("unexpected elseif", ln)
+        if self.end == -1:
+            return -1, -1, Error.SyntaxErr("expected '}', '} else {', or '} elseif {', but found end of file", ln)
+        return next_if, self.end, None
+
+
+def is_else(toks: list[Token]) -> bool: return len(toks) == 3 and toks[0].text == '}' and toks[1].text == 'else' and toks[2].text == '{'
+
+def is_elseif(toks: list[Token]) -> bool: return len(toks) > 3 and toks[0].text == '}' and toks[1].text == 'elseif' and toks[-1].text == '{'
+
+
+def build_block_table(tokens: list[list[Token]]) -> dict[int, Block]:
+    "Matches every opening line with its branches and closing `}` in one pass over the tokens of each line, returns the blocks by their opening line(and by the lines of their branches)"
+    blocks: dict[int, Block] = {}
+    stack: list[Block] = []
+    for n, toks in enumerate(tokens, 1):
+        if not toks: continue
+        first = toks[0].text
+        if toks[-1].text == '{' and first != '}':
+            block = Block(n, first == 'if')
+            blocks[n] = block
+            stack.append(block)
+        elif first == '}' and len(toks) == 1:
+            if stack: stack.pop().end = n
+        elif stack and (is_else(toks) or is_elseif(toks)):
+            branch = (n, len(toks) == 3)
+            if stack[-1].is_if:
+                stack[-1].branches.append(branch)
+                blocks[n] = stack[-1]
             else:
-                new_vars, new_funcs, func_returned = func_res
-                for varkey in new_vars:
-                    if varkey in list(vars): vars[varkey] = new_vars[varkey]
-                for funckey in new_funcs:
-                    if funckey in list(funcs): funcs[funckey] = new_funcs[funckey]
-                
-                if func_errcode == 2:
-                    return func_returned, None
-                else: return None, None
-        #return None, None
-
-    elif input.startswith('fn ') and '(' in input and input.endswith((') {', '){')):
-        funcname, args_raw = input.removeprefix('fn ').removesuffix(') {').removesuffix('){').split('(', 1)
-        funcname, args_raw = funcname.strip(), args_raw.strip()
-
-        args_raw_split = split_by_chars_not_in_str(args_raw, ',', True)
-
-        processed_args, p_args_err = process_args(args_raw_split, vars, funcs, lines, used_stack, ln)
-        if p_args_err: return None, p_args_err
-        
-        func_lines, func_lines_err = collect_until_token(lines[ln:], ln)
-        if func_lines_err: return None, func_lines_err
-        
-        funcs[funcname] = (False, Func(funcname, func_lines, processed_args))
-        return None, Error.LineJump((ln, (ln + len(func_lines)) + 2))
-
-    elif input.startswith('lt ') and '=' in input:
-        varname, val = input.removeprefix('lt ').split('=', 1)
-        varname = varname.strip()
-        if varname in list(vars): return None, Error('VariableError', f"cannot create variable '{varname}', already exists", ln)
-        c_val, err = evaluate(vars, funcs, val.strip(), lines, used_stack, ln)
-        if err: return None, err
-        vars[varname] = c_val
+                for b in stack:
+                    if b.is_if: b.bad.append(branch)
+    return blocks
+
+
+class Stmt:
+    '''A single parsed line of CatScript, produced once by `parse_program`\n
+    `run_code` evaluates the line's `exprs` and passes their values to `apply()`, if `has_check` is set `check()` is called before evaluating them'''
+    __slots__ = ('ln', 'source', 'exprs')
+    has_check: bool = False
+
+    def __init__(self, ln: int, source: str, exprs: tuple[Expr, ...] = ()) -> None:
+        self.ln: int = ln
+        self.source: str = source
+        self.exprs: tuple[Expr, ...] = exprs
+
+    def check(self, frame: 'Frame') -> Error | None: return None
+
+    def apply(self, values: list[Any], frame: 'Frame', frames: list['Frame']) -> tuple[Any, Error | Signal | None]:
+        return values[0], None
+
+    def __repr__(self) -> str: return f"{type(self).__name__}({self.ln}, {self.source!r})"
+
+
+class ExprStmt(Stmt):
+    "A line that is evaluated as a plain expression"
+    __slots__ = ()
+
+    def __init__(self, ln: int, source: str) -> None:
+        super().__init__(ln, source, (cached_expr(source),))
+
+
+class ErrorStmt(Stmt):
+    "A line that could not be parsed, the error is raised when (and if) the line is reached"
+    __slots__ = ('err',)
+
+    def __init__(self, ln: int, source: str, err: Error) -> None:
+        super().__init__(ln, source)
+        self.err: Error = err
+
+    def apply(self, values, frame, frames): return None, self.err
+
+
+class Call(ExprStmt):
+    "`Name(args)`, a plain expression if `Name` isn't a CatScript function"
+    __slots__ = ('name',)
+
+    def __init__(self, ln: int, source: str, name: str) -> None:
+        super().__init__(ln, source)
+        self.name: str = name
+
+
+class ReturnStmt(Stmt):
+    "`return value`(or just `return`), leaves the current function with the value"
+    __slots__ = ()
+
+    def __init__(self, ln: int, source: str) -> None:
+        value = source.removeprefix('return').strip()
+        super().__init__(ln, source, (cached_expr(value),) if value else ())
+
+    def apply(self, values, frame, frames):
+        return values[0] if values else None, RETURN
+
+
+class LetStmt(Stmt):
+    "`lt name = value`"
+    __slots__ = ('name',)
+    has_check = True
+
+    def __init__(self, ln: int, source: str, name: str, value: str) -> None:
+        super().__init__(ln, source, (cached_expr(value),))
+        self.name: str = name
+
+    def check(self, frame):
+        if self.name in frame.vars: return Error('VariableError', f"cannot create variable '{self.name}', already exists", self.ln)
+        return None
+
+    def apply(self, values, frame, frames):
+        frame.vars[self.name] = values[0]
         return None, None
 
-    elif input.startswith(tuple([v + '=' for v in list(vars)]) + tuple([v + ' =' for v in list(vars)])) and not input.startswith(tuple([v + '==' for v in list(vars)]) + tuple([v + ' ==' for v in list(vars)])):
-        varname, val = input.split('=', 1)
-        varname = varname.strip()
-        if varname not in list(vars): return None, Error('VariableError', f"variable '{varname}' does not exist", ln)
-        c_val, err = evaluate(vars, funcs, val.strip(), lines, used_stack, ln)
-        if err: return None, err
-        vars[varname] = c_val
+
+class AssignStmt(Stmt):
+    "`name = value`, an error if `name` isn't an existing variable"
+    __slots__ = ('name',)
+    has_check = True
+
+    def __init__(self, ln: int, source: str, name: str, value: str) -> None:
+        super().__init__(ln, source, (cached_expr(value),))
+        self.name: str = name
+
+    def check(self, frame):
+        # an assignment doesn't compile as an expression, so this is the error evaluating the line gives
+        if frame.vars.owner(self.name) is None: return Error('EvalError', cached_expr(self.source).exc, self.ln)
+        return None
+
+    def apply(self, values, frame, frames):
+        frame.vars.owner(self.name)[self.name] = values[0]
         return None, None
-    
-    elif input.startswith('for ') and input.endswith('{'):
-        invalid_for_expr = lambda expr, reason = '': Error.ExprErr(f"invalid for loop expression '{expr}'{f'({reason})' if reason else ''}", ln)
-        for_expr = input.removeprefix('for ').removesuffix('{').strip()
-        if '=' in for_expr and ',' in for_expr:
-            assign_index = get_char_not_in_str(for_expr, '=')
-            if assign_index == -1:
-                return None, invalid_for_expr(for_expr, "expected format `[varname] = [start], [end]` but missing `=`")
-            
-            floop_varname, _, floop_range = split_str_by_index(for_expr, assign_index)
-            floop_varname, floop_range = floop_varname.strip(), floop_range.strip()
-
-            comma_index = get_char_not_in_str(floop_range, ',')
-            if comma_index == -1:
-                return None, invalid_for_expr(for_expr, "expected format `[varname] = [start], [end]` but missing `,`")
-            
-            start, _, end = split_str_by_index(floop_range, comma_index)
-            
-            c_start, start_err = evaluate(vars, funcs, start, lines, used_stack, ln)
-            if start_err: return None, start_err
-            if not isinstance(c_start, int):
-                return None, Error('TypeError', f"expected Int for range start, but {to_catscript_type(type(c_start).__name__)} was given instead")
-            
-            c_end, end_err = evaluate(vars, funcs, end, lines, used_stack, ln)
-            if end_err: return None, end_err
-            if not isinstance(c_start, int):
-                return None, Error('TypeError', f"expected Int for range end, but {to_catscript_type(type(c_start).__name__)} was given instead")
-
-            floop_lines, floop_lines_err = collect_until_token(lines[ln:], ln)
-            if floop_lines_err: return None, floop_lines_err
-
-            for floop_iter_index in range(c_start, c_end):
-                floop_errcode, floop_res = run_code(floop_lines, used_stack, True, vars.copy() if floop_varname == '_' else concat_dict(vars, (floop_varname, floop_iter_index)), funcs.copy())
-                if floop_errcode < 0:
-                    return None, Error.NoPrint(ln)
-                elif floop_errcode == 1:
-                    return 1, None
-                elif floop_errcode == 0:
-                    for varkey in floop_res[0]:
-                        if varkey in list(vars): vars[varkey] = floop_res[0][varkey]
-                    for funckey in floop_res[1]:
-                        if funckey in list(funcs): funcs[funckey] = floop_res[1][funckey]
-            return None, Error.LineJump((ln, (ln + len(floop_lines)) + 2))
-        else:
-            return None, invalid_for_expr(for_expr)
-        
-    elif input.startswith(('if ', '} elseif ', '}elseif ')) and input.endswith('{'):
-        if_res, if_err = evaluate(vars, funcs,
-                                  input.removeprefix('if ').removeprefix('} elseif ').removeprefix('}elseif ').removesuffix('{').strip(),
-                                  lines, used_stack, ln)
-        if if_err: return None, if_err
-
-        next_if, next_if_err = get_index_of_next_token_if(lines[ln:], ln, 2)
-        if next_if_err: return None, next_if_err
-        if next_if == -1:
-            next_if, next_if_err2 = get_index_of_next_token_if(lines[ln:], ln, 1)
-            if next_if_err2: return None, next_if_err2
-        end_of_if, end_of_if_err = get_index_of_next_token_if(lines[ln:], ln, 0)
-        if end_of_if_err: return None, end_of_if_err
-
-        if if_res:
-            #print(next_if, end_of_if)
-            if next_if == -1: return None, Error.ScheduledLineJump((ln, end_of_if, end_of_if+1))
-            return None, Error.ScheduledLineJump((ln, next_if, end_of_if+1))
-        else:
-            if next_if == -1: return None, Error.LineJump((ln, end_of_if+1))
-            return None, Error.LineJump((ln, next_if))
-    
-    elif input in ('} else {', '}else {', '} else{', '}else{'):
-        end_of_if, end_of_if_err = get_index_of_next_token_if(lines[ln:], ln, 0)
-        if end_of_if_err: return None, end_of_if_err
-        return None, Error.ScheduledLineJump((ln, end_of_if, end_of_if+1))
 
-    elif input.startswith('goto '):
-        e_linenum, err = evaluate(vars, funcs, input.removeprefix('goto '), lines, used_stack, ln)
+
+class FnDef(Stmt):
+    '''`fn Name(args) {` or `memo fn Name(args) {`, the body is parsed once into its own `Program`, the default values of the arguments are its `exprs`
+
+    A `memo fn` caches its results by its arguments, so its body can't call builtins with side effects(`IMPURE_BUILTINS`)'''
+    __slots__ = ('name', 'args', 'body', 'body_err', 'end', 'jump', 'memo', 'impure')
+
+    def __init__(self, ln: int, source: str, toks: list[Token], lines: list[str], tokens: list[list[Token]], blocks: dict[int, Block], offset: int = 0) -> None:
+        self.memo: bool = toks[0].text == 'memo'
+        head = 2 if self.memo else 1 # the name's token
+        args: list[tuple[str, bool]] = [] # (name, has a default)
+        defaults: list[Expr] = []
+        for a in split_tokens(toks[head + 2:-2]):
+            if not a: continue
+            eq = find_token(a, '=')
+            if eq == -1: args.append((span(source, a), False))
+            else:
+                args.append((span(source, a[:eq]), True))
+                defaults.append(cached_expr(span(source, a[eq + 1:])))
+        super().__init__(ln, source, tuple(defaults))
+        self.name: str = toks[head].text
+        self.args: list[tuple[str, bool]] = args
+        self.body, self.body_err, self.end = parse_block(lines, tokens, blocks, ln, offset)
+        self.jump: LineJump = LineJump(self.end)
+        self.impure: Error | None = None
+        if self.memo and self.body is not None:
+            called = sorted(called_names(self.body) & IMPURE_BUILTINS)
+            if called: self.impure = Error('FuncError', f"memo fn '{self.name}' cannot call {', '.join(repr(c) for c in called)}, the cached results would skip their side effects", ln)
+
+    def apply(self, values, frame, frames):
+        if self.body_err: return None, self.body_err
+        if self.impure: return None, self.impure
+        defaults = iter(values)
+        processed_args = [(a, True, next(defaults)) if has_default else (a, False, None) for a, has_default in self.args]
+        funcs = frame.funcs
+        (funcs.owner(self.name) or funcs)[self.name] = (False, Func(self.name, self.body, processed_args, memo=self.memo))
+        return None, self.jump
+
+
+class ForStmt(Stmt):
+    "`for name = start, end {`, the body is parsed once into its own `Program` and each iteration runs as a `Frame`"
+    __slots__ = ('var', 'body', 'body_err', 'end', 'jump', 'fast')
+
+    def __init__(self, ln: int, source: str, var: str, start: str, stop: str, lines: list[str], tokens: list[list[Token]], blocks: dict[int, Block], offset: int = 0) -> None:
+        super().__init__(ln, source, (cached_expr(start), cached_expr(stop)))
+        self.var: str = var
+        self.body, self.body_err, self.end = parse_block(lines, tokens, blocks, ln, offset)
+        self.jump: LineJump = LineJump(self.end)
+        self.fast: Any = None # a `cat_optimize.FastLoop` if the body might run as one
+
+    def apply(self, values, frame, frames):
+        c_start, c_end = values
+        if not isinstance(c_start, int):
+            return None, Error('TypeError', f"expected Int for range start, but {to_catscript_type(type(c_start).__name__)} was given instead", self.ln)
+        if not isinstance(c_end, int):
+            return None, Error('TypeError', f"expected Int for range end, but {to_catscript_type(type(c_end).__name__)} was given instead", self.ln)
+
+        if self.body_err: return None, self.body_err
+        if c_start >= c_end: return None, self.jump
+        if self.fast is not None and frames[0].fast_loops:
+            ran, err = self.fast.run(c_start, c_end, frame.vars, frame.funcs)
+            if ran: return None, err or self.jump
+
+        # a loop variable that already exists outside of the loop is assigned to, like any other outer variable
+        vars, funcs = frame.vars, frame.funcs
+        owner = vars.owner(self.var) if self.var != '_' else None
+        loop = Frame(FRAME_LOOP, self.body, Scope(parent=vars), self.body.funcs_scope(funcs), frame.used_depth, [c_start, c_end, owner, self.var, vars, funcs])
+        if owner is not None: owner[self.var] = c_start
+        elif self.var != '_': loop.vars[self.var] = c_start
+        frames.append(loop)
+        # the loop runs first, then this frame carries on after the closing `}`
+        return None, self.jump
+
+
+class PforStmt(ForStmt):
+    "`pfor name = start, end {` or `pfor name = start, end into results {`, a `for` loop that runs on a process pool(see `cat_pfor`)"
+    __slots__ = ('into',)
+
+    def __init__(self, ln: int, source: str, var: str, start: str, stop: str, into: str | None, lines: list[str], tokens: list[list[Token]], blocks: dict[int, Block], offset: int = 0) -> None:
+        super().__init__(ln, source, var, start, stop, lines, tokens, blocks, offset)
+        self.into: str | None = into
+
+    def run(self, start: int, stop: int, vars: Scope, funcs: Scope, budget: Any = None, hooks: Any = None) -> Error | Signal | None:
+        '''Runs the loop, the output of the workers is written with the `Printf` the script uses, so it goes wherever the rest of its output does
+
+        With a `budget` or `hooks`(the run's), the loop runs in this process under them'''
+        import cat_pfor
+        printf = funcs.get('Printf')
+        write = (lambda text: printf[1](self.ln, '{}', text)) if printf is not None and printf[0] else (lambda text: print(text, end=''))
+        collected, err = cat_pfor.run_pfor(self.body, self.var, self.ln, start, stop, vars, funcs, write, budget, hooks) if start < stop else ([], None)
         if err: return err
+        if self.into is not None: (vars.owner(self.into) or vars)[self.into] = collected
+        return None
+
+    def apply(self, values, frame, frames):
+        c_start, c_end = values
+        if not isinstance(c_start, int):
+            return None, Error('TypeError', f"expected Int for range start, but {to_catscript_type(type(c_start).__name__)} was given instead", self.ln)
+        if not isinstance(c_end, int):
+            return None, Error('TypeError', f"expected Int for range end, but {to_catscript_type(type(c_end).__name__)} was given instead", self.ln)
+
+        if self.body_err: return None, self.body_err
+        return None, self.run(c_start, c_end, frame.vars, frame.funcs, frames[0].budget, frames[0].hooks) or self.jump
+
+
+class IfChain(Stmt):
+    "An `if` or `} elseif` line of an if/elseif/else chain, its jump targets are looked up once from the block table"
+    __slots__ = ('next', 'end', 'err', 'true_jump', 'false_jump')
+
+    def __init__(self, ln: int, source: str, cond: str, chain: Block | None) -> None:
+        super().__init__(ln, source, (cached_expr(cond),))
+        self.next, self.end, self.err = chain.branch_targets(ln) if chain else (-1, -1, Error.SyntaxErr("unexpected elseif", ln))
+        # when true the body runs and reaching the next branch line jumps past the chain, otherwise jump straight to the next branch(or past the chain)
+        self.true_jump: ScheduledLineJump = ScheduledLineJump(ln, self.end if self.next == -1 else self.next, self.end+1)
+        self.false_jump: LineJump = LineJump(self.end+1 if self.next == -1 else self.next)
+
+    def apply(self, values, frame, frames):
+        if self.err: return None, self.err
+        return None, self.true_jump if values[0] else self.false_jump
+
+
+class ElseStmt(Stmt):
+    "The `} else {` line of an if/elseif/else chain"
+    __slots__ = ('end', 'err', 'jump')
+
+    def __init__(self, ln: int, source: str, chain: Block | None) -> None:
+        super().__init__(ln, source)
+        if chain is None: self.end, self.err = -1, Error.SyntaxErr("unexpected else", ln)
+        elif chain.end == -1: self.end, self.err = -1, Error.SyntaxErr("expected '}', '} else {', or '} elseif {', but found end of file", ln)
+        else: self.end, self.err = chain.end, None
+        self.jump: ScheduledLineJump = ScheduledLineJump(ln, self.end, self.end+1)
+
+    def apply(self, values, frame, frames):
+        if self.err: return None, self.err
+        return None, self.jump
+
+
+class Goto(Stmt):
+    "`goto line`"
+    __slots__ = ()
+
+    def __init__(self, ln: int, source: str, target: str) -> None:
+        super().__init__(ln, source, (cached_expr(target),))
+
+    def apply(self, values, frame, frames):
+        ln = self.ln
+        e_linenum = values[0]
         if not isinstance(e_linenum, int):
             return None, Error.ValueErr('goto', 'Int', e_linenum, ln)
         if e_linenum == ln:
             return None, Error('OutOfIndexError', f"cannot use goto to jump to the same line", ln)
-        elif e_linenum < 1 or e_linenum > len(lines)+1:
+        elif e_linenum < 1 or e_linenum > len(frame.program)+1:
             return None, Error('OutOfIndexError', f"{e_linenum} is not a valid line", ln)
-        return None, Error.LineJump((ln, e_linenum))
+        # a body's lines only mean something while the loop or fn runs them, the same lines the VM doesn't give an instruction
+        if any(node.ln < e_linenum < node.end for node in frame.program.nodes if isinstance(node, (ForStmt, FnDef)) and not node.body_err):
+            return None, Error('OutOfIndexError', f"cannot use goto to jump into the body of a for loop or function", ln)
+        return None, LineJump(e_linenum)
 
-    #print(f"'{input}'")
 
-    try: return eval(input, vars), None
-    except Exception as e:
-        return None, Error('EvalError', e, ln)
+class ImportStmt(Stmt):
+    "`import \"path\"` or `import \"path\" as name`, runs the module at `path`(once, see `cat_modules`) and puts its variables and fns under `name`, the file's name by default"
+    __slots__ = ('path', 'name')
+
+    def __init__(self, ln: int, source: str, path: str, name: str) -> None:
+        super().__init__(ln, source)
+        self.path: str = path
+        self.name: str = name
+
+    def run(self, vars: Scope, funcs: Scope, used_stack: list[str] | None = None, output: OutputSink | None = None, modules: Any = None) -> Error | Signal | None:
+        import cat_modules
+        return cat_modules.import_module(self.path, self.name, vars, funcs, used_stack, output, modules, self.ln)
+
+    def apply(self, values, frame, frames):
+        main = frames[0]
+        return None, self.run(frame.vars, frame.funcs, main.used_stack, main.output, main.modules)
+
+
+class Program:
+    '''A parsed CatScript script or block body: the cleaned source lines and one `Stmt` (or `None` for blank lines) per line
+
+    Line numbers start at 1 in every body, `offset` is how many lines of the script come before a body's first line'''
+    __slots__ = ('lines', 'nodes', 'blocks', 'defines_funcs', 'offset', 'chunk')
+
+    def __init__(self, lines: list[str], nodes: list[Stmt | None], blocks: dict[int, Block], offset: int = 0) -> None:
+        self.lines: list[str] = lines
+        self.nodes: list[Stmt | None] = nodes
+        self.blocks: dict[int, Block] = blocks
+        self.offset: int = offset
+        # a body without `fn` definitions can share the functions scope of whatever runs it, nothing else adds functions
+        self.defines_funcs: bool = any(isinstance(node, FnDef) for node in nodes)
+        self.chunk: Any = None # the `cat_vm.Chunk` it's compiled to, the first time the VM runs it
+
+    # a chunk has code objects, which can't be pickled, so it's compiled again when loaded
+    def __getstate__(self): return (self.lines, self.nodes, self.blocks, self.offset, self.defines_funcs)
+
+    def __setstate__(self, state):
+        self.lines, self.nodes, self.blocks, self.offset, self.defines_funcs = state
+        self.chunk = None
+
+    def funcs_scope(self, funcs: Scope) -> Scope:
+        "Returns the functions scope to run this program with, when run by something with the functions `funcs`"
+        return Scope(parent=funcs) if self.defines_funcs else funcs
+
+    def __len__(self) -> int: return len(self.lines)
+
+
+def parse_block(lines: list[str], tokens: list[list[Token]], blocks: dict[int, Block], ln: int, offset: int = 0) -> tuple[Program | None, Error | None, int]:
+    "Parses the body of the block opened on line `ln`(of a program starting after line `offset`), returns the body, the error if it isn't closed, and the line after the closing `}`"
+    block = blocks[ln]
+    if block.end == -1: return None, Error.SyntaxErr("expected '}', but found end of file", ln), ln
+    return build_program(block.body(lines), block.body(tokens), offset + ln), None, block.end + 1
+
+
+def called_names(program: Program) -> set[str]:
+    '''Returns the names of the functions called in `program` and the bodies of its `for` loops(but not the bodies of the functions it defines)
+
+    Every call in an expression counts, not only its `sites`, so calls that only sometimes run(after `and`/`or`, in `x if c else y` and in lambdas) do too'''
+    out: set[str] = set()
+    for node in program.nodes:
+        if node is None: continue
+        for expr in node.exprs:
+            if expr.exc is not None: continue
+            for sub in ast.walk(ast.parse(expr.source, '<string>', 'eval')):
+                if isinstance(sub, ast.Call) and (name := call_name(sub)) is not None: out.add(name)
+        if isinstance(node, ForStmt) and node.body is not None: out |= called_names(node.body)
+    return out
+
+
+def parse_line(lines: list[str], tokens: list[list[Token]], blocks: dict[int, Block], ln: int, offset: int = 0) -> Stmt | None:
+    "Parses line `ln`(starting at 1) of `lines` into a `Stmt` from its tokens, `offset` is the `Program.offset` of `lines`"
+    toks = tokens[ln - 1]
+    if not toks: return None
+    l = lines[ln - 1]
+
+    if any(tok.kind == ERROR and tok.text == "'" for tok in toks):
+        return ErrorStmt(ln, l, Error.SyntaxErr("unexpected \"'\"", ln))
+
+    first = toks[0].text if toks[0].kind == NAME else None
+    second = toks[1].text if len(toks) > 1 else None
+    last = toks[-1].text
+
+    if first == 'return':
+        return ReturnStmt(ln, l)
+
+    if first == 'goto' and len(toks) > 1:
+        return Goto(ln, l, span(l, toks[1:]))
+
+    if first == 'import' and len(toks) > 1 and toks[1].kind == STRING:
+        rest = toks[2:]
+        if rest and not (len(rest) == 2 and rest[0].text == 'as' and rest[1].kind == NAME):
+            return ErrorStmt(ln, l, Error.SyntaxErr("expected `import \"path\"` or `import \"path\" as name`", ln))
+        try: path = ast.literal_eval(toks[1].text)
+        except (SyntaxError, ValueError): return ErrorStmt(ln, l, Error.SyntaxErr(f"invalid path {toks[1].text}", ln))
+        name = rest[1].text if rest else os.path.splitext(os.path.basename(path))[0]
+        if not name.isidentifier() or keyword.iskeyword(name):
+            return ErrorStmt(ln, l, Error.SyntaxErr(f"'{name}' cannot be the name of a module, use `import \"{path}\" as name`", ln))
+        return ImportStmt(ln, l, path, name)
 
+    if first is not None and second == '(' and closing_bracket(toks, 1) == len(toks) - 1:
+        return Call(ln, l, first)
 
+    head = 1 if first == 'memo' else 0
+    if len(toks) > head + 4 and toks[head].text == 'fn' and toks[head + 1].kind == NAME and toks[head + 2].text == '(' and last == '{' and closing_bracket(toks, head + 2) == len(toks) - 2:
+        return FnDef(ln, l, toks, lines, tokens, blocks, offset)
 
-def clean_line(line: str):
-    line = line.strip()
-    if '//' not in line: return line
-    in_str = 0
-    ignore_quote = False
-    for cn, c in enumerate(line):
-        if c == '"' and not ignore_quote:
-            in_str = not in_str
-        elif c == '\\': in_str = 2
-        elif c == '/' and not in_str:
-            try:
-                if line[cn + 1] == '/':
-                    return line[:len(line)-(cn)].strip()
-            except IndexError:
-                return line
-        if in_str: in_str -= 1
-    return line
+    if first == 'lt' and len(toks) > 3 and toks[1].kind == NAME and toks[2].text == '=':
+        return LetStmt(ln, l, second, span(l, toks[3:]))
 
+    if first is not None and second == '=' and len(toks) > 2:
+        return AssignStmt(ln, l, first, span(l, toks[2:]))
 
-def run_code(text: str | list[str], used_stack: list[str] = [], return_values: bool = False, injected_vars: dict[str, Any] | None = None, injected_funcs: dict[str, Func | Any] | None = None) -> tuple[int, tuple[dict[str, Any], dict[str, Func]] | None]:
-    lines: list[str] = [clean_line(l) for l in text.replace('null', 'None').replace('true', 'True').replace('false', 'False').splitlines()] if isinstance(text, str) else list(text)
+    if (first == 'for' or first == 'pfor') and last == '{':
+        body = toks[1:-1]
+        into = None
+        if first == 'pfor' and len(body) > 2 and body[-2].text == 'into' and body[-1].kind == NAME:
+            into = body[-1].text
+            body = body[:-2]
+        for_expr = span(l, body)
+        invalid_for_expr = lambda reason = '': ErrorStmt(ln, l, Error.ExprErr(f"invalid for loop expression '{for_expr}'{f'({reason})' if reason else ''}", ln))
+        if '=' not in for_expr or ',' not in for_expr:
+            return invalid_for_expr()
 
-    vars: dict[str, Any] = injected_vars if isinstance(injected_vars, dict) else {}
+        assign_index = find_token(body, '=')
+        if assign_index == -1:
+            return invalid_for_expr("expected format `[varname] = [start], [end]` but missing `=`")
+        comma_index = find_token(body, ',', assign_index + 1)
+        if comma_index == -1:
+            return invalid_for_expr("expected format `[varname] = [start], [end]` but missing `,`")
+        var, start, end = span(l, body[:assign_index]), span(l, body[assign_index + 1:comma_index]), span(l, body[comma_index + 1:])
 
-    # if `True`, then it should be run like a python function, otherwise use `.run()`
-    funcs: dict[str, tuple[bool, Func | Any]] = injected_funcs if isinstance(injected_funcs, dict) else {
-        'Println': (True, lambda ln, *values: (print(*values), None)),
+        if first == 'pfor': return PforStmt(ln, l, var, start, end, into, lines, tokens, blocks, offset)
+        return ForStmt(ln, l, var, start, end, lines, tokens, blocks, offset)
 
-        'Printf': (True, lambda ln, string, *insertions: (cat_funcs.printf(string, *insertions), None)),
+    if first == 'if' and last == '{':
+        return IfChain(ln, l, span(l, toks[1:-1]), blocks[ln])
 
-        'GetText': (True, lambda ln, message: (input(message), None) if isinstance(message, str) else (None, Error.ValueErr('GetText', 'string', message, ln)) ),
+    if is_elseif(toks):
+        return IfChain(ln, l, span(l, toks[2:-1]), blocks.get(ln))
+    if is_else(toks):
+        return ElseStmt(ln, l, blocks.get(ln))
+
+    return ExprStmt(ln, l)
+
+
+# bump this whenever what `parse_program` produces changes, so cached parses(see `cat_cache`) from older versions aren't used
+PARSER_VERSION = 11
+
+PARSE_CACHE_SIZE = 256
+_parse_cache: dict[str, Program] = {}
+_parse_counts: list[int] = [0, 0] # hits, misses
+
+def build_program(lines: list[str], tokens: list[list[Token]], offset: int = 0) -> Program:
+    "Parses the tokens of a script, or of a block body starting after line `offset` of the script"
+    blocks = build_block_table(tokens)
+    return Program(lines, [parse_line(lines, tokens, blocks, n + 1, offset) for n in range(len(lines))], blocks, offset)
+
+
+def parse_program(text: str | list[str], offset: int = 0, cache: dict[str, Program] | None = None) -> Program:
+    '''Parses CatScript source into a `Program`, the source is tokenized once(see `cat_lexer`) and each line is classified from its tokens here instead of every time it runs\n
+    `text` can be the source or a list of its lines, source text is cached by its text in `cache`(the module's cache by default)'''
+    from cat_optimize import optimize
+    if cache is None: cache = _parse_cache
+    if not isinstance(text, str): return optimize(build_program(*tokenize('\n'.join(text)), offset))
+
+    cached = cache.get(text)
+    if cached is not None:
+        _parse_counts[0] += 1
+        return cached
+    _parse_counts[1] += 1
+    program = optimize(build_program(*tokenize(text), offset))
+    if len(cache) >= PARSE_CACHE_SIZE: del cache[next(iter(cache))]
+    cache[text] = program
+    return program
+
+
+def parse_cache_stats() -> dict[str, int]:
+    "Returns the hits and misses of `parse_program`'s caches(all of them, the module's and the ones it was given)"
+    return {'hits': _parse_counts[0], 'misses': _parse_counts[1], 'size': len(_parse_cache), 'maxsize': PARSE_CACHE_SIZE}
+
+
+# builtins with side effects, a `memo fn` can't call these
+IMPURE_BUILTINS = frozenset({'Println', 'Printf', 'GetText', 'Rand', 'Sleep', 'Collect', 'Snapshot'})
+
+# builtins that call the fn they're given by name
+FN_CALLING_BUILTINS = frozenset({'Map', 'Filter'})
+
+# builtins that see the variables they're called with(the `ScopedBuiltin`s)
+SCOPED_BUILTINS = FN_CALLING_BUILTINS | {'Snapshot'}
+
+
+class ScopedBuiltin:
+    '''A builtin that's also given the variables and functions it's called with and the first `Frame` of the run(`None` outside of `run_frames`), after the line number\n
+    `Map` and `Filter` are, so the fns they call see their caller's variables and are part of the caller's run(its budget, hooks and profiler),
+    and `Snapshot` is, to save the line the script is on.
+    Called like any other builtin, it gets `None` for all three'''
+    __slots__ = ('scoped',)
+
+    def __init__(self, scoped: Callable[..., tuple[Any, Error | Signal | None]]) -> None:
+        self.scoped: Callable[..., tuple[Any, Error | Signal | None]] = scoped
+
+    def __call__(self, ln: int | None, *args: Any) -> tuple[Any, Error | Signal | None]: return self.scoped(ln, None, None, None, *args)
+
+
+class FnStopped(Exception):
+    "Raised through the Python code of a builtin when a fn it called stopped with an error or a signal, the builtin returns `err`"
+    def __init__(self, err: Error | Signal) -> None:
+        super().__init__(err)
+        self.err: Error | Signal = err
+
+
+def make_builtins(used_stack: list[str] = [], output: OutputSink | None = None, vars: Scope | None = None, funcs: Scope | None = None) -> dict[str, tuple[bool, Any]]:
+    '''Returns the table of builtin functions, each entry is `(True, function)` and the function is called with the line number first
+
+    `Println` and `Printf` write to `output`, which is flushed before `GetText` and `Sleep`(without one, they write straight to `sys.stdout`).
+    `Map` and `Filter` are `ScopedBuiltin`s, they look the fns they're given by name up where they're called from,
+    or in `funcs`(the table these builtins go in) with `vars` as their caller's variables when they aren't given that,
+    `Snapshot` saves `vars` and the fns in `funcs`, and where the script that called it was(see `cat_snapshot`)'''
+    if output is None: output = OutputSink(buffer_size=0)
+
+    def fn_caller(ln: int, what: str, fn: Any, caller_vars: Scope | None, caller_funcs: Scope | None, main: 'Frame | None') -> tuple[Callable[[Any], Any] | None, Error | None]:
+        "Returns a Python function that calls `fn`(the name of a builtin or fn, or a Python function like a lambda) with one value, the rest is what a `ScopedBuiltin` is given"
+        if not isinstance(fn, str):
+            if callable(fn): return fn, None
+            return None, Error.ValueErr(what, 'the name of a fn or a lambda', fn, ln)
+        if caller_funcs is None: caller_vars, caller_funcs = vars if vars is not None else Scope(), funcs
+        entry = caller_funcs.get(fn) if caller_funcs is not None else None
+        if entry is None: return None, Error('NameError', f"fn '{fn}' is not defined", ln)
+        is_builtin, func = entry
+        hooks, budget, profiler = (main.hooks, main.budget, main.profiler) if main is not None else (None, None, None)
+
+        def call(value: Any) -> Any:
+            if is_builtin: res, err = func(ln, value)
+            else:
+                errcode, values, err = func.run(caller_vars, caller_funcs, [], used_stack, ln, [value], hooks, output, budget, profiler)
+                res = values[2] if errcode in (0, 2) else None
+                # the error was already printed
+                if errcode == 1: err = EXIT
+                elif errcode == -1 and not err: err = NO_PRINT
+            if err: raise FnStopped(err)
+            return res
+        return call, None
+
+    def snapshot(ln: int, caller_vars: Scope | None, caller_funcs: Scope | None, main: 'Frame | None', path: Any) -> tuple[None, Error | None]:
+        import cat_snapshot
+        if not isinstance(path, str): return None, Error.ValueErr('Snapshot', 'string', path, ln)
+        resume = cat_snapshot.resume_at(main, caller_vars) if main is not None else None
+        try: cat_snapshot.save(path, vars if vars is not None else Scope(), funcs if funcs is not None else Scope(), resume=resume)
+        except cat_snapshot.SnapshotError as e: return None, Error('SnapshotError', e, ln)
+        return None, None
+
+    def each(ln: int, caller_vars: Scope | None, caller_funcs: Scope | None, main: 'Frame | None', what: str, values: Any, fn: Any, run: Callable[[Any, Callable[[Any], Any]], Any]) -> tuple[Any, Error | Signal | None]:
+        call, err = fn_caller(ln, what, fn, caller_vars, caller_funcs, main)
+        if err: return None, err
+        try: return run(values, call), None
+        except FnStopped as e: return None, e.err
+
+    return {
+        'Println': (True, lambda ln, *values: (output.write(' '.join([str(v) for v in values]) + '\n'), None)),
+
+        'Printf': (True, lambda ln, string, *insertions: (output.write(cat_funcs.format_printf(string, *insertions)), None)),
+
+        'GetText': (True, lambda ln, message: ((output.flush(), input(message))[1], None) if isinstance(message, str) else (None, Error.ValueErr('GetText', 'string', message, ln)) ),
 
         'Lower': (True, lambda ln, value: (value.casefold(), None) if isinstance(value, str) else (None, Error.ValueErr('Casefold', 'string', value, ln)) ),
 
@@ -466,11 +1118,29 @@ def run_code(text: str | list[str], used_stack: list[str] = [], return_values: b
 
         'IsMain': (True, lambda ln: (not len(used_stack), None)),
 
-        'Sleep': (True, lambda ln, seconds: (time.sleep(seconds), None) if isinstance(seconds, (int, float)) else (None, Error.ValueErr('Sleep', 'Float or Int', seconds, ln)) ),
+        'Sleep': (True, lambda ln, seconds: ((output.flush(), time.sleep(seconds))[1], None) if isinstance(seconds, (int, float)) else (None, Error.ValueErr('Sleep', 'Float or Int', seconds, ln)) ),
 
-        'Exit': (True, lambda ln: (None, Error.Exit(ln))),
+        'Exit': (True, lambda ln: (None, EXIT)),
 
-        'Len': (True, lambda ln, obj: (len(obj), None) if cat_funcs.can_get_length(obj) else (None, Error.TypeErr(f"'{to_catscript_type(type(obj).__name__)}' does not have a length", ln)))
+        'Collect': (True, lambda ln, value: (None, Error('FuncError', "Collect can only be used in the body of a pfor loop", ln))),
+
+        'Len': (True, lambda ln, obj: (len(obj), None) if cat_funcs.can_get_length(obj) else (None, Error.TypeErr(f"'{to_catscript_type(type(obj).__name__)}' does not have a length", ln))),
+
+        'Array': (True, lambda ln, values: (cat_array.make_array(values), None)),
+
+        'Range': (True, lambda ln, *args: (cat_array.range_array(*args), None)),
+
+        'Sum': (True, lambda ln, values: (cat_array.total(values), None)),
+
+        'Map': (True, ScopedBuiltin(lambda ln, caller_vars, caller_funcs, main, values, fn: each(ln, caller_vars, caller_funcs, main, 'Map', values, fn, cat_array.map_values))),
+
+        'Filter': (True, ScopedBuiltin(lambda ln, caller_vars, caller_funcs, main, values, fn: each(ln, caller_vars, caller_funcs, main, 'Filter', values, fn, cat_array.filter_values))),
+
+        'Sort': (True, lambda ln, values, reverse=False: (cat_array.sort_values(values, reverse), None)),
+
+        'Slice': (True, lambda ln, values, start=None, stop=None, step=None: (cat_array.slice_array(values, start, stop, step), None)),
+
+        'Snapshot': (True, ScopedBuiltin(snapshot)),
 
         #'NotGiven': (True, lambda ln, arg: (isinstance(arg, ArgNotGiven), None)),
 
@@ -478,56 +1148,292 @@ def run_code(text: str | list[str], used_stack: list[str] = [], return_values: b
     }
 
 
-    #printing_vars = vars.copy()
-    #try: printing_vars.pop('__builtins__')
-    #except KeyError: pass
-    #print(printing_vars)
-
-    ln = 0
-    scheduled_ln: list[tuple[int, int, int]] = []
-    while ln < len(lines):
-        #print(ln, scheduled_ln)
-        if len(scheduled_ln):
-            if ln == scheduled_ln[-1][1]:
-                ln = scheduled_ln[-1][2]
-                scheduled_ln.pop()
+FRAME_MAIN = 0 # the script run_code was given
+FRAME_CALL = 1 # a call to a CatScript function
+FRAME_LOOP = 2 # the iterations of a `for` loop
+
+class Frame:
+    '''A script, function call or `for` loop being run by `run_code`\n
+    The frame below a call is the one that called it, its `ln` and `pending`(the half evaluated line, see `eval_exprs`) are where the call returns to'''
+    __slots__ = ('kind', 'program', 'nodes', 'ln', 'vars', 'funcs', 'scheduled', 'pending', 'used_depth', 'loop', 'memo', 'fast_loops', 'used_stack', 'output', 'modules', 'budget', 'hooks', 'profiler')
+
+    def __init__(self, kind: int, program: 'Program', vars: Scope, funcs: Scope, used_depth: int, loop: list[Any] | None = None) -> None:
+        self.kind: int = kind
+        self.program: Program = program
+        self.nodes: list[Stmt | None] = program.nodes
+        self.ln: int = 0 # starting at 0
+        self.vars: Scope = vars
+        self.funcs: Scope = funcs
+        self.scheduled: list[ScheduledLineJump] = []
+        self.pending: tuple[list[Any], int, int] | None = None
+        self.used_depth: int = used_depth # how long `used_stack` was when the frame started, it's cut back to this when it ends
+        self.loop: list[Any] | None = loop # [index, end, owner of the loop variable, loop variable, outer vars, outer funcs]
+        self.memo: tuple[MemoTable, tuple[Any, ...]] | None = None # where the result of a `memo fn` call goes
+        self.fast_loops: bool = True # only read from the first frame, if `for` loops can run as `cat_optimize.FastLoop`s(not while profiling or with a budget)
+        # only set on the first frame, for `import`: the modules being imported, where their output goes and the `cat_modules.ModuleCache` they're kept in
+        self.used_stack: list[str] | None = None
+        self.output: OutputSink | None = None
+        self.modules: Any = None
+        # also only set on the first frame, the budget, hooks and profiler of the run, for what runs outside of `run_frames`(like `pfor` loops and the fns `Map` calls)
+        self.budget: Any = None
+        self.hooks: Any = None
+        self.profiler: Any = None
+
+    def __repr__(self) -> str: return f"Frame({('main', 'call', 'loop')[self.kind]}, line {self.ln + 1})"
+
+
+def run_code(text: str | list[str] | Program, used_stack: list[str] = [], return_values: bool = False, injected_vars: Scope | dict[str, Any] | None = None, injected_funcs: Scope | dict[str, Func | Any] | None = None, profiler: Any = None, output: OutputSink | None = None, budget: Any = None, hooks: Any = None, modules: Any = None, start: int = 0, jumps: tuple[tuple[int, int, int], ...] = ()) -> tuple[int, tuple[Scope, Scope] | tuple[Scope, Scope, Any] | None]:
+    '''Runs CatScript, returns an error code(`0`: finished, `1`: exited, `2`: returned, `-1`: errored) and, with `return_values`, the variables, functions and returned value\n
+    `start` is the line(starting at 0) to start from and `jumps` are the `ScheduledLineJump`s(as `(origin, at, to)`) waiting there, like the ends of the `if` chains it's in\n
+    `profiler` is a `cat_profile.Profiler` to record the run with, `budget` is a `cat_budget.Budget` to limit it with(its `counters()` are what the run used),
+    `hooks` are `cat_hooks.Hooks` to trace it with, `modules` is the `cat_modules.ModuleCache` its imports are kept in(the process's by default)\n
+    `output` is where the builtins made for the run write to(a buffered `sys.stdout` by default), it's flushed when the run ends and before an error is printed.
+    What Python prints while the run goes goes through it too(see `OutputSink.capture()`). Injected functions write wherever their builtins were made to'''
+    program: Program = text if isinstance(text, Program) else parse_program(text)
+
+    vars: Scope = injected_vars if isinstance(injected_vars, Scope) else Scope(injected_vars if isinstance(injected_vars, dict) else {})
+
+    if injected_funcs is None and output is None: output = OutputSink()
+    # if `True`, then it should be run like a python function, otherwise it's run in a new frame
+    funcs: Scope = injected_funcs if isinstance(injected_funcs, Scope) else Scope(injected_funcs if isinstance(injected_funcs, dict) else {})
+    if injected_funcs is None: funcs.update(make_builtins(used_stack, output, vars, funcs))
+
+    frames: list[Frame] = [Frame(FRAME_MAIN, program, vars, funcs, len(used_stack))]
+    frames[0].ln = start
+    frames[0].scheduled = [ScheduledLineJump(*jump) for jump in jumps]
+    # a fast loop runs its whole body at once, so the profiler, budget and hooks wouldn't see its lines
+    frames[0].fast_loops = profiler is None and budget is None and hooks is None
+    frames[0].used_stack, frames[0].output, frames[0].modules = used_stack, output, modules
+    frames[0].budget, frames[0].hooks, frames[0].profiler = budget, hooks, profiler
+    if profiler is not None: profiler.start(program)
+    if budget is not None: budget.start()
+    if hooks is not None: hooks.start(funcs)
+    if output is not None: output.capture()
+    try:
+        errcode, res = run_frames(frames, used_stack, return_values, profiler, output, budget, None, hooks)
+        if errcode == SUSPENDED:
+            # an async builtin, which only `run_code_async` can wait for
+            if hasattr(res.awaitable, 'close'): res.awaitable.close()
+            if output is not None: output.flush()
+            err = Error('AsyncError', "this can only be awaited when running with cat_async.run_code_async", frames[-1].program.offset + frames[-1].nodes[frames[-1].ln].ln)
+            if hooks is not None: hooks.error(err)
+            print(err.error())
+            return -1, None
+        return errcode, res
+    finally:
+        if hooks is not None: hooks.stop()
+        if budget is not None: budget.stop()
+        if profiler is not None: profiler.stop()
+        if output is not None:
+            output.flush()
+            output.release()
+
+
+# the error code `run_frames` returns when a builtin has to wait, with the `Suspend` signal
+SUSPENDED = 3
+
+def run_frames(frames: list[Frame], used_stack: list[str], return_values: bool = False, profiler: Any = None, output: OutputSink | None = None, budget: Any = None, line_res: Any = None, hooks: Any = None) -> tuple[int, tuple[Scope, Scope] | tuple[Scope, Scope, Any] | Suspend | None]:
+    '''Runs the frames on `frames` until the first one(the script) ends, returns the same as `run_code`\n
+    Function calls and `for` loops are `Frame`s on this stack that this one loop runs, so they don't use Python's stack.
+    If a builtin has to wait, returns `SUSPENDED` and its `Suspend` signal, call this again with the same `frames` and the value it waited for as `line_res` to carry on'''
+    vars, funcs = frames[0].vars, frames[0].funcs
+    while True:
+        frame = frames[-1]
+        ln = frame.ln
+        nodes = frame.nodes
+        if ln >= len(nodes):
+            kind = frame.kind
+            if kind == FRAME_LOOP:
+                loop = frame.loop
+                index = loop[0] + 1
+                if index < loop[1]:
+                    loop[0] = index
+                    frame.vars, frame.funcs = Scope(parent=loop[4]), frame.program.funcs_scope(loop[5])
+                    if loop[2] is not None: loop[2][loop[3]] = index
+                    elif loop[3] != '_': frame.vars[loop[3]] = index
+                    frame.ln = 0
+                    if frame.scheduled: frame.scheduled = []
+                else: frames.pop()
+                if profiler is not None: profiler.loop_iteration(frame.program.offset)
+                if budget is not None:
+                    # an iteration counts as a statement, so a loop with an empty body can't run forever either
+                    err = budget.statement(frame.program.offset)
+                    if err is not None:
+                        if output is not None: output.flush()
+                        if hooks is not None: hooks.error(err)
+                        print(err.error())
+                        return -1, None
+                continue
+            elif kind == FRAME_CALL:
+                # the caller carries on with `None`
+                line_res = None
+                if frame.memo is not None: frame.memo[0].store(frame.memo[1], None)
+                del used_stack[frame.used_depth:]
+                frames.pop()
+                if profiler is not None: profiler.call_done()
+                if budget is not None: budget.leave()
+                if hooks is not None: hooks.call_done()
                 continue
-        l = lines[ln]
-        if not l: ln += 1; continue
-        #print(l)
-        line_res, err = evaluate(vars, funcs, l, lines, used_stack, ln+1)
-        if err:
-            match err.type():
-                case 'LineJump':
-                    _, new_ln = err.ln()
-                    ln = new_ln - 1
-                    rm = []
-                    for i, sln in enumerate(scheduled_ln):
-                        if sln[0] >= ln: rm.append(i)
-                    #print('rm:', rm)
-                    rm.reverse()
-                    for r in rm: del scheduled_ln[r]
+            break
+
+        if frame.pending is not None:
+            # carry on with the line that made a call, now that it has returned `line_res`
+            node = nodes[ln]
+            if hooks is not None: hooks.ln = frame.program.offset + node.ln
+            values, err, call = eval_exprs(node.exprs, frame.vars, frame.funcs, node.ln, frame.pending, line_res, hooks, frames[0])
+            frame.pending = None
+        else:
+            scheduled = frame.scheduled
+            if scheduled and ln == scheduled[-1].at - 1:
+                frame.ln = scheduled.pop().to - 1
+                if hooks is not None: hooks.jump(frame.program.offset + ln + 1, frame.program.offset + frame.ln + 1)
+                continue
+            node = nodes[ln]
+            if node is None: frame.ln = ln + 1; continue
+            if profiler is not None: profiler.line(frame.program.offset + node.ln)
+            if hooks is not None: hooks.line(frame.program.offset + node.ln)
+            err = budget.statement(frame.program.offset + node.ln) if budget is not None else None
+            if err is None and node.has_check: err = node.check(frame)
+            call = None
+            if err is None:
+                if node.exprs: values, err, call = eval_exprs(node.exprs, frame.vars, frame.funcs, node.ln, None, None, hooks, frames[0])
+                else: values, call = (), None
+
+        if call is not None:
+            func, inputs, frame.pending = call
+            formatted_inputs, err = func.bind(inputs, node.ln)
+            if not err:
+                memo = func.memo()
+                key = memo.key(formatted_inputs) if memo is not None else None
+                if key is not None:
+                    hit, line_res = memo.lookup(key)
+                    if hit: continue # the line carries on with the cached result
+                if budget is not None: err = budget.enter(frame.program.offset + node.ln)
+                if not err:
+                    code = func.code()
+                    callee = Frame(FRAME_CALL, code, *func.scopes(formatted_inputs, frame.vars, frame.funcs), len(used_stack))
+                    if key is not None: callee.memo = (memo, key)
+                    frames.append(callee)
+                    if profiler is not None: profiler.call(func.name(), code.offset)
+                    if hooks is not None: hooks.call(func.name(), frame.program.offset + node.ln)
                     continue
-                case 'ScheduledLineJump':
-                    orig_ln, jump_at, jump_to = err.ln()
-                    scheduled_ln.append((orig_ln, jump_at - 1, jump_to - 1))
-                case 'Exit':
-                    if return_values: return 1, (vars, funcs)
-                    return 1, None
-                case 'Return':
-                    return 2, (vars, funcs, line_res)
-                case 'NoPrint':
-                    return -1, None
-                case other:
-                    print(err.error())
-                    return -1, None
-        ln += 1
-    
+
+        if err is None:
+            line_res, err = node.apply(values, frame, frames)
+            if profiler is not None: profiler.line_done()
+            if err is None:
+                frame.ln = ln + 1
+                continue
+        elif profiler is not None and type(err) is not Suspend: profiler.line_done()
+
+        kind = type(err)
+        if kind is LineJump:
+            # `for` loops and `fn` definitions jump past their bodies, that isn't a jump the script took
+            if hooks is not None and not isinstance(node, (ForStmt, FnDef)): hooks.jump(frame.program.offset + node.ln, frame.program.offset + err.to)
+            frame.ln = err.to - 1
+            if frame.scheduled: frame.scheduled = [sln for sln in frame.scheduled if sln.origin < frame.ln]
+        elif kind is ScheduledLineJump:
+            frame.scheduled.append(err)
+            frame.ln = ln + 1
+        elif kind is Return:
+            # leave any loops, then the function, the caller carries on with `line_res`
+            while frames[-1].kind == FRAME_LOOP: frames.pop()
+            frame = frames.pop()
+            if frame.kind == FRAME_MAIN: return 2, (vars, funcs, line_res)
+            if frame.memo is not None: frame.memo[0].store(frame.memo[1], line_res)
+            del used_stack[frame.used_depth:]
+            if profiler is not None: profiler.call_done()
+            if budget is not None: budget.leave()
+            if hooks is not None: hooks.call_done()
+        elif kind is Exit:
+            if return_values: return 1, (vars, funcs)
+            return 1, None
+        elif kind is NoPrint:
+            return -1, None
+        elif kind is Suspend:
+            # the line carries on from the builtin once it's done
+            frame.pending = err.state
+            return SUSPENDED, err
+        else:
+            if output is not None: output.flush()
+            if hooks is not None: hooks.error(err)
+            print(err.error())
+            return -1, None
+
     if return_values: return 0, (vars, funcs, None)
     return 0, None
 
 
 
+
+class Interpreter:
+    '''A CatScript interpreter that keeps its state between runs, for embedding CatScript in a Python program\n
+    The builtins are made once, and the global variables and the functions scripts define stay around for the next `run()`, `call()` or `get()`.
+    It has its own parse cache, so the scripts it runs again aren't parsed again(or pushed out by other interpreters' scripts),
+    and its own `cat_modules.ModuleCache`, so the modules its scripts import are run once for it\n
+    Everything the scripts print goes to `output`(a buffered `sys.stdout` by default), which is flushed after every `run()` and `call()`,
+    `hooks`(a `cat_hooks.Hooks`) trace every `run()` and `call()`'''
+    def __init__(self, output: OutputSink | None = None, hooks: Any = None) -> None:
+        self.output: OutputSink = output if output is not None else OutputSink()
+        self.hooks: Any = hooks
+        self.programs: dict[str, Program] = {}
+        from cat_modules import ModuleCache
+        self.modules: ModuleCache = ModuleCache()
+        self.__used_stack: list[str] = []
+        self.builtins: Scope = Scope()
+        # functions the scripts define go here, so they don't overwrite builtins
+        self.funcs: Scope = Scope(parent=self.builtins)
+        self.vars: Scope = Scope()
+        self.builtins.update(make_builtins(self.__used_stack, self.output, self.vars, self.funcs))
+
+    def parse(self, source: str | Program) -> Program:
+        return source if isinstance(source, Program) else parse_program(source, cache=self.programs)
+
+    def run(self, source: str | Program, budget: Any = None, start: int = 0, jumps: tuple[tuple[int, int, int], ...] = ()) -> tuple[int, Any]:
+        '''Runs a script in the interpreter's global scope, returns its error code(like `run_code`) and the value it returned(if it used `return`)\n
+        `budget` is a `cat_budget.Budget` to limit the run with, `start` and `jumps` are where to start from(see `run_code`)'''
+        errcode, values = run_code(self.parse(source), self.__used_stack, True, self.vars, self.funcs, output=self.output, budget=budget, hooks=self.hooks, modules=self.modules, start=start, jumps=jumps)
+        return errcode, values[2] if errcode in (0, 2) else None
+
+    def call(self, fn_name: str, *args: Any) -> tuple[int, Any]:
+        "Calls a function(one a script defined or a builtin) with `args`, returns the same as `run()`"
+        entry = self.funcs.get(fn_name)
+        self.output.capture()
+        try:
+            if entry is None: err = Error('NameError', f"name '{fn_name}' is not defined")
+            else:
+                is_builtin, func = entry
+                try:
+                    if is_builtin:
+                        if self.hooks is not None: self.hooks.builtin(fn_name)
+                        value, err = func(None, *args)
+                        if err is None: return 0, value
+                    else:
+                        errcode, values, err = func.run(self.vars, self.funcs, [], self.__used_stack, None, list(args), self.hooks, self.output)
+                        if err is None: return errcode, values[2] if errcode in (0, 2) else None
+                except Exception as e: err = Error('FuncError', e)
+            if isinstance(err, Exit): return 1, None
+            # printed while the output is captured, so it goes where the rest of the call's output went
+            if isinstance(err, Error): print(err.error())
+            return -1, None
+        finally:
+            self.output.flush()
+            self.output.release()
+
+    def get(self, var: str) -> Any:
+        "Returns the value of a global variable, raises a `KeyError` if it isn't defined"
+        return self.vars[var]
+
+    def set(self, var: str, value: Any):
+        self.vars[var] = value
+
+    def register_builtin(self, name: str, pyfunc: Any):
+        '''Adds a Python function scripts can call as `name`, it's given the arguments and its return value is the result of the call\n
+        An exception it raises is a `FuncError` in the script'''
+        self.builtins[name] = (True, lambda ln, *args: (pyfunc(*args), None))
+
+
+
 #['()', '[1, 2, 3, 4, 5]', '"AHHHH"', "` wow would you look at that it's a comment"]
 
 #run_code(['Print("Hello, Catdog!")', 'Print(Casefold("ABCD"))', 'lt x = 10', 'lt y = x / 2', 'Print(x, y)', 'Print(Rand(1, 10))', 'Print(IsMain())', 'x = "WHAT"', 'print(x)'])
@@ -1,5 +1,15 @@
-from interpreter import run_code
+from interpreter import Error, Interpreter, run_code
+from cat_vm import run_vm
+from cat_cache import load_program
+from cat_profile import Profiler
+from cat_async import run_async
+import cat_batch
+import cat_repl
+import cat_modules
+import cat_snapshot
 import os
+import shlex
+import sys
 
 
 
@@ -7,6 +17,14 @@ def showhelp():
     print("'exit/quit': exits the program")
     print("'help': shows this message")
     print("'run [file path]': runs the given file")
+    print("'run --vm [file path]': compiles the given file to bytecode and runs it on the VM(it can't be used with the other flags, besides `--no-cache`)")
+    print("'run --no-cache [file path]': runs the given file without reading or writing its parse cache(in `__catcache__`)")
+    print("'run --async [file path]': runs the given file with asyncio, so `Sleep` and `GetText` don't block and `Spawn`/`Await` can run functions concurrently")
+    print("'run --profile [file path]': runs the given file(without the VM) and shows where the time went, also writes `[file].prof`(for pstats) and `[file].prof.json`")
+    print("'run --snapshot[=snapshot path] [file path]': runs the given file and then saves its variables and functions to `[file].snap`(or the given path)")
+    print("'run --resume=[snapshot path] [file path]': runs the given file with the state in the snapshot, the file that took the snapshot carries on from where it was taken(instead of running its setup again), any other file runs from its start")
+    print("'batch [dir or glob] --workers N --timeout S': runs every CatScript file found on a pool of worker processes, `batch --help` shows all of its options(also `python run.py batch ...`)")
+    print("'repl': starts an interactive session where every statement runs as it's entered and everything it defines is kept(`.load [file path]` runs a file in it, `.exit` leaves it)")
 
 
 def main(extension: str = '.cat'):
@@ -16,8 +34,18 @@ def main(extension: str = '.cat'):
             break
         elif inp.casefold() == 'help':
             showhelp()
+        elif inp.casefold() == 'repl':
+            cat_repl.main()
+        elif inp.startswith('batch '):
+            try: cat_batch.main(shlex.split(inp.removeprefix('batch ')))
+            except SystemExit: pass # `--help` and bad arguments
         elif inp.startswith('run '):
             f = inp.removeprefix('run ').strip()
+            flags = set()
+            while f.startswith('--'):
+                flag, _, f = f.partition(' ')
+                flags.add(flag)
+                f = f.strip()
             sf = list(os.path.splitext(f))
             if sf[-1] == '':
                 f += extension
@@ -31,11 +59,38 @@ def main(extension: str = '.cat'):
             elif sf[-1].casefold() != extension:
                 print(f"file '{f}' is not a CatScript file")
                 continue
-            with open(f, 'rt') as fi:
-                content = fi.read()
-            run_code(content)
+            elif '--vm' in flags and (unsupported := [flag for flag in sorted(flags) if flag.partition('=')[0] in ('--profile', '--snapshot', '--resume', '--async')]):
+                print(f"'--vm' cannot be used with '{unsupported[0]}'")
+                continue
+            program = load_program(f, '--no-cache' not in flags)
+            # like Python's `sys.path[0]`, a script's imports are looked for next to it
+            cat_modules.SEARCH_PATH[:] = [os.path.dirname(os.path.abspath(f))]
+            snapshot = next((flag.partition('=')[2] or sf[0] + '.snap' for flag in flags if flag.partition('=')[0] == '--snapshot'), None)
+            resume = next((flag.removeprefix('--resume=') for flag in flags if flag.startswith('--resume=')), None)
+            if snapshot is not None or resume is not None:
+                try:
+                    state = cat_snapshot.load(resume) if resume else None
+                    interpreter = cat_snapshot.restore(state) if state is not None else Interpreter()
+                    start, jumps = cat_snapshot.resume_point(state, program) if state is not None else (0, ())
+                    errcode, _ = interpreter.run(program, start=start, jumps=jumps)
+                    if snapshot is not None and errcode != -1:
+                        cat_snapshot.save_interpreter(interpreter, snapshot, program)
+                        print(f"wrote '{snapshot}'")
+                except cat_snapshot.SnapshotError as e: print(Error('SnapshotError', e).error())
+            elif '--profile' in flags:
+                profiler = Profiler(f)
+                run_code(program, profiler=profiler)
+                print(profiler.report())
+                profiler.dump_stats(sf[0] + '.prof')
+                with open(sf[0] + '.prof.json', 'w') as pf: pf.write(profiler.to_json())
+                print(f"wrote '{sf[0]}.prof' and '{sf[0]}.prof.json'")
+            elif '--async' in flags: run_async(program)
+            elif '--vm' in flags: run_vm(program)
+            else: run_code(program)
 
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['batch']: sys.exit(cat_batch.main(sys.argv[2:]))
+    if sys.argv[1:2] == ['repl']: sys.exit(cat_repl.main())
     main()
@@ -0,0 +1,56 @@
+'''Tests for `cat_array` and the array builtins scripts use it through'''
+import pytest
+import cat_array
+from cat_array import CatArray
+from cat_vm import run_vm
+from interpreter import run_code
+
+
+
+def test_kinds():
+    assert CatArray([1, 2, True]).kind() == cat_array.INT
+    assert CatArray([1, 2.5]).kind() == cat_array.FLOAT
+    with pytest.raises(TypeError): CatArray([1, 'a'])
+
+
+def test_elementwise():
+    xs = cat_array.range_array(4)
+    assert (xs + xs).tolist() == [0, 2, 4, 6] and (10 - xs).tolist() == [10, 9, 8, 7]
+    assert (xs / 2).tolist() == [0.0, 0.5, 1.0, 1.5] and (xs / 2).kind() == cat_array.FLOAT
+    assert (2 ** (xs - 1)).tolist() == [0.5, 1, 2, 4]
+    assert (-xs).tolist() == [0, -1, -2, -3]
+    with pytest.raises(ValueError): xs + cat_array.range_array(3)
+
+
+def test_arrays_are_values():
+    xs = cat_array.make_array([3, 1, 2])
+    ys = cat_array.make_array(xs)
+    ys[0] = 9
+    assert xs.tolist() == [3, 1, 2] and cat_array.sort_values(xs).tolist() == [1, 2, 3] and xs.tolist() == [3, 1, 2]
+    assert xs[1:].tolist() == [1, 2] and xs == CatArray([3, 1, 2])
+    with pytest.raises(TypeError): xs[0] = 1.5
+
+
+def test_lists():
+    assert cat_array.total([1, 2, 3]) == 6
+    assert cat_array.sort_values(['b', 'a'], True) == ['b', 'a']
+    assert cat_array.slice_array((1, 2, 3, 4), 1, None, 2) == [2, 4]
+    assert cat_array.filter_values([0, 1, 2], bool) == [1, 2]
+
+
+@pytest.mark.parametrize('engine', [run_code, run_vm])
+def test_builtins(engine, capsys):
+    source = 'fn Sq(n) {\n    return n * n\n}\nfn Even(n) {\n    return n % 2 == 0\n}\nlt xs = Range(6)\nPrintln(Sum(xs), Map(xs, "Sq"), Filter(xs, "Even"), Sort(xs * -1), Slice(xs, 1, 5, 2))'
+    assert engine(source)[0] == 0
+    assert capsys.readouterr().out == '15 [0, 1, 4, 9, 16, 25] [0, 2, 4] [-5, -4, -3, -2, -1, 0] [1, 3]\n'
+
+
+@pytest.mark.parametrize('source, message', [
+    ('Println(Range(1, 2, 0))', 'FuncError on line 1: the step of Range cannot be 0'),
+    ('Println(Array([1, "a"]))', "FuncError on line 1: arrays can only hold Ints and Floats, not 'str'"),
+    ('fn F(n) {\n    return "x"\n}\nPrintln(Map(Range(3), "F"))', "arrays can only hold Ints and Floats, not 'str'"),
+    ('Println(Map([1, 2], "Nope"))', "fn 'Nope' is not defined"),
+])
+def test_builtin_errors(source: str, message: str, capsys):
+    assert run_code(source)[0] == -1
+    assert message in capsys.readouterr().out
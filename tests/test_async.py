@@ -0,0 +1,48 @@
+'''Tests for `cat_async`, scripts running on an event loop give way to each other at `Sleep`, `GetText` and `Await`'''
+import asyncio
+import time
+from cat_async import run_async, run_code_async
+
+
+
+WORKER = 'fn Work(n) {\n    Sleep(0.05 * n)\n    Println(n)\n    return n * n\n}\n'
+
+
+def test_scripts_sleep_at_the_same_time(capsys):
+    async def main():
+        return await asyncio.gather(*[run_code_async(f'Sleep(0.2)\nPrintln({n})') for n in range(20)])
+    start = time.perf_counter()
+    assert asyncio.run(main()) == [(0, None)] * 20
+    # one after the other would take 4 seconds
+    assert time.perf_counter() - start < 2
+    assert sorted(capsys.readouterr().out.split()) == sorted(str(n) for n in range(20))
+
+
+def test_spawn_and_await(capsys):
+    # the tasks run while the script waits on the first one
+    assert run_async(WORKER + 'lt b = Spawn("Work", 2)\nlt a = Spawn("Work", 1)\nPrintln(Await(b) + Await(a))') == (0, None)
+    assert capsys.readouterr().out == '1\n2\n5\n'
+
+
+def test_script_waits_for_its_tasks(capsys):
+    assert run_async(WORKER + 'Spawn("Work", 1)\nPrintln(0)') == (0, None)
+    assert capsys.readouterr().out == '0\n1\n'
+
+
+def test_get_text():
+    async def read(message: str) -> str: return 'typed after ' + message
+    errcode, values = asyncio.run(run_code_async('lt x = GetText("?")', return_values=True, read=read))
+    assert errcode == 0 and values[0]['x'] == 'typed after ?'
+
+
+def test_error_in_a_task(capsys):
+    assert run_async('fn Bad() {\n    lt x = 1 / 0\n}\nlt t = Spawn("Bad")\nAwait(t)\nPrintln("after")') == (-1, None)
+    out = capsys.readouterr().out
+    assert 'division by zero' in out and 'after' not in out
+
+
+def test_bad_arguments(capsys):
+    assert run_async('Spawn("Nope")') == (-1, None)
+    assert "invalid value for Spawn 'Nope'" in capsys.readouterr().out
+    assert run_async('Await(1)') == (-1, None)
+    assert "invalid value for Await '1'" in capsys.readouterr().out
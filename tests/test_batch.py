@@ -0,0 +1,47 @@
+'''Tests for `cat_batch`, every script runs on its own in a worker and gets its own error code and output'''
+import os
+import cat_batch
+
+
+
+COUNTER = 'lt n = 0\nfn Inc() {\n    n = n + 1\n}'
+USES_COUNTER = 'import "counter.cat"\ncounter.Inc()\nPrintln(counter.n)'
+
+
+def write(directory, name: str, source: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f: f.write(source)
+    return path
+
+
+def test_find_scripts(tmp_path):
+    write(tmp_path, 'a.cat', 'Println(1)')
+    os.mkdir(tmp_path / 'sub')
+    write(tmp_path / 'sub', 'b.cat', 'Println(2)')
+    write(tmp_path, 'notes.txt', '')
+    assert cat_batch.find_scripts(str(tmp_path)) == [str(tmp_path / 'a.cat'), str(tmp_path / 'sub' / 'b.cat')]
+
+
+def test_jobs_get_their_own_modules(tmp_path):
+    write(tmp_path, 'counter.cat', COUNTER)
+    path = write(tmp_path, 'main.cat', USES_COUNTER)
+    # every job imports the module again, instead of getting the one an earlier job changed
+    for vm in (False, False, True, True):
+        assert cat_batch.run_job(path, False, vm) == (0, '1\n')
+
+
+def test_batch(tmp_path):
+    write(tmp_path, 'counter.cat', COUNTER)
+    paths = [write(tmp_path, f'{n}.cat', USES_COUNTER) for n in range(3)]
+    paths.append(write(tmp_path, 'bad.cat', 'Println("partly")\nlt x = y'))
+    results = cat_batch.run_batch(paths, workers=1, use_cache=False)
+    assert [r.path for r in results] == paths
+    assert [(r.errcode, r.output) for r in results[:3]] == [(0, '1\n')] * 3
+    assert results[3].errcode == -1 and results[3].output.startswith('partly\n') and 'EvalError' in results[3].output
+
+
+def test_timeout(tmp_path):
+    paths = [write(tmp_path, 'slow.cat', 'Sleep(10)'), write(tmp_path, 'fast.cat', 'Println("done")')]
+    results = cat_batch.run_batch(paths, workers=1, timeout=0.5, use_cache=False)
+    assert results[0].errcode == -1 and results[0].elapsed < 5
+    assert (results[1].errcode, results[1].output) == (0, 'done\n')
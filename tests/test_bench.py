@@ -0,0 +1,42 @@
+'''Tests for `cat_bench`, the corpus runs the same on both engines and regressions against a saved baseline are caught'''
+import json
+import pytest
+import cat_bench
+
+
+
+@pytest.mark.parametrize('bench', cat_bench.CORPUS, ids=lambda b: b.name)
+def test_corpus_runs_the_same_on_both_engines(bench, capsys):
+    outputs = []
+    for run in cat_bench.ENGINES.values():
+        errcode, _ = run(bench.source(1))
+        assert errcode == 0
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1]
+
+
+def test_measure():
+    result = cat_bench.measure(cat_bench.CORPUS[0], 'vm', repeat=1)
+    assert result['name'] == 'loop_heavy' and result['ops'] > 0 and result['wall'] > 0 and result['peak_kib'] > 0
+    assert result['ops_per_sec'] == result['ops'] / result['wall']
+
+
+def test_compare():
+    baseline = {'results': [{'name': 'a', 'wall': 1.0, 'peak_kib': 100.0}, {'name': 'b', 'wall': 1.0, 'peak_kib': 100.0}]}
+    results = [{'name': 'a', 'wall': 1.2, 'peak_kib': 200.0}, {'name': 'b', 'error': "exited with error code -1"}, {'name': 'new', 'wall': 9.0, 'peak_kib': 9.0}]
+    regressions = cat_bench.compare(results, baseline)
+    assert len(regressions) == 2 and regressions[0].startswith('a: peak memory') and regressions[1].startswith('b: exited')
+    assert cat_bench.compare(results[:1], baseline, threshold=1.5) == []
+
+
+def test_save_and_compare(tmp_path, capsys):
+    path = str(tmp_path / 'baseline.json')
+    assert cat_bench.main(['branch_heavy', '--repeat', '1', '--save', path]) == 0
+    with open(path) as f: saved = json.load(f)
+    assert (saved['engine'], saved['scale'], [r['name'] for r in saved['results']]) == ('tree', 1, ['branch_heavy'])
+
+    assert cat_bench.main(['branch_heavy', '--repeat', '1', '--compare', path, '--threshold', '100']) == 0
+    saved['results'][0]['wall'] /= 1000
+    with open(path, 'w') as f: json.dump(saved, f)
+    assert cat_bench.main(['branch_heavy', '--repeat', '1', '--compare', path]) == 1
+    assert 'regression: branch_heavy: wall time' in capsys.readouterr().out
@@ -0,0 +1,92 @@
+'''Tests for `cat_budget`, every limit of a `Budget` stops a run that goes over it with a `BudgetError`, and `counters()` says which one'''
+import time
+from cat_budget import Budget
+from interpreter import run_code
+
+
+
+LOOP = '''lt n = 0
+n = n + 1
+goto 2'''
+
+
+def run(source: str, budget: Budget, capsys) -> tuple[int, str]:
+    errcode, _ = run_code(source, budget=budget)
+    return errcode, capsys.readouterr().out
+
+
+def test_within_budget(capsys):
+    budget = Budget(max_statements=100, max_depth=5, timeout=10, max_memory=10_000_000)
+    errcode, out = run('lt s = 0\nfor i = 0, 5 {\n    s = s + i\n}\nPrintln(s)', budget, capsys)
+    assert (errcode, out) == (0, '10\n')
+    counters = budget.counters()
+    assert counters['exceeded'] is None
+    assert counters['statements'] == 13 # 3 lines, 5 iterations and the 5 lines in them
+
+
+def test_statements(capsys):
+    budget = Budget(max_statements=1000)
+    errcode, out = run(LOOP, budget, capsys)
+    assert errcode == -1 and 'BudgetError' in out
+    assert budget.counters()['exceeded'] == 'statements'
+    assert budget.counters()['statements'] == 1001
+
+
+def test_depth(capsys):
+    budget = Budget(max_depth=20)
+    errcode, out = run('fn F(n) {\n    return F(n + 1)\n}\nF(0)', budget, capsys)
+    assert errcode == -1 and 'BudgetError' in out
+    assert budget.counters()['exceeded'] == 'depth'
+
+
+def test_timeout_on_slow_statements(capsys):
+    budget = Budget(timeout=0.2)
+    start = time.perf_counter()
+    errcode, out = run('for i = 0, 20 {\n    Sleep(0.05)\n}', budget, capsys)
+    assert errcode == -1 and 'BudgetError' in out
+    assert budget.counters()['exceeded'] == 'timeout'
+    # stopped at the first statement after the deadline
+    assert time.perf_counter() - start < 0.5
+
+
+def test_timeout_with_a_clock():
+    now = [0.0]
+    budget = Budget(timeout=5, clock=lambda: now[0])
+    budget.start()
+    assert budget.statement(1) is None
+    now[0] = 5.5
+    assert budget.statement(2) is not None
+    budget.stop()
+    assert budget.counters()['exceeded'] == 'timeout'
+
+
+def test_memory(capsys):
+    budget = Budget(max_memory=10_000_000)
+    errcode, out = run('lt big = "x" * 50000000\nPrintln("after")', budget, capsys)
+    assert errcode == -1 and 'BudgetError' in out and 'after' not in out
+    counters = budget.counters()
+    assert counters['exceeded'] == 'memory'
+    assert counters['peak_memory'] > 10_000_000
+
+
+def test_memory_on_the_last_line(capsys):
+    budget = Budget(max_memory=10_000_000)
+    errcode, _ = run('lt big = "x" * 50000000', budget, capsys)
+    # nothing ran after it to stop, but the budget was still gone over
+    assert errcode == 0
+    assert budget.counters()['exceeded'] == 'memory'
+
+
+def test_map_counts_towards_the_budget(capsys):
+    budget = Budget(max_statements=1000, timeout=5)
+    errcode, out = run('fn F(x) {\n    x = x + 1\n    goto 1\n}\nlt y = Map([1], "F")', budget, capsys)
+    assert errcode == -1 and 'BudgetError' in out
+    assert budget.counters()['exceeded'] == 'statements'
+
+
+def test_reused_budget_starts_over(capsys):
+    budget = Budget(max_statements=1000)
+    run(LOOP, budget, capsys)
+    errcode, _ = run('Println(1)', budget, capsys)
+    assert errcode == 0
+    assert budget.counters()['exceeded'] is None and budget.counters()['statements'] == 1
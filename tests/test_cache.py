@@ -0,0 +1,68 @@
+'''Tests for `cat_cache`, a script's parsed `Program` is kept in `__catcache__` and used again until the script changes'''
+import os
+import pickle
+import pytest
+import cat_cache
+from interpreter import run_code
+
+
+
+SOURCE = 'lt x = 2\nPrintln(x * 3)'
+
+
+@pytest.fixture
+def script(tmp_path) -> str:
+    path = str(tmp_path / 'script.cat')
+    with open(path, 'w') as f: f.write(SOURCE)
+    return path
+
+
+def no_parsing(monkeypatch):
+    def parse(*args, **kwargs): raise AssertionError("parsed again")
+    monkeypatch.setattr(cat_cache, 'parse_program', parse)
+
+
+def header(path: str) -> dict:
+    with open(cat_cache.cache_path(path), 'rb') as f:
+        assert f.read(len(cat_cache.MAGIC)) == cat_cache.MAGIC
+        return pickle.load(f)
+
+
+def test_cached(script, monkeypatch, capsys):
+    cat_cache.load_program(script)
+    assert os.path.isfile(cat_cache.cache_path(script))
+    no_parsing(monkeypatch)
+    assert run_code(cat_cache.load_program(script))[0] == 0
+    assert capsys.readouterr().out == '6\n'
+
+
+def test_changed_script(script, capsys):
+    cat_cache.load_program(script)
+    with open(script, 'w') as f: f.write(SOURCE.replace('3', '4'))
+    assert run_code(cat_cache.load_program(script))[0] == 0
+    assert capsys.readouterr().out == '8\n'
+
+
+def test_touched_script(script, monkeypatch):
+    cat_cache.load_program(script)
+    stat = os.stat(script)
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    no_parsing(monkeypatch)
+    assert cat_cache.load_program(script) is not None
+    # the hash matched, so the cache has the new mtime and the next read doesn't hash the source
+    assert header(script)['mtime'] == os.stat(script).st_mtime_ns
+    def sha256(data): raise AssertionError("hashed again")
+    monkeypatch.setattr(cat_cache, 'sha256', sha256)
+    assert cat_cache.load_program(script) is not None
+
+
+def test_bad_cache_file(script, capsys):
+    cat_cache.load_program(script)
+    with open(cat_cache.cache_path(script), 'wb') as f: f.write(cat_cache.MAGIC + b'not a pickle')
+    assert run_code(cat_cache.load_program(script))[0] == 0
+    assert capsys.readouterr().out == '6\n'
+
+
+def test_without_the_cache(script):
+    cat_cache.load_program(script, use_cache=False)
+    assert not os.path.exists(cat_cache.cache_path(script))
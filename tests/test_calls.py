@@ -0,0 +1,44 @@
+'''Tests for how calls and assignments are dispatched, a `Name(args)` is a CatScript call if `Name` is a function when it runs and Python's otherwise'''
+from interpreter import Scope, evaluate, make_builtins, run_code
+
+
+
+def run(source: str, capsys) -> tuple[int, str]:
+    errcode, _ = run_code(source)
+    return errcode, capsys.readouterr().out
+
+
+def test_nested_calls(capsys):
+    assert run('fn Inc(n) {\n    return n + 1\n}\nPrintln(Inc(Inc(1)) * 2, Len("ab") + len("abc"))', capsys) == (0, '6 5\n')
+
+
+def test_python_fallback(capsys):
+    # `len` isn't a CatScript function, so Python calls it
+    assert run('lt n = len([1, 2, 3])\nPrintln(n)', capsys) == (0, '3\n')
+
+
+def test_unknown_function(capsys):
+    errcode, out = run('Println(Nope(1))', capsys)
+    assert errcode == -1 and "name 'Nope' is not defined" in out
+
+
+def test_calls_that_only_sometimes_run(capsys):
+    # a call after `and`/`or` or in `x if c else y` is left to Python, so it doesn't run(or fail) when it's skipped
+    assert run('lt a = false and Nope(1)\nlt b = true or Nope(2)\nlt c = Nope(3) if a else len("ab")\nPrintln(a, b, c)', capsys) == (0, 'False True 2\n')
+
+
+def test_variable_holding_a_python_function(capsys):
+    assert run('lt F = len\nPrintln(F("abc"))', capsys) == (0, '3\n')
+
+
+def test_assignment_needs_an_existing_variable(capsys):
+    errcode, out = run('x = 1', capsys)
+    assert errcode == -1 and 'EvalError' in out
+
+
+def test_evaluate():
+    vars, funcs = Scope({'x': 2}), Scope()
+    funcs.update(make_builtins([], None, vars, funcs))
+    assert evaluate(vars, funcs, 'Len("abc") * x', [], [], 1) == (6, None)
+    value, err = evaluate(vars, funcs, 'Len(1)', [], [], 1)
+    assert value is None and err is not None
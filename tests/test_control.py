@@ -0,0 +1,51 @@
+'''Tests for `goto`, `Exit()`, `return` and the error codes they end runs with, on both engines'''
+import pytest
+from cat_vm import run_vm
+from interpreter import run_code
+
+
+
+@pytest.fixture(params=['tree', 'vm'])
+def run(request, capsys):
+    engine = run_code if request.param == 'tree' else run_vm
+
+    def run(source: str) -> tuple[int, str]:
+        errcode, _ = engine(source)
+        return errcode, capsys.readouterr().out
+    return run
+
+
+def test_goto_loop(run):
+    assert run('lt n = 0\nn = n + 1\nif n < 3 {\n    goto 2\n}\nPrintln(n)') == (0, '3\n')
+
+
+def test_goto_forward(run):
+    assert run('goto 3\nPrintln("skipped")\nPrintln("here")') == (0, 'here\n')
+
+
+@pytest.mark.parametrize('source, message', [
+    ('Println(1)\ngoto 2', 'cannot use goto to jump to the same line'),
+    ('goto 9', '9 is not a valid line'),
+    ('goto "1"', "invalid value for goto"),
+    ('goto 3\nfor i = 0, 2 {\n    Println(i)\n}', 'cannot use goto to jump into the body of a for loop or function'),
+])
+def test_goto_errors(run, source: str, message: str):
+    errcode, out = run(source)
+    assert errcode == -1 and message in out
+
+
+def test_exit(run):
+    assert run('Println("a")\nExit()\nPrintln("b")') == (1, 'a\n')
+
+
+def test_exit_in_a_fn(run):
+    assert run('fn Stop() {\n    Exit()\n}\nfor i = 0, 5 {\n    Println(i)\n    if i == 1 {\n        Stop()\n    }\n}') == (1, '0\n1\n')
+
+
+def test_return_from_the_script(run):
+    assert run('Println("a")\nreturn 5\nPrintln("b")') == (2, 'a\n')
+
+
+def test_error_code(run):
+    errcode, out = run('Println("a")\nlt x = 1 / 0')
+    assert errcode == -1 and out.startswith('a\n') and 'EvalError on line 2' in out
@@ -0,0 +1,37 @@
+'''Tests for `return` and the call frames fns run in, a call pushes a frame onto the one interpreter loop instead of running the body with `run_code` again'''
+import os
+from interpreter import run_code
+
+
+
+def run(source: str, capsys) -> tuple[int, str]:
+    errcode, _ = run_code(source)
+    return errcode, capsys.readouterr().out
+
+
+def test_fib_rec(capsys):
+    with open(os.path.join(os.path.dirname(__file__), '..', 'scripts', 'fib_rec.cat')) as f: source = f.read()
+    assert run(source + '\nPrintln(FibRec(15))', capsys) == (0, '610\n')
+
+
+def test_deep_recursion(capsys):
+    # far deeper than Python's recursion limit
+    assert run('fn Depth(n) {\n    if n == 0 {\n        return 0\n    }\n    return Depth(n - 1) + 1\n}\nPrintln(Depth(20000))', capsys) == (0, '20000\n')
+
+
+def test_return_from_a_loop(capsys):
+    assert run('fn Find(n) {\n    for i = 0, 10 {\n        if i * i >= n {\n            return i\n        }\n    }\n    return -1\n}\nPrintln(Find(10), Find(1000))', capsys) == (0, '4 -1\n')
+
+
+def test_no_return_value(capsys):
+    assert run('fn F() {\n    lt x = 1\n}\nfn G() {\n    return\n}\nPrintln(F(), G())', capsys) == (0, 'None None\n')
+
+
+def test_error_in_a_nested_call(capsys):
+    errcode, out = run('fn F(n) {\n    lt x = 1 / n\n}\nfn G() {\n    F(0)\n    Println("after")\n}\nG()\nPrintln("end")', capsys)
+    assert errcode == -1 and 'division by zero' in out and 'after' not in out and 'end' not in out
+
+
+def test_return_value_of_the_script():
+    errcode, values = run_code('lt x = 5\nreturn x * 2', return_values=True)
+    assert errcode == 2 and values[2] == 10
@@ -0,0 +1,66 @@
+'''Tests for `cat_hooks`, the events a `Hooks` sees while a script runs and the counters it exports'''
+import pytest
+from cat_hooks import EVENTS, Hooks
+from interpreter import run_code
+
+
+
+SOURCE = 'fn F(n) {\n    if n > 0 {\n        return F(n - 1)\n    }\n    return Len("ab")\n}\nlt x = F(2)\nif x > 5 {\n    Println(1)\n} else {\n    Println(x)\n}'
+
+
+def record(hooks: Hooks) -> list[tuple]:
+    events = []
+    for event in EVENTS: hooks.on(event, lambda *args, event=event: events.append((event, *args)))
+    return events
+
+
+def test_events(capsys):
+    hooks = Hooks()
+    events = record(hooks)
+    assert run_code(SOURCE, hooks=hooks)[0] == 0
+    calls = [e for e in events if e[0] in ('call_enter', 'call_exit')]
+    assert calls == [('call_enter', 'F', 7), ('call_enter', 'F', 3), ('call_enter', 'F', 3), ('call_exit', 'F'), ('call_exit', 'F'), ('call_exit', 'F')]
+    assert [e for e in events if e[0] == 'builtin'] == [('builtin', 'Len', 5), ('builtin', 'Println', 11)]
+    # the `if` on line 8 is false, so it jumps to the `else`
+    assert ('jump', 8, 10) in events
+    assert [e[1] for e in events if e[0] == 'line'][:4] == [1, 7, 2, 3]
+
+
+def test_error_event(capsys):
+    hooks = Hooks()
+    events = record(hooks)
+    assert run_code('Println(1)\nlt y = 1 / 0', hooks=hooks)[0] == -1
+    (event, err, ln), = [e for e in events if e[0] == 'error']
+    assert ln == 2 and 'division by zero' in err.error()
+
+
+def test_counters(capsys):
+    hooks = Hooks()
+    run_code(SOURCE, hooks=hooks)
+    run_code('memo fn G(n) {\n    return n\n}\nG(1)\nG(1)', hooks=hooks)
+    counters = hooks.counters()
+    # the second `G(1)` is a memo hit, the fn doesn't run
+    assert (counters['runs'], counters['calls'], counters['max_depth'], counters['errors']) == (2, 4, 3, 0)
+    assert counters['builtin_calls'] == {'Len': 1, 'Println': 1}
+    # the memo counts are of the last run
+    assert counters['caches']['memo'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_prometheus(capsys):
+    hooks = Hooks('cat')
+    run_code(SOURCE, hooks=hooks)
+    text = hooks.to_prometheus()
+    assert '# TYPE cat_calls_total counter\ncat_calls_total 3\n' in text
+    assert 'cat_builtin_calls_total{name="Len"} 1\n' in text and 'cat_call_depth_max 3\n' in text
+    assert all(line.startswith(('#', 'cat_')) for line in text.splitlines())
+
+
+def test_on_and_off():
+    hooks = Hooks()
+    with pytest.raises(ValueError): hooks.on('nope', print)
+    events = []
+    callback = hooks.on('line', events.append)
+    run_code('lt x = 1', hooks=hooks)
+    hooks.off('line', callback)
+    run_code('lt x = 1', hooks=hooks)
+    assert events == [1] and hooks.statements == 2
@@ -0,0 +1,32 @@
+'''Tests for `Interpreter`, which keeps its variables and functions between `run()`s and `call()`s and prints to its own output'''
+from cat_output import OutputSink
+from interpreter import Interpreter
+
+
+
+def test_keeps_state_between_runs():
+    interpreter = Interpreter(OutputSink.to_memory())
+    assert interpreter.run('lt x = 2\nfn Double(n) {\n    return n * 2\n}')[0] == 0
+    assert interpreter.run('x = Double(x)') == (0, None)
+    assert interpreter.get('x') == 4
+    assert interpreter.call('Double', 5) == (2, 10) # it returned, like a script that uses `return`
+
+
+def test_call_prints_to_its_output(capsys):
+    sink = OutputSink.to_memory()
+    interpreter = Interpreter(sink)
+    interpreter.run('fn Fail(n) {\n    Println("before")\n    return n / 0\n}')
+    assert interpreter.call('Fail', 1) == (-1, None)
+    out = sink.getvalue()
+    assert out.startswith('before\n') and 'EvalError' in out
+    assert capsys.readouterr().out == ''
+
+
+def test_call_errors_print_to_its_output(capsys):
+    sink = OutputSink.to_memory()
+    interpreter = Interpreter(sink)
+    assert interpreter.call('Missing') == (-1, None)
+    assert interpreter.call('Len', 1) == (-1, None)
+    out = sink.getvalue()
+    assert out == "NameError: name 'Missing' is not defined\nTypeError: 'Int' does not have a length\n"
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,51 @@
+'''Tests for `cat_lexer`, the one pass tokenizer and the helpers that work on its tokens'''
+import time
+from cat_lexer import NAME, NUMBER, STRING, OP, ERROR, closing_bracket, find_token, span, split_tokens, tokenize
+from interpreter import run_code
+
+
+
+def kinds(line: str) -> list[tuple[str, str]]:
+    return [(tok.kind, tok.text) for tok in tokenize(line)[1][0]]
+
+
+def test_strings_and_comments():
+    lines, tokens = tokenize('lt x = "a // b \\" c" // comment\n\nPrintln(x)')
+    assert lines == ['lt x = "a // b \\" c"', '', 'Println(x)']
+    assert [len(t) for t in tokens] == [4, 0, 4]
+    assert (tokens[0][3].kind, tokens[0][3].text) == (STRING, '"a // b \\" c"')
+
+
+def test_kinds():
+    assert kinds("x = 0x1F + 1.5e3 ** 2 'a") == [(NAME, 'x'), (OP, '='), (NUMBER, '0x1F'), (OP, '+'), (NUMBER, '1.5e3'), (OP, '**'), (NUMBER, '2'), (ERROR, "'"), (NAME, 'a')]
+
+
+def test_literals_are_only_whole_names():
+    lines, _ = tokenize('if untrue == null and nullable != "true" {')
+    assert lines == ['if untrue == None and nullable != "true" {']
+
+
+def test_literals_in_a_script(capsys):
+    assert run_code('lt untrue = 1\nlt nullable = true\nPrintln(untrue, nullable, "true null")')[0] == 0
+    assert capsys.readouterr().out == '1 True true null\n'
+
+
+def test_token_positions_slice_the_cleaned_line():
+    lines, tokens = tokenize('    lt name = "x"   // trailing')
+    assert [lines[0][t.start:t.end] for t in tokens[0]] == ['lt', 'name', '=', '"x"']
+
+
+def test_brackets():
+    lines, tokens = tokenize('F(a, [1, 2], (b, c)), d')
+    line, toks = lines[0], tokens[0]
+    assert [span(line, part) for part in split_tokens(toks)] == ['F(a, [1, 2], (b, c))', 'd']
+    assert closing_bracket(toks, 1) == 15 and find_token(toks, ',') == 16
+    assert closing_bracket(tokenize('F(a')[1][0], 1) == -1
+
+
+def test_long_lines_are_linear():
+    # the old scanners sliced the rest of the line at every separator
+    source = 'lt x = ' + ' + '.join(['"a, b"'] * 20000)
+    start = time.perf_counter()
+    tokens = tokenize(source)[1][0]
+    assert len(tokens) == 3 + 2 * 20000 - 1 and time.perf_counter() - start < 2
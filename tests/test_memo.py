@@ -0,0 +1,52 @@
+'''Tests for `memo fn`, its results are cached by its arguments in a bounded LRU `MemoTable` on the `Func`'''
+import pytest
+from cat_vm import run_vm
+from interpreter import MemoTable, run_code
+
+
+
+FIB = 'memo fn Fib(n) {\n    if n < 2 {\n        return n\n    }\n    return Fib(n - 1) + Fib(n - 2)\n}\n'
+
+
+def stats(engine, source: str, name: str) -> dict[str, int]:
+    errcode, values = engine(source, return_values=True)
+    assert errcode == 0
+    return values[1][name][1].memo_stats()
+
+
+@pytest.mark.parametrize('engine', [run_code, run_vm])
+def test_fib(engine, capsys):
+    # without the cache this would take around 10^16 calls
+    assert stats(engine, FIB + 'Println(Fib(80))', 'Fib') == {'hits': 78, 'misses': 81, 'unhashable': 0, 'size': 81, 'maxsize': 1024}
+    assert capsys.readouterr().out == '23416728348467685\n'
+
+
+def test_impure_builtins_are_rejected(capsys):
+    errcode, _ = run_code('memo fn F(n) {\n    Println(n)\n}\nF(1)')
+    assert errcode == -1 and "memo fn 'F' cannot call 'Println'" in capsys.readouterr().out
+
+
+def test_unhashable_arguments_are_not_cached(capsys):
+    assert stats(run_code, 'memo fn F(l) {\n    return Len(l)\n}\nPrintln(F([1, 2]), F([1, 2]))', 'F') == {'hits': 0, 'misses': 0, 'unhashable': 2, 'size': 0, 'maxsize': 1024}
+    assert capsys.readouterr().out == '2 2\n'
+
+
+def test_argument_types_are_part_of_the_key(capsys):
+    assert stats(run_code, 'memo fn F(n) {\n    return n\n}\nPrintln(F(1), F(1.0), F(true))', 'F')['misses'] == 3
+    assert capsys.readouterr().out == '1 1.0 True\n'
+
+
+def test_plain_fn_has_no_stats():
+    assert stats(run_code, 'fn F() {\n    return 1\n}', 'F') is None
+
+
+def test_lru_eviction():
+    table = MemoTable(2)
+    for n in (1, 2):
+        table.store(table.key([('n', n)]), n)
+    table.lookup(table.key([('n', 1)]))
+    table.store(table.key([('n', 3)]), 3)
+    # 2 was the least recently used
+    assert table.lookup(table.key([('n', 2)])) == (False, None)
+    assert table.lookup(table.key([('n', 1)])) == (True, 1)
+    assert len(table) == 2
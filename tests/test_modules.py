@@ -0,0 +1,79 @@
+'''Tests for `import` and `cat_modules`, on both engines'''
+import os
+import pytest
+from cat_modules import ModuleCache
+from cat_vm import run_vm
+from interpreter import run_code
+
+
+
+LIB = '''lt scale = 10
+lt _secret = 1
+fn Scale(n) {
+    return n * scale
+}
+Println("main" if IsMain() else "module")'''
+
+
+def write(directory, name: str, source: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f: f.write(source)
+    return path
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch) -> ModuleCache:
+    # the scripts are strings, their imports are found in the current directory
+    monkeypatch.chdir(tmp_path)
+    write(tmp_path, 'lib.cat', LIB)
+    return ModuleCache()
+
+
+@pytest.fixture(params=['tree', 'vm'])
+def run(request, modules, capsys):
+    engine = run_code if request.param == 'tree' else run_vm
+
+    def run(source: str) -> tuple[int, str]:
+        errcode, _ = engine(source, modules=modules)
+        return errcode, capsys.readouterr().out
+    return run
+
+
+def test_namespace(run):
+    # the module's fn uses the module's `scale`, not the caller's
+    assert run('lt scale = 2\nimport "lib"\nimport "lib.cat" as l\nPrintln(lib.scale, l.Scale(3), lib.Scale(scale))') == (0, 'module\n10 30 20\n')
+
+
+def test_fn_of_a_module_as_a_value(run):
+    assert run('import "lib"\nPrintln(Map([1, 2], lib.Scale))') == (0, 'module\n[10, 20]\n')
+
+
+def test_runs_once(run, modules):
+    assert run('import "lib"\nimport "lib" as again') == (0, 'module\n')
+    assert run('import "lib"') == (0, '')
+    assert modules.stats() == {'hits': 2, 'misses': 1, 'size': 1}
+
+
+def test_changed_module_runs_again(run, tmp_path):
+    assert run('import "lib"\nPrintln(lib.scale)') == (0, 'module\n10\n')
+    path = write(tmp_path, 'lib.cat', LIB.replace('10', '20'))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert run('import "lib"\nPrintln(lib.scale)') == (0, 'module\n20\n')
+
+
+@pytest.mark.parametrize('source, message', [
+    ('import "lib"\nPrintln(lib._secret)', "'_secret' is private to its module"),
+    ('import "nope"', "module 'nope' not found"),
+    ('lt lib = 1\nimport "lib"', "cannot import 'lib' as 'lib', a variable with that name already exists"),
+])
+def test_errors(run, source: str, message: str):
+    errcode, out = run(source)
+    assert errcode == -1 and message in out
+
+
+def test_cyclic_import(run, tmp_path):
+    write(tmp_path, 'a.cat', 'import "b"')
+    write(tmp_path, 'b.cat', 'import "a"')
+    errcode, out = run('import "a"')
+    assert errcode == -1 and "cyclic import 'a.cat' -> 'b.cat' -> 'a.cat'" in out
@@ -0,0 +1,249 @@
+'''Differential tests for `cat_optimize`, every script runs with `run_code`, on the VM(`run_vm`) and unoptimized
+(parsed without `optimize()`, so without folded constants or fast loops), and all three have to print the same things,
+stop with the same error code and leave the same global variables'''
+import contextlib
+import io
+import random
+import pytest
+import cat_snapshot
+from cat_lexer import tokenize
+from cat_vm import run_vm
+from interpreter import Program, build_program, parse_program, run_code
+
+
+
+CASES = {
+    'fib': '''lt a = 0
+lt b = 1
+for i = 0, 10 {
+    Println(a)
+    lt c = a + b
+    b = a
+    a = c
+}
+Println(a, b)''',
+    'outer_loop_var': '''lt i = 100
+for i = 0, 3 {
+    Println(i)
+}
+Println(i)''',
+    'empty_range': '''lt i = 100
+for i = 5, 3 {
+    Println(i)
+}
+Println(i)''',
+    'assign_loop_var': '''lt s = 0
+for i = 0, 5 {
+    i = i * 2
+    s = s + i
+}
+Println(s)''',
+    'error_mid_loop': '''lt s = 0
+for i = 0, 5 {
+    s = s + 1
+    lt q = 10 / (3 - i)
+    Println(q)
+}
+Println(s)''',
+    'builtin_error': '''for i = 0, 5 {
+    Println(Lower(i))
+}''',
+    'let_shadows': '''lt c = 5
+for i = 0, 2 {
+    lt c = i
+    Println(c)
+}''',
+    'let_before_use': '''lt c = 1
+for i = 0, 2 {
+    Println(c)
+    lt c = 2
+}''',
+    'assign_missing': '''for i = 0, 2 {
+    zz = 1
+}''',
+    'name_error': '''for i = 0, 2 {
+    Println(qq)
+}''',
+    'if_chain': '''lt out = []
+for i = 1, 20 {
+    if not i % 3 and not i % 5 {
+        out.append("fb")
+    } elseif not i % 3 {
+        out.append("f")
+    } elseif i % 5 == 0 {
+        Println("b", i)
+    } else {
+        lt z = 1
+    }
+}
+Println(out)''',
+    'fn_in_loop': '''fn F(x) {
+    return x * 2
+}
+lt s = 0
+for i = 0, 3 {
+    s = s + F(i)
+}
+Println(s)''',
+    'exit_in_loop': '''for i = 0, 5 {
+    Println(i)
+    if i == 2 {
+        Exit()
+    }
+}''',
+    'constants': '''lt k = 3
+lt m = k * 2
+lt neg = -4
+lt name = "x"
+lt s = 0
+for i = 0, 4 {
+    s = s + i * m + neg ** 2
+    Println(name + str(k))
+}
+Println(s, m)''',
+    'constant_assigned_in_fn': '''lt k = 3
+fn Bump() {
+    k = 10
+}
+for i = 0, 3 {
+    Println(k)
+    Bump()
+}''',
+    'constant_assigned_through_map': '''lt k = 1
+fn Set(x) {
+    k = x
+    return x
+}
+for i = 0, 3 {
+    Println(k, Map([i], "Set"))
+}''',
+    'map_in_fn': '''fn Scale(x) {
+    return x * k
+}
+fn Outer(k) {
+    return Map([1, 2], "Scale")
+}
+for i = 0, 3 {
+    Println(Outer(i))
+}''',
+    'underscore': '''lt n = 0
+for _ = 0, 3 {
+    n = n + 1
+}
+Println(n)''',
+    'nested_loops': '''lt t = 0
+for i = 0, 3 {
+    for j = 0, 3 {
+        t = t + i * j
+    }
+}
+Println(t)''',
+    'python_calls': '''lt xs = []
+for i = 0, 3 {
+    xs.append(str(i) + Lower("A"))
+    print(i, Println(i))
+}
+Println(xs)''',
+    'loop_in_fn': '''fn G(n) {
+    lt acc = 0
+    for i = 0, n {
+        acc = acc + i
+    }
+    return acc
+}
+Println(G(10))''',
+    'lambda': '''lt f = 0
+for i = 0, 3 {
+    f = (lambda: i)()
+}
+Println(f)''',
+    'nested_chain_then_else': '''lt a = 1
+if a > 0 {
+    if a > 0 {
+    } else {
+        Println("no")
+    }
+} else {
+    Println("no either")
+}
+Println("end")''',
+    'goto': '''lt n = 0
+n = n + 1
+if n < 5 {
+    goto 2
+}
+Println(n)''',
+}
+
+
+def unoptimized(source: str) -> Program:
+    return build_program(*tokenize(source))
+
+
+def run(runner, program: Program) -> tuple[str, int, dict]:
+    "Returns what a run printed, its error code and its global variables"
+    with contextlib.redirect_stdout(io.StringIO()) as text:
+        if runner is run_vm: errcode, res = run_vm(program, True)
+        else: errcode, res = run_code(program, [], True)
+    vars = {name: value for name, value in dict(res[0]).items() if name != '__builtins__'} if res else None
+    return text.getvalue(), errcode, vars
+
+
+def check(source: str):
+    expected = run(run_code, unoptimized(source))
+    assert run(run_code, parse_program(source)) == expected
+    assert run(run_vm, parse_program(source)) == expected
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_case(name: str):
+    check(CASES[name])
+
+
+def test_snapshot_in_a_loop(tmp_path):
+    # a fast loop only writes its variables back when it ends, so `Snapshot` runs the loop as a normal loop
+    path = str(tmp_path / 'loop.snap')
+    source = f'lt t = 0\nfor i = 0, 3 {{\n    t = t + i\n    Snapshot("{path}")\n}}\nt = 0'
+    saved = []
+    for runner, program in ((run_code, unoptimized(source)), (run_code, parse_program(source)), (run_vm, parse_program(source))):
+        assert run(runner, program)[1] == 0
+        saved.append(cat_snapshot.load(path).vars['t'])
+    assert saved == [3, 3, 3]
+
+
+def random_script(rng: random.Random) -> str:
+    "A script of `lt`s, assignments, if/else chains and(nested) `for` loops over a few variables"
+    names = ['a', 'b', 'c']
+    lines = [f'lt {n} = {rng.randint(-3, 9)}' for n in names]
+
+    def value() -> str:
+        ops = ['+', '-', '*', '%'] # `//` starts a comment in CatScript
+        return f'{rng.choice(names + [str(rng.randint(0, 4))])} {rng.choice(ops)} {rng.choice(names + [str(rng.randint(1, 4))])}'
+
+    def block(depth: int, loop_vars: list[str]):
+        for _ in range(rng.randint(1, 4)):
+            indent = '    ' * depth
+            kind = rng.random()
+            if kind < 0.4: lines.append(f'{indent}{rng.choice(names + loop_vars)} = ({value()}) % 50') # so the numbers stay small
+            elif kind < 0.55: lines.append(f'{indent}Println({value()})')
+            elif kind < 0.75:
+                lines.append(f'{indent}if {value()} > {rng.randint(-2, 5)} {{')
+                block(depth + 1, loop_vars)
+                if rng.random() < 0.5:
+                    lines.append(f'{indent}}} else {{')
+                    block(depth + 1, loop_vars)
+                lines.append(f'{indent}}}')
+            elif depth < 3:
+                var = f'i{depth}'
+                lines.append(f'{indent}for {var} = {rng.randint(-1, 2)}, {rng.randint(0, 5)} {{')
+                block(depth + 1, loop_vars + [var])
+                lines.append(f'{indent}}}')
+
+    block(0, [])
+    lines.append('Println(' + ', '.join(names) + ')')
+    return '\n'.join(lines)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random(seed: int):
+    check(random_script(random.Random(seed)))
@@ -0,0 +1,68 @@
+'''Tests for `cat_output`, the sink `Println` and `Printf` write to, and Python's `print()` going through it while a script runs'''
+import asyncio
+import threading
+from cat_async import run_code_async
+from cat_output import OutputSink
+from interpreter import Interpreter, run_code
+
+
+
+def test_buffered_until_full():
+    sink = OutputSink.to_memory(buffer_size=10)
+    sink.write('abc')
+    assert sink.stream().getvalue() == ''
+    sink.write('defghijk')
+    assert sink.stream().getvalue() == 'abcdefghijk'
+    sink.write('l')
+    assert sink.getvalue() == 'abcdefghijkl'
+
+
+def test_print_in_order_with_println():
+    sink = OutputSink.to_memory()
+    errcode, _ = run_code('Println("a")\nlt x = print("b")\nPrintln("c")', output=sink)
+    assert errcode == 0
+    assert sink.getvalue() == 'a\nb\nc\n'
+
+
+def test_error_after_buffered_output(capsys):
+    errcode, _ = run_code('Println("before")\nlt x = y')
+    assert errcode == -1
+    out = capsys.readouterr().out
+    assert out.index('before') < out.index('EvalError')
+
+
+def test_concurrent_async_runs(capsys):
+    a = 'Println("a1")\nSleep(0.01)\nPrintln("a2")'
+    b = 'Println("b1")\nSleep(0.03)\nPrintln("b2")'
+
+    async def main():
+        return await asyncio.gather(run_code_async(a), run_code_async(b))
+    assert [errcode for errcode, _ in asyncio.run(main())] == [0, 0]
+    lines = capsys.readouterr().out.split()
+    assert sorted(lines) == ['a1', 'a2', 'b1', 'b2']
+    assert lines.index('a1') < lines.index('a2') and lines.index('b1') < lines.index('b2')
+
+
+def test_concurrent_async_runs_keep_their_prints():
+    sinks = [OutputSink.to_memory(), OutputSink.to_memory()]
+    scripts = [f'lt x = print("{name}1")\nSleep({delay})\nlt y = print("{name}2")' for name, delay in (('a', 0.03), ('b', 0.01))]
+
+    async def main():
+        await asyncio.gather(*(run_code_async(script, output=sink) for script, sink in zip(scripts, sinks)))
+    asyncio.run(main())
+    assert [sink.getvalue() for sink in sinks] == ['a1\na2\n', 'b1\nb2\n']
+
+
+def test_interpreters_on_threads():
+    sinks = [OutputSink.to_memory() for _ in range(4)]
+    start = threading.Barrier(len(sinks))
+
+    def work(n: int):
+        interpreter = Interpreter(sinks[n])
+        start.wait()
+        for i in range(50): interpreter.run(f'print({n})\nPrintln({i})')
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(len(sinks))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    for n, sink in enumerate(sinks):
+        assert sink.getvalue() == ''.join(f'{n}\n{i}\n' for i in range(50))
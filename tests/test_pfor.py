@@ -0,0 +1,56 @@
+'''Tests for `cat_pfor`, a `pfor` loop prints and collects the same things as a `for` loop would, in order, on a process pool or in this process'''
+import pickle
+import pytest
+import cat_pfor
+from interpreter import Scope, parse_program, run_code
+
+
+
+@pytest.fixture(params=[1, 2], ids=['in_process', 'pool'])
+def workers(request):
+    cat_pfor.configure(request.param, 2)
+    yield request.param
+    cat_pfor.configure()
+
+
+def test_prints_in_order(workers, capsys):
+    errcode, _ = run_code('pfor i = 0, 7 {\n    Println(i * i)\n}')
+    assert errcode == 0
+    assert capsys.readouterr().out == ''.join(f'{i * i}\n' for i in range(7))
+
+
+def test_into(workers, capsys):
+    errcode, (vars, _, _) = run_code('lt k = 3\npfor i = 0, 5 into out {\n    Collect(i * k)\n}', [], True)
+    assert errcode == 0 and vars['out'] == [0, 3, 6, 9, 12]
+
+
+def test_assignments_last_an_iteration(workers, capsys):
+    errcode, (vars, _, _) = run_code('lt t = 10\npfor i = 0, 4 into out {\n    t = t + i\n    Collect(t)\n}', [], True)
+    assert errcode == 0 and vars['out'] == [10, 11, 12, 13] and vars['t'] == 10
+
+
+def test_fns_go_to_the_workers(workers, capsys):
+    errcode, (vars, _, _) = run_code('fn Sq(n) {\n    return n * n\n}\npfor i = 0, 4 into out {\n    Collect(Sq(i))\n}', [], True)
+    assert errcode == 0 and vars['out'] == [0, 1, 4, 9]
+
+
+def test_error_stops_the_loop(workers, capsys):
+    errcode, _ = run_code('pfor i = 0, 6 {\n    Println(i)\n    lt x = 1 / (i - 3)\n}\nPrintln("after")')
+    out = capsys.readouterr().out
+    assert errcode == -1 and out.startswith('0\n1\n2\n3\n') and 'EvalError' in out and 'after' not in out
+
+
+def test_unpicklable_variable(capsys):
+    errcode, _ = run_code('pfor i = 0, 2 {\n    Println(i)\n}', injected_vars={'gen': (n for n in range(3))})
+    assert errcode == -1 and "cannot send variable 'gen' to the workers" in capsys.readouterr().out
+
+
+def test_pack_leaves_out_python_builtins():
+    vars = Scope({'k': 1})
+    eval('k', vars) # `eval` puts `__builtins__` in the variables
+    assert '__builtins__' in vars
+    vars['__cat_0'] = object() # the result of a call in the expression that's running
+    payload, err = cat_pfor.pack(parse_program('Println(i)'), 'i', 1, vars, Scope())
+    assert err is None
+    _, _, _, values, _ = pickle.loads(payload)
+    assert values == {'k': 1}
@@ -0,0 +1,58 @@
+'''Tests for `cat_profile`, what a `Profiler` records about a run and the reports it writes'''
+import itertools
+import json
+import pstats
+from cat_profile import Profiler
+from interpreter import run_code
+
+
+
+SOURCE = 'fn Sq(n) {\n    return n * n\n}\nlt t = 0\nfor i = 0, 3 {\n    t = t + Sq(i)\n}\nPrintln(t)'
+
+
+def profile(source: str, capsys) -> Profiler:
+    # every reading of the clock is a second after the last one, so the times don't depend on the machine
+    ticks = itertools.count()
+    profiler = Profiler('test.cat', clock=lambda: float(next(ticks)))
+    assert run_code(source, profiler=profiler)[0] == 0
+    capsys.readouterr()
+    return profiler
+
+
+def test_counts(capsys):
+    profiler = profile(SOURCE, capsys)
+    assert {ln: s[0] for ln, s in profiler.lines.items()} == {1: 1, 2: 3, 4: 1, 5: 1, 6: 3, 8: 1}
+    assert {name: s[0] for name, s in profiler.funcs.items()} == {('<main>', 0): 1, ('Sq', 1): 3}
+    assert profiler.loops == {5: 3}
+
+
+def test_times(capsys):
+    profiler = profile(SOURCE, capsys)
+    # the line calling `Sq` has the calls' time in its cumulative time, but not in its self time
+    count, self_time, cumulative = profiler.lines[6]
+    assert cumulative - self_time == profiler.funcs[('Sq', 1)][3]
+    assert profiler.funcs[('<main>', 0)][3] == profiler.total
+
+
+def test_recursion(capsys):
+    profiler = profile('fn Down(n) {\n    if n > 0 {\n        Down(n - 1)\n    }\n}\nDown(3)', capsys)
+    calls, primitive, self_time, cumulative = profiler.funcs[('Down', 1)]
+    assert (calls, primitive) == (4, 1) and cumulative < profiler.total
+
+
+def test_json(capsys):
+    data = json.loads(profile(SOURCE, capsys).to_json())
+    assert data['file'] == 'test.cat' and data['loops'] == [{'line': 5, 'iterations': 3}]
+    assert [l['source'] for l in data['lines']][:2] == ['fn Sq(n) {', 'return n * n']
+
+
+def test_pstats(tmp_path, capsys):
+    path = str(tmp_path / 'test.prof')
+    profile(SOURCE, capsys).dump_stats(path)
+    stats = pstats.Stats(path).stats
+    assert stats[('test.cat', 1, 'Sq')][:2] == (3, 3)
+
+
+def test_report(capsys):
+    report = profile(SOURCE, capsys).report()
+    assert report.startswith('profile of test.cat') and 't = t + Sq(i)' in report and 'for loop' in report
@@ -0,0 +1,59 @@
+'''Tests for `cat_repl`, statements run one at a time against the same variables and functions'''
+import cat_modules
+from cat_repl import Repl, main
+
+
+
+def session(lines: list[str]) -> list[str]:
+    "Runs `main()` on `lines`, returns what it wrote"
+    lines = iter(lines)
+    written = []
+    def read(prompt: str) -> str:
+        try: return next(lines)
+        except StopIteration: raise EOFError
+    main(read, written.append)
+    return written
+
+
+def test_state_is_kept(capsys):
+    repl = Repl()
+    assert repl.feed('lt x = 2') == (0, None)
+    assert repl.feed('x * 3') == (2, 6)
+    assert repl.feed('lt y = 1 / 0') == (-1, None)
+    # the error didn't lose anything
+    assert repl.feed('x') == (2, 2)
+
+
+def test_earlier_lines_dont_run_again(capsys):
+    repl = Repl()
+    repl.feed('Println("once")')
+    repl.feed('lt x = 1')
+    repl.feed('x')
+    assert capsys.readouterr().out == 'once\n'
+
+
+def test_blocks_are_buffered(capsys):
+    repl = Repl()
+    assert repl.feed('fn F(n) {') is None and repl.pending()
+    # braces in strings and comments don't count
+    assert repl.feed('    return "}" + n // {') is None
+    assert repl.feed('}') == (0, None) and not repl.pending()
+    assert repl.feed('F("a")') == (2, '}a')
+
+
+def test_blank_lines():
+    repl = Repl()
+    assert repl.feed('') is None and not repl.pending()
+
+
+def test_main(tmp_path, monkeypatch, capsys):
+    # `.load` looks for imports next to the file
+    monkeypatch.setattr(cat_modules, 'SEARCH_PATH', [])
+    script = tmp_path / 'lib.cat'
+    script.write_text('lt loaded = 5')
+    assert session(['lt a = 1', 'a + 1', 'lt b = 1', f'.load {script}', 'loaded + a', '.load /nope', '.exit', 'a']) == ['2', '6', "path '/nope' is not a file"]
+
+
+def test_main_stops_at_exit_and_eof():
+    assert session(['Exit()', '1']) == []
+    assert session(['1']) == ['1', '']
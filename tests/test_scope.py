@@ -0,0 +1,50 @@
+'''Tests for `Scope`, the chained variables and functions scopes, and the scoping rules scripts see because of them'''
+import pytest
+from interpreter import Scope, run_code
+
+
+
+def test_chain():
+    outer = Scope({'a': 1, 'b': 2})
+    inner = Scope({'b': 3}, outer)
+    assert (inner['a'], inner['b'], 'a' in inner, 'c' in inner) == (1, 3, True, False)
+    assert inner.owner('a') is outer and inner.owner('b') is inner and inner.owner('c') is None
+    assert inner.get('c', 'missing') == 'missing'
+    with pytest.raises(KeyError): inner['c']
+    assert inner.flatten() == {'a': 1, 'b': 3} and inner.names() == {'a', 'b'}
+    assert inner.chain() == [inner, outer]
+
+
+def test_deep_chain():
+    # a miss walks the chain instead of recursing
+    scope = Scope({'x': 1})
+    for _ in range(5000): scope = Scope(parent=scope)
+    assert scope['x'] == 1 and scope.owner('y') is None
+
+
+def run(source: str, capsys) -> tuple[int, str]:
+    errcode, _ = run_code(source)
+    return errcode, capsys.readouterr().out
+
+
+def test_fn_sees_and_assigns_its_callers_variables(capsys):
+    assert run('lt x = 1\nfn Bump() {\n    x = x + 1\n}\nBump()\nBump()\nPrintln(x)', capsys) == (0, '3\n')
+
+
+def test_fn_variables_stay_in_the_fn(capsys):
+    errcode, out = run('fn F(n) {\n    lt y = n * 2\n    return y\n}\nPrintln(F(2))\nPrintln(y)', capsys)
+    assert errcode == -1 and out.startswith('4\n') and 'EvalError' in out
+
+
+def test_arguments_shadow_the_caller(capsys):
+    assert run('lt n = 10\nfn F(n) {\n    n = n + 1\n    return n\n}\nPrintln(F(1), n)', capsys) == (0, '2 10\n')
+
+
+def test_loop_iterations_get_new_scopes(capsys):
+    # the `lt` runs again every iteration, and is gone after the loop
+    errcode, out = run('for i = 0, 3 {\n    lt sq = i * i\n    Println(sq)\n}\nPrintln(sq)', capsys)
+    assert errcode == -1 and out.startswith('0\n1\n4\n') and 'EvalError' in out
+
+
+def test_loop_writes_through_to_outer_variables(capsys):
+    assert run('lt total = 0\nfor i = 0, 4 {\n    total = total + i\n}\nPrintln(total)', capsys) == (0, '6\n')
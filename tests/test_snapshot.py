@@ -0,0 +1,85 @@
+'''Tests for `cat_snapshot`, saving an interpreter's state and carrying on from it'''
+import pytest
+import cat_snapshot
+from cat_snapshot import SnapshotError
+from interpreter import Interpreter, parse_program, run_code
+
+
+
+SETUP = '''Println("setup")
+lt table = [n * n for n in range(5)]
+fn Get(i) {
+    return table[i]
+}
+if true {
+    Snapshot("state.snap")
+    Println("in if")
+} else {
+    Println("else")
+}
+Println(Get(3))'''
+
+
+def resume(path: str, source: str) -> tuple[int, Interpreter]:
+    state = cat_snapshot.load(path)
+    program = parse_program(source)
+    interpreter = cat_snapshot.restore(state)
+    start, jumps = cat_snapshot.resume_point(state, program)
+    return interpreter.run(program, start=start, jumps=jumps)[0], interpreter
+
+
+def test_resume_where_it_was_taken(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert run_code(SETUP)[0] == 0
+    assert capsys.readouterr().out == 'setup\nin if\n9\n'
+    state = cat_snapshot.load('state.snap')
+    assert list(state.vars) == ['table'] and list(state.funcs) == ['Get']
+    # the setup doesn't run again, and the `else` is still skipped
+    assert resume('state.snap', SETUP)[0] == 0
+    assert capsys.readouterr().out == 'in if\n9\n'
+
+
+def test_other_scripts_start_at_their_first_line(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    run_code(SETUP)
+    capsys.readouterr()
+    assert resume('state.snap', 'Println("other")\nPrintln(Get(4), table[1])')[0] == 0
+    assert capsys.readouterr().out == 'other\n16 1\n'
+
+
+def test_snapshot_in_a_fn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = 'fn F() {\n    Snapshot("fn.snap")\n}\nF()'
+    assert run_code(source)[0] == 0
+    with pytest.raises(SnapshotError, match="took the snapshot in a fn or loop"):
+        cat_snapshot.resume_point(cat_snapshot.load('fn.snap'), parse_program(source))
+
+
+def test_save_and_load_interpreter(tmp_path, capsys):
+    path = str(tmp_path / 'interpreter.snap')
+    interpreter = Interpreter()
+    program = interpreter.parse('lt base = 10\nfn Add(n) {\n    return base + n\n}')
+    interpreter.run(program)
+    cat_snapshot.save_interpreter(interpreter, path, program)
+    loaded = cat_snapshot.load_interpreter(path)
+    assert loaded.run('Add(5)\nreturn Add(5)') == (2, 15)
+    # the script that took it carries on after its last line
+    assert cat_snapshot.resume_point(cat_snapshot.load(path), program) == (len(program.nodes), ())
+
+
+def test_unpicklable_value(tmp_path, capsys):
+    path = str(tmp_path / 'bad.snap')
+    with pytest.raises(SnapshotError, match="cannot snapshot variable 'f'"):
+        cat_snapshot.save(path, {'f': lambda x: x}, {})
+    assert run_code(f'lt f = lambda x: x\nSnapshot("{path}")')[0] == -1
+    assert "SnapshotError on line 2: cannot snapshot variable 'f'" in capsys.readouterr().out
+
+
+def test_bad_files(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state.snap')
+    with open(path, 'wb') as f: f.write(b'nope')
+    with pytest.raises(SnapshotError, match="not a CatScript snapshot"): cat_snapshot.load(path)
+    with pytest.raises(SnapshotError, match="cannot read"): cat_snapshot.load(str(tmp_path / 'missing.snap'))
+    cat_snapshot.save(path, {'x': 1}, {})
+    monkeypatch.setattr(cat_snapshot, 'FORMAT_VERSION', cat_snapshot.FORMAT_VERSION + 1)
+    with pytest.raises(SnapshotError, match="made with format version"): cat_snapshot.load(path)
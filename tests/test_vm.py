@@ -0,0 +1,81 @@
+'''Tests for `cat_vm`, the bytecode VM runs scripts like `run_code` does(`test_optimize` runs its cases on both), these are the things only the VM does'''
+import pytest
+import cat_snapshot
+from cat_budget import Budget
+from cat_hooks import Hooks
+from cat_profile import Profiler
+from cat_vm import LET_EVAL, HALT, FOR_NEXT, FOR_STEP, compile_program, run_vm
+from interpreter import Scope, parse_program, run_code
+
+
+
+# a call to a fn keeps `cat_optimize` from running a loop as a `FastLoop`, so the VM runs it
+ONE = 'fn One() {\n    return 1\n}\n'
+
+
+def ops(source: str) -> list[int]:
+    chunk = compile_program(parse_program(source))
+    return list(chunk.ops[::3])
+
+
+def test_let_is_one_instruction():
+    assert ops('lt x = 1\nlt y = x + 1') == [LET_EVAL, LET_EVAL, HALT]
+
+
+def test_loop_scopes():
+    assert FOR_STEP in ops('lt t = 0\nfor i = 0, 3 {\n    t = t + i\n}')
+    assert FOR_NEXT in ops('for i = 0, 3 {\n    lt x = i\n}')
+
+
+def test_loop_variable_is_removed(capsys):
+    errcode, (vars, _, _) = run_vm(ONE + 'lt t = 0\nfor i = 0, 3 {\n    t = t + i * One()\n}\nPrintln(t)', True)
+    assert errcode == 0 and capsys.readouterr().out == '3\n'
+    assert 'i' not in vars and not any(name.startswith('__cat_') for name in vars)
+
+
+def test_loop_variable_is_removed_on_error(capsys):
+    vars = Scope({'t': 0})
+    errcode, _ = run_vm(ONE + 'for i = 0, 3 {\n    t = t + 1 / (i - 1) + One()\n}', injected_vars=vars)
+    assert errcode == -1 and 'EvalError' in capsys.readouterr().out
+    assert {name: value for name, value in vars.items() if name != '__builtins__'} == {'t': 0.0}
+
+
+def test_let_in_a_loop_runs_every_iteration(capsys):
+    errcode, _ = run_vm(ONE + 'for i = 0, 3 {\n    lt x = i * (One() + 1)\n    Println(x)\n}')
+    assert errcode == 0 and capsys.readouterr().out == '0\n2\n4\n'
+
+
+def test_let_of_an_existing_variable(capsys):
+    errcode, _ = run_vm('lt x = 1\nlt x = 2')
+    assert errcode == -1 and "cannot create variable 'x', already exists" in capsys.readouterr().out
+
+
+def test_deep_recursion(capsys):
+    # calls push a frame instead of recursing in Python
+    errcode, _ = run_vm('fn Down(n) {\n    if n == 0 {\n        return 0\n    }\n    return Down(n - 1)\n}\nPrintln(Down(5000))')
+    assert errcode == 0 and capsys.readouterr().out == '0\n'
+
+
+def test_no_temporary_variables_left():
+    source = 'fn F(x) {\n    return x + 1\n}\nPrintln(F(1), F(2))'
+    for run in (run_vm, lambda source, return_values: run_code(source, [], return_values)):
+        errcode, (vars, _, _) = run(source, True)
+        assert errcode == 0 and [name for name in vars if name != '__builtins__'] == []
+
+
+def test_snapshot_in_a_loop(tmp_path):
+    # the loop would run in place without the `Snapshot`, then its loop variable would be saved with the other variables
+    path = str(tmp_path / 'loop.snap')
+    source = ONE + f'lt t = 0\nfor i = 0, 3 {{\n    t = t + i * One()\n    Snapshot("{path}")\n}}'
+    assert FOR_NEXT in ops(source)
+    saved = []
+    for run in (run_vm, run_code):
+        assert run(source)[0] == 0
+        saved.append({name: value for name, value in cat_snapshot.load(path).vars.items() if name != '__builtins__'})
+    assert saved == [{'t': 3}, {'t': 3}]
+
+
+@pytest.mark.parametrize('option', [{'profiler': Profiler()}, {'budget': Budget(max_statements=10)}, {'hooks': Hooks()}])
+def test_unsupported_options(option):
+    with pytest.raises(ValueError):
+        run_vm('Println(1)', **option)